@@ -17,6 +17,9 @@ class Conversation(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     model = models.ForeignKey(LLMModel, on_delete=models.CASCADE)
+    # Rolling summary of the oldest prompts, so the RAG prompt doesn't grow with the conversation
+    summary = models.TextField(blank=True, default='')
+    summarized_prompts = models.PositiveIntegerField(default=0)
 
 
 class Prompt(models.Model):
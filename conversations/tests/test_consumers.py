@@ -0,0 +1,87 @@
+import json
+import os
+from unittest.mock import AsyncMock, patch
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from conversations.models import Conversation, LLMModel, Prompt
+
+# The pipeline builds its OpenAI clients at import time; nothing in these tests calls OpenAI
+with patch.dict(os.environ, {"OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "test-key")}):
+    from conversations.routing import websocket_urlpatterns
+    from conversations.websocket.consumers import ChatConsumer
+
+
+async def fake_astream(query, history, favorites, model_name):
+    yield {"type": "chunk", "response": "Hel"}
+    yield {"type": "chunk", "response": "lo"}
+    yield {"type": "source", "sourcePoints": [{"ID": "doc-1", "Context": "context"}],
+           "links_data": [{"Link": "https://a.com"}]}
+
+
+# Saved conversations and prompts are otherwise pushed to their Elasticsearch indices
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class ChatConsumerTestCase(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password123", first_name="test", last_name="user"
+        )
+        self.conversation = Conversation.objects.create(
+            user=self.user, model=LLMModel.objects.create(name="gpt-4o-mini")
+        )
+        patcher = patch.object(ChatConsumer, 'check_and_increment_rate_limit', AsyncMock(return_value=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _connect(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/chat/{self.conversation.public_id}/")
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    @patch('conversations.websocket.consumers.achat_name', new_callable=AsyncMock, return_value="Greetings")
+    @patch('conversations.websocket.consumers.astream', side_effect=fake_astream)
+    async def test_streams_answer_and_names_conversation(self, astream, achat_name):
+        communicator = await self._connect()
+        await communicator.send_to(text_data="Hi")
+
+        messages = [await communicator.receive_from() for _ in range(7)]
+        self.assertEqual(messages[:2], ["Hel", "lo"])
+        self.assertEqual(json.loads(messages[2])["type"], "source")
+        self.assertEqual(json.loads(messages[3]), {"public_id": "doc-1", "context": "context"})
+        self.assertEqual(json.loads(messages[4])["type"], "link")
+        self.assertEqual(json.loads(messages[5]), {"link": "https://a.com"})
+        self.assertEqual(json.loads(messages[6])["type"], "stream_end")
+        await communicator.receive_nothing()
+        await communicator.disconnect()
+
+        self.assertEqual(astream.call_args.kwargs["query"], "Hi")
+        self.assertEqual(astream.call_args.kwargs["history"], [])
+        achat_name.assert_awaited_once_with(history=[
+            {"Role": "user", "Message": "Hi"}, {"Role": "assistant", "Message": "Hello"}])
+        conversation = await database_sync_to_async(Conversation.objects.get)(pk=self.conversation.pk)
+        self.assertEqual(conversation.title, "Greetings")
+        prompt = await database_sync_to_async(Prompt.objects.get)(conversation=self.conversation)
+        self.assertEqual(prompt.response, "Hello")
+
+    @patch('conversations.websocket.consumers.achat_name', new_callable=AsyncMock)
+    @patch('conversations.websocket.consumers.astream', side_effect=fake_astream)
+    async def test_later_messages_keep_the_name(self, astream, achat_name):
+        await database_sync_to_async(Prompt.objects.create)(
+            user_prompt="What is AI?", response="Artificial Intelligence.", conversation=self.conversation)
+        communicator = await self._connect()
+        await communicator.send_to(text_data="Tell me more")
+        for _ in range(7):
+            await communicator.receive_from()
+        await communicator.receive_nothing()
+        await communicator.disconnect()
+
+        self.assertEqual(astream.call_args.kwargs["history"], [
+            {"Role": "user", "Message": "What is AI?"}, {"Role": "assistant", "Message": "Artificial Intelligence."}])
+        achat_name.assert_not_awaited()
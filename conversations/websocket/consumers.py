@@ -8,9 +8,10 @@ from redis.exceptions import WatchError
 from manthrabin_backend import settings
 from manthrabin_backend.connections import  get_redis_client
 
-from rag_utils.conversation_name import chat_name
+from rag_utils.conversation_name import achat_name
 from conversations.models import Conversation, Prompt
-from rag_utils.response_pipeline import stream
+from rag_utils.response_pipeline import astream
+from rag_utils.history_summary import RAW_TURNS, SUMMARY_BATCH_PROMPTS, asummarize, compose_history
 from users.models import UserInterest
 
 
@@ -23,6 +24,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.user_interests = None
         self.first_time = False
         self.user = None
+        self.summary_task = None
 
         self.redis_client = get_redis_client()
         self.MAX_PROMPTS = settings.RATE_LIMIT_MAX_PROMPTS
@@ -59,10 +61,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.send("Your Usage Limitation has been reached")
                 return
 
-            history = self.create_history(self.prompts[-10:])
+            history = self.build_history()
             full_response_for_db = ""
-            for response in stream(query=text_data, history=history, favorites=self.user_interests,
-                                   model_name=self.conversation.model.name):
+            async for response in astream(query=text_data, history=history, favorites=self.user_interests,
+                                          model_name=self.model_name):
                 if response["type"] == "chunk":
                     full_response_for_db += response["response"]
                     await self.send(response["response"])
@@ -71,7 +73,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                         text_data=json.dumps({"type": "source", "conversation_id": str(self.conversation.public_id)}))
                     for source in response["sourcePoints"]:
                         await self.send(
-                            text_data = json.dumps({"public_id": source['ID'], "context": source['context']}))
+                            text_data = json.dumps({"public_id": source['ID'], "context": source['Context']}))
                     await self.send(
                         text_data=json.dumps({"type": "link", "conversation_id": str(self.conversation.public_id)}))
                     for link in response["links_data"]:
@@ -85,11 +87,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
             prompt = await self.save_message(full_response_for_db, text_data)
             self.prompts.append(prompt)
+            self.schedule_summary_update()
 
             if self.first_time and prompt is not None:
                 self.first_time = False
                 history = self.create_history([prompt])
-                new_title = chat_name(history = history )
+                new_title = await achat_name(history = history )
                 await self.update_conversation(new_title)
 
     @database_sync_to_async
@@ -102,7 +105,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def conversation_prompts(self):
-        return list(self.conversation.prompts.all())
+        # Oldest first, so new prompts can be appended and the tail is the latest turns
+        return list(self.conversation.prompts.order_by('time'))
 
     @database_sync_to_async
     def get_users_interests(self, user):
@@ -110,9 +114,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
         return [interest.InterestID.Title for interest in interests]
 
     def get_chunks(self, prompt):
-        history = self.create_history(self.prompts[-10:])
-        return stream(query=prompt, history=history, favorites=self.user_interests,
-                      model_name=self.conversation.model_name)
+        history = self.build_history()
+        return astream(query=prompt, history=history, favorites=self.user_interests,
+                       model_name=self.model_name)
 
     @database_sync_to_async
     def save_message(self, response, text):
@@ -128,6 +132,36 @@ class ChatConsumer(AsyncWebsocketConsumer):
         self.conversation.title = title
         self.conversation.save()
 
+    def build_history(self):
+        # Turns not yet folded into the summary are sent raw; compose_history caps their size
+        recent = self.prompts[self.conversation.summarized_prompts:]
+        return compose_history(self.conversation.summary, self.create_history(recent), self.model_name)
+
+    def schedule_summary_update(self):
+        # Only one update at a time; a skipped one is caught up after the next message
+        if self.summary_task is None or self.summary_task.done():
+            self.summary_task = asyncio.create_task(self.update_summary())
+
+    async def update_summary(self):
+        start = self.conversation.summarized_prompts
+        # Long conversations from before summaries existed are caught up a few turns at a time
+        end = min(len(self.prompts) - RAW_TURNS, start + SUMMARY_BATCH_PROMPTS)
+        if end <= start:
+            return
+        try:
+            summary = await asummarize(self.conversation.summary, self.create_history(self.prompts[start:end]))
+        except Exception as e:
+            print(f"Failed to update conversation summary: {e}")
+            return
+        await self.save_summary(summary, end)
+
+    @database_sync_to_async
+    def save_summary(self, summary, summarized_prompts):
+        self.conversation.summary = summary
+        self.conversation.summarized_prompts = summarized_prompts
+        Conversation.objects.filter(pk=self.conversation.pk).update(
+            summary=summary, summarized_prompts=summarized_prompts)
+
     def create_history(self, prompts):
         history = []
         for prompt in prompts:
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class DocumentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'documents'
+
+    def ready(self):
+        # Let django_elasticsearch_dsl share the pooled client the RAG pipeline uses
+        # instead of opening its own; nothing connects until the first request.
+        from elasticsearch_dsl.connections import connections
+        from manthrabin_backend.connections import get_es_client
+
+        connections.add_connection('default', get_es_client())
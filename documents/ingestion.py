@@ -0,0 +1,335 @@
+"""
+Background ingestion and deletion of documents.
+
+Uploads only create an `IngestionJob` and push its id onto a Redis list; worker processes
+started with `manage.py run_ingestion_worker` pop job ids and run the RAG ingestion pipeline,
+recording progress on the job row as pages are parsed and chunks are embedded and indexed.
+A document has at most one running ingestion job; later requests wait behind it, see
+`queue_ingestion`.
+
+Deletes hide the document from retrieval, delete the row and return a `DeletionJob`; the same
+workers release the document's links and delete its chunks, following the Elasticsearch task
+when the chunks have to be matched by query.
+"""
+
+import os
+import time
+import logging
+import resource
+import threading
+from typing import Dict, List
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from manthrabin_backend.connections import get_sync_redis_client
+from rag_utils import tombstones
+from rag_utils.elastic import add_docs_pipeline, delete_docs, delete_task_status
+from .models import Document, IngestionJob, DeletionJob
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "ingestion:queue"
+# Queue entries of deletion jobs carry this prefix; plain entries are ingestion jobs
+DELETION_PREFIX = "delete:"
+# Seconds a worker blocks on an empty queue before checking whether it should stop
+POLL_TIMEOUT_SECONDS = 5
+# Seconds between two checks of a running Elasticsearch delete task
+DELETION_POLL_SECONDS = 1
+ACTIVE_STATUSES = [IngestionJob.STATUS_QUEUED, IngestionJob.STATUS_RUNNING]
+
+
+class IngestionInProgress(Exception):
+    """The document has an ingestion job queued or running, so it cannot be deleted yet."""
+
+
+def enqueue(job: IngestionJob) -> None:
+    get_sync_redis_client().lpush(QUEUE_KEY, str(job.public_id))
+
+
+def queue_ingestion(document: Document) -> IngestionJob:
+    """Queues ingestion of a document's current file, coalescing with the jobs it already has.
+
+    A queued job has not read the file yet, so it is reused. While a job is running, the new job
+    is only recorded and `run_job` pushes it onto the queue once the running one finishes: two jobs
+    of a document never diff against the same chunks at the same time.
+    """
+    with transaction.atomic():
+        Document.objects.select_for_update().get(pk=document.pk)
+        active = {job.status: job for job in document.ingestion_jobs.filter(status__in=ACTIVE_STATUSES)}
+        if IngestionJob.STATUS_QUEUED in active:
+            return active[IngestionJob.STATUS_QUEUED]
+        job = IngestionJob.objects.create(document=document)
+        if IngestionJob.STATUS_RUNNING in active:
+            return job
+    try:
+        enqueue(job)
+    except Exception:
+        job.delete()
+        raise
+    return job
+
+
+def enqueue_deletion(job: DeletionJob) -> None:
+    get_sync_redis_client().lpush(QUEUE_KEY, f"{DELETION_PREFIX}{job.public_id}")
+
+
+def _record_transfers(transferred: Dict[str, List[str]]) -> None:
+    # Chunks handed over to another document must be deleted with that document later
+    for owner_public_id, chunk_ids in transferred.items():
+        owner = Document.objects.filter(public_id=owner_public_id).first()
+        if owner is not None:
+            owner.chunk_ids = sorted(set(owner.chunk_ids) | set(chunk_ids))
+            owner.save(update_fields=['chunk_ids'])
+
+
+def _rss_bytes(pid) -> int:
+    with open(f'/proc/{pid}/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _child_pids() -> List[int]:
+    children = []
+    for name in os.listdir('/proc'):
+        if name.isdigit():
+            try:
+                with open(f'/proc/{name}/stat') as stat:
+                    # The parent pid follows the parenthesised command name, which may contain spaces
+                    if int(stat.read().rsplit(')', 1)[1].split()[1]) == os.getpid():
+                        children.append(int(name))
+            except (OSError, ValueError, IndexError):
+                continue
+    return children
+
+
+def worker_rss_bytes() -> int:
+    """Resident set size of this worker process and its parser processes right now.
+
+    This is a sample of the whole worker, not of one job: concurrent jobs share the process
+    and the parser pool, so it bounds what a job can have used rather than attributing memory
+    to it. PDFs are parsed in page windows; other formats are parsed whole in one parser task,
+    so their memory does grow with the file.
+    """
+    try:
+        total = _rss_bytes('self')
+    except (OSError, ValueError, IndexError):
+        # No procfs: fall back to the peaks of this process and its finished children (kilobytes on Linux)
+        return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * 1024
+    for pid in _child_pids():
+        try:
+            total += _rss_bytes(pid)
+        except (OSError, ValueError, IndexError):
+            # Exited since it was listed
+            continue
+    return total
+
+
+def _progress_recorder(job: IngestionJob):
+    def record(**counters):
+        rss = worker_rss_bytes()
+        if rss > job.worker_peak_rss_bytes:
+            counters['worker_peak_rss_bytes'] = rss
+        for field, value in counters.items():
+            setattr(job, field, value)
+        IngestionJob.objects.filter(pk=job.pk).update(**counters)
+    return record
+
+
+def run_job(job_public_id: str, refresh: bool = True) -> None:
+    """Runs one ingestion job and records its outcome. Never raises for pipeline errors.
+
+    `refresh=False` leaves making the chunks searchable to the caller, e.g. a bulk import.
+    """
+    try:
+        job = IngestionJob.objects.select_related('document').get(public_id=job_public_id)
+    except IngestionJob.DoesNotExist:
+        logger.warning(f"Ingestion job {job_public_id} no longer exists, skipping.")
+        return
+
+    with transaction.atomic():
+        # Serialises claiming and finishing jobs of the same document, see `queue_ingestion`
+        Document.objects.select_for_update().filter(pk=job.document_id).first()
+        job.refresh_from_db(fields=['status'])
+        if job.status in (IngestionJob.STATUS_RUNNING, IngestionJob.STATUS_SUCCEEDED):
+            logger.info(f"Ingestion job {job_public_id} was already taken, skipping.")
+            return
+        if job.document.ingestion_jobs.filter(status=IngestionJob.STATUS_RUNNING).exists():
+            # Stays queued; the running job pushes it onto the queue when it finishes
+            logger.info(f"Ingestion job {job_public_id} waits for the running job of its document.")
+            return
+        job.status = IngestionJob.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+
+    document = job.document
+    try:
+        result = add_docs_pipeline(document.file.path, str(document.public_id), progress=_progress_recorder(job),
+                                   refresh=refresh)
+        document.chunk_ids = result['chunk_ids']
+        document.save(update_fields=['chunk_ids'])
+        _record_transfers(result['transferred'])
+    except Exception as e:
+        logger.error(f"Ingestion of document {document.public_id} failed: {e}", exc_info=True)
+        job.status = IngestionJob.STATUS_FAILED
+        job.error = str(e)
+    else:
+        job.status = IngestionJob.STATUS_SUCCEEDED
+    job.finished_at = timezone.now()
+    with transaction.atomic():
+        Document.objects.select_for_update().filter(pk=job.document_id).first()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        following = job.document.ingestion_jobs.filter(status=IngestionJob.STATUS_QUEUED).order_by('created_at').first()
+    if following is not None:
+        try:
+            enqueue(following)
+        except Exception as e:
+            # `run_ingestion_worker --recover` picks the job up again
+            logger.error(f"Failed to queue ingestion job {following.public_id}: {e}", exc_info=True)
+
+
+def start_deletion(document: Document) -> DeletionJob:
+    """Hides a document from retrieval, deletes the row and queues the removal of its chunks.
+
+    Links are released and chunks deleted by a worker, see `run_deletion`, so the request does
+    not wait on Elasticsearch however many chunks the document has.
+
+    Raises:
+        IngestionInProgress: An ingestion job of the document is queued or running; it would keep
+            indexing chunks after the delete started.
+
+    Returns:
+        DeletionJob: The job to report progress on; a worker runs it to completion.
+    """
+    public_id = str(document.public_id)
+    with transaction.atomic():
+        # Same lock as `queue_ingestion` and `run_job`, so no job starts between the check and the delete
+        Document.objects.select_for_update().get(pk=document.pk)
+        if document.ingestion_jobs.filter(status__in=ACTIVE_STATUSES).exists():
+            raise IngestionInProgress(f"Document {public_id} is being ingested.")
+        tombstones.mark(public_id)
+        job = DeletionJob.objects.create(
+            document_public_id=document.public_id,
+            title=document.title,
+            chunk_ids=document.chunk_ids,
+        )
+        document.delete()
+    _queue_deletion(job)
+    return job
+
+
+def replay_deletion(deletion: DeletionJob) -> DeletionJob:
+    """Queues removing a deleted document's chunks again, e.g. from an index rebuilt while it was
+    being deleted. Returns the new job."""
+    tombstones.mark(str(deletion.document_public_id))
+    job = DeletionJob.objects.create(
+        document_public_id=deletion.document_public_id,
+        title=deletion.title,
+        chunk_ids=deletion.chunk_ids,
+    )
+    _queue_deletion(job)
+    return job
+
+
+def _queue_deletion(job: DeletionJob) -> None:
+    try:
+        enqueue_deletion(job)
+    except Exception as e:
+        # The chunks stay hidden by the tombstone; `run_ingestion_worker --recover` picks the job up again
+        logger.error(f"Failed to queue deletion job {job.public_id}: {e}", exc_info=True)
+
+
+def run_deletion(job_public_id: str) -> None:
+    """Releases a deleted document's links and deletes its chunks, following the Elasticsearch
+    delete task when they are matched by query."""
+    try:
+        job = DeletionJob.objects.get(public_id=job_public_id)
+    except DeletionJob.DoesNotExist:
+        logger.warning(f"Deletion job {job_public_id} no longer exists, skipping.")
+        return
+    if job.status == IngestionJob.STATUS_SUCCEEDED:
+        return
+
+    status = None
+    if not job.es_task_id:
+        job.status = IngestionJob.STATUS_RUNNING
+        job.save(update_fields=['status'])
+        try:
+            result = delete_docs(str(job.document_public_id), job.chunk_ids)
+        except Exception as e:
+            logger.error(f"Deleting chunks of document {job.document_public_id} failed: {e}", exc_info=True)
+            status = {'completed': True, 'total': job.chunks_total, 'deleted': job.chunks_deleted, 'error': str(e)}
+        else:
+            _record_transfers(result['transferred'])
+            if result['task']:
+                job.es_task_id = result['task']
+                job.save(update_fields=['es_task_id'])
+            else:
+                status = {'completed': True, 'total': result['deleted'], 'deleted': result['deleted'], 'error': None}
+
+    while status is None:
+        try:
+            status = delete_task_status(job.es_task_id)
+        except Exception as e:
+            logger.error(f"Checking delete task {job.es_task_id} failed: {e}", exc_info=True)
+            status = {'completed': True, 'total': job.chunks_total, 'deleted': job.chunks_deleted, 'error': str(e)}
+        if not status['completed']:
+            job.chunks_total = status['total']
+            job.chunks_deleted = status['deleted']
+            job.save(update_fields=['chunks_total', 'chunks_deleted'])
+            status = None
+            time.sleep(DELETION_POLL_SECONDS)
+
+    job.chunks_total = status['total']
+    job.chunks_deleted = status['deleted']
+    if status['error']:
+        # Keep the tombstone: leftover chunks stay hidden until the delete is retried
+        job.status = IngestionJob.STATUS_FAILED
+        job.error = status['error']
+    else:
+        job.status = IngestionJob.STATUS_SUCCEEDED
+        tombstones.clear(str(job.document_public_id))
+    job.finished_at = timezone.now()
+    job.save(update_fields=['chunks_total', 'chunks_deleted', 'status', 'error', 'finished_at'])
+
+
+def work(stop_event: threading.Event) -> None:
+    """Pops and runs jobs until `stop_event` is set."""
+    redis_client = get_sync_redis_client()
+    while not stop_event.is_set():
+        item = redis_client.brpop(QUEUE_KEY, timeout=POLL_TIMEOUT_SECONDS)
+        if item is None:
+            continue
+        entry = item[1].decode()
+        close_old_connections()
+        try:
+            if entry.startswith(DELETION_PREFIX):
+                run_deletion(entry[len(DELETION_PREFIX):])
+            else:
+                run_job(entry)
+        except Exception as e:
+            # One broken job must not stop the worker
+            logger.error(f"Queue entry {entry} failed: {e}", exc_info=True)
+        finally:
+            close_old_connections()
+
+
+def requeue_unfinished() -> int:
+    """Pushes queued or running jobs back onto the queue, e.g. after all workers crashed.
+
+    Returns:
+        int: Number of jobs requeued.
+    """
+    unfinished = [IngestionJob.STATUS_QUEUED, IngestionJob.STATUS_RUNNING]
+    count = 0
+    for job in IngestionJob.objects.filter(status__in=unfinished):
+        job.status = IngestionJob.STATUS_QUEUED
+        job.save(update_fields=['status'])
+        enqueue(job)
+        count += 1
+    # A started Elasticsearch task kept running without a worker and only needs following again;
+    # otherwise the links and chunks are released again, which is safe to repeat
+    for deletion in DeletionJob.objects.filter(status__in=unfinished):
+        enqueue_deletion(deletion)
+        count += 1
+    return count
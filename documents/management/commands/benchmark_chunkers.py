@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.models import Document
+from rag_utils import chunker_benchmark, chunking, parsers
+from rag_utils.embedding_cache import EMBEDDING_MODEL
+from rag_utils.embedding_engine import EmbeddingEngine
+from langchain_core.documents import Document as Page
+
+
+# text-embedding-3-small list price, USD per million input tokens
+DEFAULT_PRICE_PER_MILLION = 0.02
+
+
+def _parse_config(value):
+    # "characters" or "tokens:<chunk tokens>:<overlap tokens>"
+    name, *numbers = value.split(":")
+    if name == "tokens" and numbers:
+        return name, {"chunk_tokens": int(numbers[0]), "overlap_tokens": int(numbers[1]) if len(numbers) > 1 else 0}
+    return name, {}
+
+
+class Command(BaseCommand):
+    help = ("Compare chunker settings offline on uploaded documents: index size, embedding cost and "
+            "retrieval hit rate@k. Nothing is written to the index.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help="Files to chunk (default: the latest uploaded documents).")
+        parser.add_argument('--documents', type=int, default=50, help="Uploaded documents used without files.")
+        parser.add_argument(
+            '--config', action='append', dest='configs',
+            help='Chunker to compare, "characters" or "tokens:<chunk tokens>:<overlap tokens>". Repeatable.')
+        parser.add_argument(
+            '--queries-file',
+            help='JSON lines of {"question": ..., "answer": ...}; a hit is a top-k chunk containing the answer.')
+        parser.add_argument('--sample-queries', type=int, default=200,
+                            help="Sentences sampled as queries when no queries file is given.")
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--price-per-million', type=float, default=DEFAULT_PRICE_PER_MILLION)
+
+    def handle(self, *args, **options):
+        configs = options['configs'] or ["characters", "tokens:400:50", "tokens:400:0", "tokens:250:30"]
+        pages = self._pages(options['files'] or [document.file.path for document in
+                                                 Document.objects.order_by('-created_at')[:options['documents']]])
+        if not pages:
+            raise CommandError("No text to chunk.")
+
+        if options['queries_file']:
+            with open(options['queries_file'], encoding='utf-8') as file:
+                queries = [(item['question'], item['answer']) for item in map(json.loads, file) if item]
+        else:
+            queries = chunker_benchmark.sample_queries(pages, options['sample_queries'])
+        engine = EmbeddingEngine()
+        query_vectors = chunker_benchmark.embed_texts([question for question, _ in queries], engine, store=False)
+        self.stdout.write(f"{len(pages)} page(s), {len(queries)} queries, k={options['k']}")
+
+        for config in configs:
+            name, settings = _parse_config(config)
+            try:
+                chunker = chunking.get_chunker(name, **settings)
+            except (ValueError, TypeError) as e:
+                raise CommandError(f"Invalid chunker config '{config}': {e}")
+            chunks = chunker.split_documents(pages)
+            stats = chunker_benchmark.chunk_stats(chunks, EMBEDDING_MODEL)
+            vectors = chunker_benchmark.embed_texts([chunk.page_content for chunk in chunks], engine)
+            rate = chunker_benchmark.hit_rate(queries, query_vectors, chunks, vectors, options['k'])
+            cost = stats['tokens'] / 1_000_000 * options['price_per_million']
+            size_mb = (stats['text_bytes'] + stats['vector_bytes']) / 1024 / 1024
+            self.stdout.write(
+                f"{config:<16} {stats['chunks']:>7} chunks  {stats['tokens']:>9} tokens  ${cost:.4f}  "
+                f"{size_mb:>8.1f} MB  hit@{options['k']} {rate:.3f}")
+
+    @staticmethod
+    def _pages(paths):
+        pages = []
+        for path in paths:
+            pages.extend(Page(page_content=text, metadata=metadata) for text, metadata in parsers.extract_pages(path))
+        return pages
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_utils import hybrid_search, vector_benchmark
+from rag_utils.elastic import INDEX_MAPPINGS, index_name, vector_mapping
+from manthrabin_backend.connections import get_es_client
+
+
+class Command(BaseCommand):
+    help = ("Measure recall@k and p95 latency of kNN search on the live vector index against exact float "
+            "search, and optionally against a float32 HNSW copy of the same chunks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200, help="Chunk vectors sampled as queries.")
+        parser.add_argument('--k', type=int, default=hybrid_search.TOP_K)
+        parser.add_argument('--num-candidates', type=int, default=hybrid_search.KNN_NUM_CANDIDATES)
+        parser.add_argument(
+            '--float-baseline', action='store_true',
+            help="Also copy the index into a temporary float32 HNSW index and benchmark it.")
+
+    def handle(self, *args, **options):
+        es = get_es_client()
+        if not es.indices.exists(index=index_name):
+            raise CommandError(f"Index '{index_name}' does not exist.")
+        k, num_candidates = options['k'], options['num_candidates']
+
+        queries = vector_benchmark.sample_queries(es, index_name, options['queries'])
+        if not queries:
+            raise CommandError(f"Index '{index_name}' has no vectors to sample.")
+        truth = [vector_benchmark.exact_neighbours(es, index_name, query, k) for query in queries]
+
+        indexes = {self._index_type(es, index_name): index_name}
+        baseline = f"{index_name}-benchmark-float"
+        if options['float_baseline']:
+            self._copy_as_float(es, baseline)
+            indexes = {"hnsw (float32)": baseline, **indexes}
+
+        try:
+            self.stdout.write(f"{len(queries)} queries, k={k}, num_candidates={num_candidates}")
+            for label, index in indexes.items():
+                result = vector_benchmark.run(es, index, queries, truth, k, num_candidates)
+                self.stdout.write(f"{label:<20} recall@{k} {result['recall']:.3f}   "
+                                  f"p50 {result['p50_ms']:.1f} ms   p95 {result['p95_ms']:.1f} ms")
+        finally:
+            if options['float_baseline']:
+                es.indices.delete(index=baseline, ignore_unavailable=True)
+
+    @staticmethod
+    def _index_type(es, index):
+        mappings = es.indices.get_mapping(index=index)
+        vector = next(iter(mappings.values()))["mappings"]["properties"][vector_benchmark.VECTOR_FIELD]
+        return vector.get("index_options", {}).get("type", "default")
+
+    def _copy_as_float(self, es, baseline):
+        self.stdout.write(f"Copying '{index_name}' into '{baseline}'...")
+        es.indices.delete(index=baseline, ignore_unavailable=True)
+        mappings = dict(INDEX_MAPPINGS, properties=dict(INDEX_MAPPINGS["properties"], vector=vector_mapping("hnsw")))
+        es.indices.create(index=baseline, mappings=mappings)
+        es.options(request_timeout=3600).reindex(
+            source={"index": index_name}, dest={"index": baseline}, refresh=True, wait_for_completion=True)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from rag_utils.elastic import ensure_index, index_name
+
+
+class Command(BaseCommand):
+    help = "Create the RAG vector index if it does not exist. Run once per deployment."
+
+    def handle(self, *args, **options):
+        if ensure_index():
+            self.stdout.write(self.style.SUCCESS(f"Created index '{index_name}'."))
+        else:
+            self.stdout.write(f"Index '{index_name}' already exists.")
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+
+from documents.ingestion import run_job
+from documents.models import Document, IngestionJob
+from documents.validators import validate_file_size
+from rag_utils import parsers, semantic_cache
+from rag_utils.elastic import ensure_index, index_name
+from manthrabin_backend.connections import get_es_client
+
+
+CHECKPOINT_NAME = '.import_corpus.json'
+
+
+def _run(job_public_id: str) -> None:
+    try:
+        run_job(job_public_id, refresh=False)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = ("Import every supported file under a directory as documents and ingest them in parallel. "
+            "Progress is checkpointed, so an interrupted import resumes where it stopped when run again.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help="Documents ingested in parallel. Parsing runs in the parser process pool and each "
+                 "document embeds its chunks in concurrent batches.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Document rows created per query.")
+        parser.add_argument(
+            '--refresh-every', type=int, default=200,
+            help="Make imported chunks searchable every N documents, so near-duplicates across files are found.")
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help=f"Checkpoint file (default: {CHECKPOINT_NAME} in the imported directory).")
+
+    def handle(self, *args, **options):
+        directory = os.path.abspath(options['directory'])
+        if not os.path.isdir(directory):
+            raise CommandError(f"'{directory}' is not a directory.")
+        checkpoint_path = options['checkpoint'] or os.path.join(directory, CHECKPOINT_NAME)
+        checkpoint = self._imported(self._load_checkpoint(checkpoint_path))
+
+        files = self._find_files(directory)
+        new = [path for path in files if path not in checkpoint]
+        self.stdout.write(f"Found {len(files)} file(s), {len(files) - len(new)} already imported.")
+        for start in range(0, len(new), options['batch_size']):
+            self._create_documents(directory, new[start:start + options['batch_size']], checkpoint, checkpoint_path)
+
+        jobs = self._pending_jobs(checkpoint.values())
+        if not jobs:
+            self.stdout.write(self.style.SUCCESS("Nothing left to ingest."))
+            return
+        self.stdout.write(f"Ingesting {len(jobs)} document(s) with concurrency {options['concurrency']}.")
+
+        ensure_index()
+        es = get_es_client()
+        es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": "-1"}})
+        started = time.monotonic()
+        done = failed = chunks = 0
+        try:
+            with ThreadPoolExecutor(max_workers=max(options['concurrency'], 1)) as pool:
+                futures = {pool.submit(_run, str(job.public_id)): job for job in jobs}
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                        job = IngestionJob.objects.get(pk=futures[future].pk)
+                        if job.status == IngestionJob.STATUS_SUCCEEDED:
+                            done += 1
+                            chunks += job.chunks_total
+                        else:
+                            failed += 1
+                            self.stderr.write(f"Failed to ingest '{job.document.title}': {job.error}")
+                        if (done + failed) % options['refresh_every'] == 0:
+                            es.indices.refresh(index=index_name)
+                            self._report(done, failed, chunks, len(jobs), started)
+                except KeyboardInterrupt:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    self.stderr.write("Interrupted; run the command again to resume.")
+                    raise
+        finally:
+            es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": None}})
+            es.indices.refresh(index=index_name)
+            semantic_cache.invalidate()
+
+        self._report(done, failed, chunks, len(jobs), started)
+        if failed:
+            self.stdout.write(f"{failed} document(s) failed; run the command again to retry them.")
+        else:
+            self.stdout.write(self.style.SUCCESS("Import finished."))
+
+    def _report(self, done, failed, chunks, total, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f"{done + failed}/{total} document(s) ({failed} failed), {chunks} chunk(s) in "
+                          f"{elapsed:.0f}s: {done / elapsed:.2f} docs/sec, {chunks / elapsed:.1f} chunks/sec")
+
+    @staticmethod
+    def _find_files(directory):
+        files = []
+        for root, dirs, names in os.walk(directory):
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+            for name in sorted(names):
+                if os.path.splitext(name)[1].lower().lstrip('.') in parsers.SUPPORTED_EXTENSIONS:
+                    files.append(os.path.relpath(os.path.join(root, name), directory))
+        return files
+
+    def _create_documents(self, directory, paths, checkpoint, checkpoint_path):
+        """Copies a batch of files into media storage and creates their rows and queued jobs.
+
+        The checkpoint is written inside the transaction that creates the rows: a crash before the
+        commit leaves entries without rows, which `_imported` drops on the next run, and a crash
+        after it finds the batch checkpointed. Files of a batch that fails to commit are removed.
+        """
+        documents = {}
+        field = Document._meta.get_field('file')
+        try:
+            for path in paths:
+                with open(os.path.join(directory, path), 'rb') as source:
+                    upload = File(source, name=os.path.basename(path))
+                    try:
+                        validate_file_size(upload)
+                    except ValidationError as e:
+                        self.stderr.write(f"Skipping '{path}': {' '.join(e.messages)}")
+                        continue
+                    name = field.storage.save(field.generate_filename(None, upload.name), upload)
+                title = os.path.splitext(os.path.basename(path))[0][:50]
+                documents[path] = Document(title=title, file=name)
+
+            with transaction.atomic():
+                Document.objects.bulk_create(documents.values())
+                created = Document.objects.filter(public_id__in=[document.public_id for document in documents.values()])
+                IngestionJob.objects.bulk_create(IngestionJob(document=document) for document in created)
+                checkpoint.update({path: str(document.public_id) for path, document in documents.items()})
+                self._save_checkpoint(checkpoint_path, checkpoint)
+        except BaseException:
+            for document in documents.values():
+                field.storage.delete(document.file.name)
+            raise
+
+    @staticmethod
+    def _imported(checkpoint):
+        """Checkpoint entries whose document exists; the others are imported again."""
+        existing = {
+            str(public_id) for public_id in
+            Document.objects.filter(public_id__in=list(checkpoint.values())).values_list('public_id', flat=True)
+        }
+        return {path: public_id for path, public_id in checkpoint.items() if public_id in existing}
+
+    @staticmethod
+    def _pending_jobs(public_ids):
+        """Latest ingestion job of every checkpointed document that has not been ingested yet.
+
+        Jobs still marked running are requeued: the previous run was interrupted, so nothing runs them.
+        """
+        jobs = []
+        documents = Document.objects.filter(public_id__in=list(public_ids)).prefetch_related('ingestion_jobs')
+        for document in documents:
+            job = max(document.ingestion_jobs.all(), key=lambda job: job.created_at, default=None)
+            if job is None:
+                job = IngestionJob.objects.create(document=document)
+            if job.status == IngestionJob.STATUS_RUNNING:
+                # Left running by an import that was killed; run_job skips jobs that are running
+                job.status = IngestionJob.STATUS_QUEUED
+                job.save(update_fields=['status'])
+            if job.status != IngestionJob.STATUS_SUCCEEDED:
+                jobs.append(job)
+        return jobs
+
+    @staticmethod
+    def _load_checkpoint(path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    @staticmethod
+    def _save_checkpoint(path, checkpoint):
+        # Write then rename, so a crash never leaves a truncated checkpoint
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(checkpoint, file)
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,131 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from documents.ingestion import queue_ingestion, replay_deletion
+from documents.models import Document, IngestionJob, DeletionJob
+from rag_utils.elastic import (
+    add_docs_pipeline, aliased_indexes, backfill_embedding_store, create_index, index_name, swap_alias,
+    versioned_index_name,
+)
+from manthrabin_backend.connections import get_es_client
+
+
+class _Throttle:
+    """Progress callback that sleeps whenever bulk indexing runs ahead of the allowed rate."""
+
+    def __init__(self, chunks_per_second: float):
+        self.chunks_per_second = chunks_per_second
+        self.started = time.monotonic()
+        self.indexed = 0
+        self.counters = {}
+
+    def next_document(self):
+        self.indexed += self.counters.get('chunks_indexed', 0)
+        self.counters = {}
+
+    def __call__(self, **counters):
+        self.counters.update(counters)
+        if self.chunks_per_second > 0 and 'chunks_indexed' in counters:
+            due = (self.indexed + counters['chunks_indexed']) / self.chunks_per_second
+            delay = due - (time.monotonic() - self.started)
+            if delay > 0:
+                time.sleep(delay)
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the RAG vector index without downtime: index every uploaded file into a new versioned "
+            "index in the background, verify it, then atomically point the search alias at it. "
+            "Vectors come from the local embedding store, so only chunks never embedded before hit the API.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-backfill', action='store_true',
+            help="Do not copy the vectors of the live index into the embedding store first.")
+        parser.add_argument(
+            '--max-chunks-per-second', type=float, default=500,
+            help="Bulk indexing rate limit, so the rebuild does not starve searches (0 disables it).")
+        parser.add_argument(
+            '--keep-old', action='store_true',
+            help="Keep the previous index after the swap, e.g. to roll back by pointing the alias at it.")
+
+    def handle(self, *args, **options):
+        es = get_es_client()
+        previous = aliased_indexes()
+        if previous and not options['skip_backfill']:
+            self.stdout.write(f"Backfilled {backfill_embedding_store()} vector(s) from '{index_name}'.")
+
+        new_index = versioned_index_name(time.strftime('%Y%m%d%H%M%S'))
+        # Nothing searches the new index until the swap, so segments are only published on demand
+        create_index(new_index, settings={"refresh_interval": "-1"})
+        self.stdout.write(f"Building '{new_index}'.")
+
+        rebuild_started = timezone.now()
+        throttle = _Throttle(options['max_chunks_per_second'])
+        chunk_ids, failed = {}, []
+        reused = embedded = 0
+        for document in Document.objects.all():
+            throttle.next_document()
+            try:
+                result = add_docs_pipeline(document.file.path, str(document.public_id),
+                                           progress=throttle, index=new_index)
+            except Exception as e:
+                self.stderr.write(f"Failed to index '{document.title}' ({document.public_id}): {e}")
+                failed.append(document)
+                continue
+            chunk_ids[document.pk] = result['chunk_ids']
+            embedded += throttle.counters.get('chunks_embedded', 0)
+            reused += throttle.counters.get('embeddings_reused', 0)
+        throttle.next_document()
+
+        es.indices.put_settings(index=new_index, settings={"index": {"refresh_interval": None}})
+        es.indices.refresh(index=new_index)
+
+        expected = sum(len(ids) for ids in chunk_ids.values())
+        indexed = es.count(index=new_index)["count"]
+        if failed or indexed != expected:
+            es.indices.delete(index=new_index, ignore_unavailable=True)
+            raise CommandError(
+                f"Verification failed ({len(failed)} document(s) failed, {indexed} chunk(s) indexed, "
+                f"{expected} expected); '{index_name}' was left unchanged.")
+        live = es.count(index=index_name)["count"] if previous else 0
+        self.stdout.write(f"Verified '{new_index}': {len(chunk_ids)} document(s), {indexed} chunk(s) "
+                          f"({live} in the live index).")
+
+        replaced = swap_alias(new_index)
+        for document in Document.objects.filter(pk__in=chunk_ids):
+            document.chunk_ids = chunk_ids[document.pk]
+            document.save(update_fields=['chunk_ids'])
+        self.stdout.write(f"'{index_name}' now points to '{new_index}'.")
+
+        self._catch_up(rebuild_started, set(chunk_ids))
+
+        if not options['keep_old']:
+            for old in replaced:
+                es.indices.delete(index=old, ignore_unavailable=True)
+                self.stdout.write(f"Deleted '{old}'.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt '{index_name}' in {time.monotonic() - throttle.started:.1f}s: "
+            f"{embedded} chunk(s), {reused} vector(s) reused, {embedded - reused} fetched from the API."))
+
+    def _catch_up(self, since, rebuilt_pks):
+        """Replays changes the live index received while the new one was being built."""
+        # Uploads and re-ingestions written to the old index since; ingestion is idempotent
+        changed = Document.objects.filter(
+            Q(ingestion_jobs__finished_at__gte=since) | Q(ingestion_jobs__status__in=[
+                IngestionJob.STATUS_QUEUED, IngestionJob.STATUS_RUNNING]) | ~Q(pk__in=rebuilt_pks)
+        ).distinct()
+        for document in changed:
+            # A job still running wrote to the old index; the queued one runs after it
+            queue_ingestion(document)
+            self.stdout.write(f"Queued re-ingestion of '{document.title}', changed during the rebuild.")
+
+        # Documents deleted after the rebuild indexed them
+        deletions = {deletion.document_public_id: deletion
+                     for deletion in DeletionJob.objects.filter(created_at__gte=since).order_by('created_at')}
+        for deletion in deletions.values():
+            job = replay_deletion(deletion)
+            self.stdout.write(f"Queued deletion {job.public_id} of '{deletion.title}', deleted during the rebuild.")
@@ -0,0 +1,39 @@
+import os
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from documents import ingestion
+
+
+class Command(BaseCommand):
+    help = "Process queued document ingestion jobs from Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=int(os.getenv('INGESTION_WORKER_CONCURRENCY', '2')),
+            help="Number of jobs processed in parallel by this process.")
+        parser.add_argument(
+            '--recover', action='store_true',
+            help="Requeue jobs left queued or running. Only use when no other worker is running.")
+
+    def handle(self, *args, **options):
+        if options['recover']:
+            self.stdout.write(f"Requeued {ingestion.requeue_unfinished()} unfinished job(s).")
+
+        stop_event = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop_event.set())
+
+        threads = [
+            threading.Thread(target=ingestion.work, args=(stop_event,), name=f"ingestion-{i}")
+            for i in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f"Ingestion worker started with {len(threads)} thread(s)."))
+
+        for thread in threads:
+            thread.join()
+        self.stdout.write("Ingestion worker stopped.")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_ingestionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='chunks_per_second',
+            field=models.FloatField(default=0),
+        ),
+    ]
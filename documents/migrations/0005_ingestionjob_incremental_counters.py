@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_ingestionjob_chunks_per_second'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='chunks_deleted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='chunks_unchanged',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_ingestionjob_incremental_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='peak_rss_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_ingestionjob_peak_rss_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='bytes_saved',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='chunks_deduplicated',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='embedding_calls_saved',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
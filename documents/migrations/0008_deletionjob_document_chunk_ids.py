@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 01:28
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_ingestionjob_dedup_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('document_public_id', models.UUIDField()),
+                ('title', models.TextField(max_length=50)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('es_task_id', models.CharField(blank=True, default='', max_length=128)),
+                ('chunks_total', models.PositiveIntegerField(default=0)),
+                ('chunks_deleted', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='chunk_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_deletionjob_document_chunk_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionjob',
+            name='embeddings_reused',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 14:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_ingestionjob_embeddings_reused'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='ingestionjob',
+            old_name='peak_rss_bytes',
+            new_name='worker_peak_rss_bytes',
+        ),
+    ]
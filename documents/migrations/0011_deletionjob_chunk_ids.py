@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_rename_peak_rss_bytes_ingestionjob_worker_peak_rss_bytes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletionjob',
+            name='chunk_ids',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -18,6 +18,8 @@ class Document(models.Model):
             validate_file_size,
         ]
     )
+    # Elasticsearch ids of the document's chunks, recorded at ingestion so deletes go by id
+    chunk_ids = models.JSONField(default=list, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -27,3 +29,75 @@ class Document(models.Model):
     def delete(self, *args, **kwargs):
         self.file.delete()
         super().delete(*args, **kwargs)
+
+
+class IngestionJob(models.Model):
+    """Tracks the background processing of an uploaded document into the vector index."""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    public_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='ingestion_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    pages_parsed = models.PositiveIntegerField(default=0)
+    chunks_total = models.PositiveIntegerField(default=0)
+    chunks_embedded = models.PositiveIntegerField(default=0)
+    chunks_indexed = models.PositiveIntegerField(default=0)
+    chunks_per_second = models.FloatField(default=0)
+    chunks_unchanged = models.PositiveIntegerField(default=0)
+    chunks_deleted = models.PositiveIntegerField(default=0)
+    # Chunks linked to a near-duplicate of another document instead of being embedded
+    chunks_deduplicated = models.PositiveIntegerField(default=0)
+    bytes_saved = models.PositiveBigIntegerField(default=0)
+    embedding_calls_saved = models.PositiveIntegerField(default=0)
+    # Chunks whose vector came from the local embedding store instead of the API
+    embeddings_reused = models.PositiveIntegerField(default=0)
+    # Highest resident set size of the whole worker (process plus parser pool) sampled while the
+    # job ran; shared with concurrently running jobs, see `ingestion.worker_rss_bytes`
+    worker_peak_rss_bytes = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f"{self.document.title} ({self.status})"
+
+
+class DeletionJob(models.Model):
+    """Tracks the background removal of a deleted document's chunks from the vector index."""
+
+    STATUS_CHOICES = IngestionJob.STATUS_CHOICES
+
+    public_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    # The document row is gone once deletion starts, so it is referenced by value
+    document_public_id = models.UUIDField()
+    title = models.TextField(max_length=50)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=IngestionJob.STATUS_QUEUED)
+    # Chunk ids the document recorded at ingestion, deleted by the worker
+    chunk_ids = models.JSONField(default=list, blank=True, editable=False)
+    # Set only when the chunks are matched by query in an asynchronous Elasticsearch task
+    es_task_id = models.CharField(max_length=128, blank=True, default='')
+    chunks_total = models.PositiveIntegerField(default=0)
+    chunks_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f"{self.title} ({self.status})"
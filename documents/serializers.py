@@ -1,16 +1,40 @@
 from rest_framework import serializers
-from .models import Document
+from .models import Document, IngestionJob, DeletionJob
+
+
+class IngestionJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IngestionJob
+        fields = ['public_id', 'status', 'pages_parsed', 'chunks_total', 'chunks_embedded', 'chunks_indexed',
+                  'chunks_per_second', 'chunks_unchanged', 'chunks_deleted',
+                  'chunks_deduplicated', 'bytes_saved', 'embedding_calls_saved', 'embeddings_reused',
+                  'worker_peak_rss_bytes', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    status_url = serializers.HyperlinkedIdentityField(view_name='deletion-detail', lookup_field='public_id')
+
+    class Meta:
+        model = DeletionJob
+        fields = ['public_id', 'document_public_id', 'title', 'status', 'status_url', 'chunks_total',
+                  'chunks_deleted', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
 
 
 class DocumentSerializer(serializers.ModelSerializer):
     file_path = serializers.SerializerMethodField()
     file_name = serializers.SerializerMethodField()
     file_size = serializers.SerializerMethodField()
+    ingestion_status = serializers.SerializerMethodField()
+    ingestion_job_id = serializers.SerializerMethodField()
 
     class Meta:
         model = Document
-        fields = ['public_id', 'title', 'file', 'file_path', 'file_name', 'file_size', 'created_at', 'updated_at']
-        read_only_fields = ['public_id', 'file_path', 'file_name', 'file_size', 'created_at', 'updated_at']
+        fields = ['public_id', 'title', 'file', 'file_path', 'file_name', 'file_size', 'ingestion_status',
+                  'ingestion_job_id', 'created_at', 'updated_at']
+        read_only_fields = ['public_id', 'file_path', 'file_name', 'file_size', 'ingestion_status',
+                            'ingestion_job_id', 'created_at', 'updated_at']
 
     def get_file_path(self, obj: Document) -> str:
         return obj.file.path
@@ -20,3 +44,11 @@ class DocumentSerializer(serializers.ModelSerializer):
 
     def get_file_size(self, obj: Document) -> int:
         return obj.file.size
+
+    def get_ingestion_status(self, obj: Document) -> str:
+        job = obj.ingestion_jobs.first()
+        return job.status if job else None
+
+    def get_ingestion_job_id(self, obj: Document) -> str:
+        job = obj.ingestion_jobs.first()
+        return str(job.public_id) if job else None
@@ -1,3 +1,353 @@
-from django.test import TestCase
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from io import StringIO
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from documents.ingestion import run_job, run_deletion, work, worker_rss_bytes, _child_pids
+from documents.management.commands.import_corpus import Command as ImportCorpusCommand
+from documents.management.commands.rebuild_vector_index import Command as RebuildVectorIndexCommand
+from documents.models import Document, IngestionJob, DeletionJob
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class IngestionJobTestCase(APITestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email="admin@example.com", password="password123", first_name="test", last_name="admin"
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def _document(self):
+        return Document.objects.create(
+            title="Guide", file=SimpleUploadedFile("guide.txt", b"hello", content_type="text/plain")
+        )
+
+    @patch('documents.views.enqueue')
+    def test_upload_queues_job(self, enqueue):
+        upload = SimpleUploadedFile("guide.txt", b"hello", content_type="text/plain")
+        response = self.client.post(reverse('document-list'), {"title": "Guide", "file": upload})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        job = IngestionJob.objects.get(document__public_id=response.data['public_id'])
+        self.assertEqual(job.status, IngestionJob.STATUS_QUEUED)
+        self.assertEqual(response.data['ingestion_job_id'], str(job.public_id))
+        self.assertEqual(response.data['ingestion_status'], IngestionJob.STATUS_QUEUED)
+        enqueue.assert_called_once_with(job)
+
+    @patch('documents.views.enqueue', side_effect=ConnectionError("redis down"))
+    def test_upload_fails_when_queue_unavailable(self, enqueue):
+        upload = SimpleUploadedFile("guide.txt", b"hello", content_type="text/plain")
+        response = self.client.post(reverse('document-list'), {"title": "Guide", "file": upload})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Document.objects.exists())
+
+    @patch('documents.ingestion.add_docs_pipeline')
+    def test_run_job_records_progress(self, pipeline):
+        def fake_pipeline(file_path, public_id, progress=None, refresh=True):
+            progress(pages_parsed=3)
+            progress(chunks_total=10)
+            progress(chunks_embedded=10, chunks_indexed=10)
+            return {'chunk_ids': ['c1', 'c2'], 'transferred': {}}
+        pipeline.side_effect = fake_pipeline
+        job = IngestionJob.objects.create(document=self._document())
+
+        run_job(str(job.public_id))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_SUCCEEDED)
+        self.assertEqual((job.pages_parsed, job.chunks_total, job.chunks_indexed), (3, 10, 10))
+        self.assertGreater(job.worker_peak_rss_bytes, 0)
+        self.assertEqual(job.document.chunk_ids, ['c1', 'c2'])
+        self.assertIsNotNone(job.finished_at)
+
+    @patch('documents.ingestion.add_docs_pipeline', side_effect=RuntimeError("parse error"))
+    def test_run_job_records_failure(self, pipeline):
+        document = self._document()
+        job = IngestionJob.objects.create(document=document)
+
+        run_job(str(job.public_id))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_FAILED)
+        self.assertEqual(job.error, "parse error")
+        self.assertTrue(Document.objects.filter(pk=document.pk).exists())
+
+    def test_status_endpoint_returns_latest_job(self):
+        document = self._document()
+        IngestionJob.objects.create(document=document, status=IngestionJob.STATUS_RUNNING, chunks_embedded=4)
+        url = reverse('document-ingestion-status', kwargs={'public_id': document.public_id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], IngestionJob.STATUS_RUNNING)
+        self.assertEqual(response.data['chunks_embedded'], 4)
+
+    @patch('documents.ingestion.enqueue')
+    def test_reingest_queues_new_job(self, enqueue):
+        document = self._document()
+        IngestionJob.objects.create(document=document, status=IngestionJob.STATUS_SUCCEEDED)
+        url = reverse('document-reingest', kwargs={'public_id': document.public_id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], IngestionJob.STATUS_QUEUED)
+        self.assertEqual(document.ingestion_jobs.count(), 2)
+        enqueue.assert_called_once()
+
+    @patch('documents.ingestion.enqueue')
+    def test_reingest_reuses_queued_job(self, enqueue):
+        document = self._document()
+        queued = IngestionJob.objects.create(document=document)
+        url = reverse('document-reingest', kwargs={'public_id': document.public_id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['public_id'], str(queued.public_id))
+        self.assertEqual(document.ingestion_jobs.count(), 1)
+        enqueue.assert_not_called()
+
+    @patch('documents.ingestion.enqueue')
+    @patch('documents.ingestion.add_docs_pipeline')
+    def test_reingest_waits_for_running_job(self, pipeline, enqueue):
+        document = self._document()
+        job = IngestionJob.objects.create(document=document)
+        url = reverse('document-reingest', kwargs={'public_id': document.public_id})
+        followups = []
+
+        def reingest_while_running(file_path, public_id, progress=None, refresh=True):
+            response = self.client.post(url)
+            followups.append(IngestionJob.objects.get(public_id=response.data['public_id']))
+            # Picked up by another worker before the running job finished
+            run_job(response.data['public_id'])
+            return {'chunk_ids': ['c1'], 'transferred': {}}
+        pipeline.side_effect = reingest_while_running
+
+        run_job(str(job.public_id))
+
+        self.assertEqual(pipeline.call_count, 1)
+        followup, = followups
+        followup.refresh_from_db()
+        self.assertEqual(followup.status, IngestionJob.STATUS_QUEUED)
+        # Pushed onto the queue only once the running job finished
+        enqueue.assert_called_once_with(followup)
+
+    @patch('documents.ingestion.delete_docs')
+    @patch('documents.ingestion.enqueue_deletion')
+    @patch('documents.ingestion.tombstones')
+    def test_delete_returns_status_handle(self, tombstones, enqueue_deletion, delete_docs):
+        document = self._document()
+        document.chunk_ids = ['c1', 'c2']
+        document.save()
+
+        url = reverse('document-detail', kwargs={'public_id': document.public_id})
+        response = self.client.delete(url)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        # Links and chunks are released by the worker, not in the request
+        delete_docs.assert_not_called()
+        tombstones.mark.assert_called_once_with(str(document.public_id))
+        self.assertFalse(Document.objects.filter(pk=document.pk).exists())
+        job = DeletionJob.objects.get(public_id=response.data['public_id'])
+        self.assertEqual(job.chunk_ids, ['c1', 'c2'])
+        enqueue_deletion.assert_called_once_with(job)
+
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], IngestionJob.STATUS_QUEUED)
+
+    @patch('documents.ingestion.tombstones')
+    @patch('documents.ingestion.delete_docs')
+    def test_run_deletion_deletes_recorded_chunks(self, delete_docs, tombstones):
+        other = self._document()
+        job = DeletionJob.objects.create(document_public_id=uuid.uuid4(), title="Guide", chunk_ids=['c1', 'c2'])
+        delete_docs.return_value = {'task': None, 'deleted': 1, 'transferred': {str(other.public_id): ['c2']}}
+
+        run_deletion(str(job.public_id))
+
+        delete_docs.assert_called_once_with(str(job.document_public_id), ['c1', 'c2'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_SUCCEEDED)
+        self.assertEqual((job.chunks_total, job.chunks_deleted), (1, 1))
+        other.refresh_from_db()
+        self.assertEqual(other.chunk_ids, ['c2'])
+        tombstones.clear.assert_called_once_with(str(job.document_public_id))
+
+    @patch('documents.ingestion.tombstones')
+    @patch('documents.ingestion.delete_task_status')
+    @patch('documents.ingestion.delete_docs')
+    def test_run_deletion_follows_task(self, delete_docs, delete_task_status, tombstones):
+        job = DeletionJob.objects.create(document_public_id=uuid.uuid4(), title="Guide")
+        delete_docs.return_value = {'task': 'node:42', 'deleted': 0, 'transferred': {}}
+        delete_task_status.side_effect = [
+            {'completed': False, 'total': 10, 'deleted': 4, 'error': None},
+            {'completed': True, 'total': 10, 'deleted': 10, 'error': None},
+        ]
+
+        with patch('documents.ingestion.time.sleep'):
+            run_deletion(str(job.public_id))
+
+        job.refresh_from_db()
+        self.assertEqual(job.es_task_id, 'node:42')
+        self.assertEqual(job.status, IngestionJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.chunks_deleted, 10)
+        tombstones.clear.assert_called_once_with(str(job.document_public_id))
+
+    @patch('documents.ingestion.enqueue_deletion')
+    @patch('documents.ingestion.tombstones')
+    def test_delete_refused_while_ingesting(self, tombstones, enqueue_deletion):
+        document = self._document()
+        url = reverse('document-detail', kwargs={'public_id': document.public_id})
+        for job_status in (IngestionJob.STATUS_QUEUED, IngestionJob.STATUS_RUNNING):
+            job = IngestionJob.objects.create(document=document, status=job_status)
+            response = self.client.delete(url)
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            job.delete()
+        self.assertTrue(Document.objects.filter(pk=document.pk).exists())
+        enqueue_deletion.assert_not_called()
+        tombstones.mark.assert_not_called()
+
+    @patch('documents.ingestion.run_job')
+    def test_worker_survives_a_failing_job(self, run_job):
+        stop = threading.Event()
+        entries = [(b'ingestion:queue', b'job-1'), (b'ingestion:queue', b'job-2')]
+
+        def brpop(key, timeout):
+            if not entries:
+                stop.set()
+                return None
+            return entries.pop(0)
+        redis_client = MagicMock()
+        redis_client.brpop.side_effect = brpop
+        run_job.side_effect = [RuntimeError("job row gone"), None]
+
+        with patch('documents.ingestion.get_sync_redis_client', return_value=redis_client):
+            work(stop)
+
+        self.assertEqual([call.args[0] for call in run_job.call_args_list], ['job-1', 'job-2'])
+
+    @patch('documents.ingestion.enqueue_deletion')
+    @patch('documents.ingestion.tombstones')
+    def test_rebuild_catch_up_queues_tracked_deletions(self, tombstones, enqueue_deletion):
+        since = timezone.now()
+        deleted = DeletionJob.objects.create(document_public_id=uuid.uuid4(), title="Guide", chunk_ids=['c1'],
+                                             status=IngestionJob.STATUS_SUCCEEDED)
+
+        RebuildVectorIndexCommand(stdout=StringIO())._catch_up(since, set())
+
+        replayed = DeletionJob.objects.exclude(pk=deleted.pk).get()
+        self.assertEqual((replayed.document_public_id, replayed.chunk_ids), (deleted.document_public_id, ['c1']))
+        self.assertEqual(replayed.status, IngestionJob.STATUS_QUEUED)
+        tombstones.mark.assert_called_once_with(str(deleted.document_public_id))
+        enqueue_deletion.assert_called_once_with(replayed)
+
+    @patch('documents.management.commands.import_corpus.semantic_cache')
+    @patch('documents.management.commands.import_corpus.get_es_client')
+    @patch('documents.management.commands.import_corpus.ensure_index')
+    @patch('documents.management.commands.import_corpus.run_job')
+    def test_import_corpus_resumes_from_checkpoint(self, run_job, ensure_index, get_es_client, semantic_cache):
+        corpus = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, corpus, True)
+        os.makedirs(os.path.join(corpus, 'manuals'))
+        for path in ('a.txt', os.path.join('manuals', 'b.txt'), 'notes.md'):
+            with open(os.path.join(corpus, path), 'w') as file:
+                file.write("hello")
+
+        call_command('import_corpus', corpus, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(sorted(Document.objects.values_list('title', flat=True)), ['a', 'b'])
+        self.assertEqual(run_job.call_count, 2)
+        run_job.assert_called_with(run_job.call_args.args[0], refresh=False)
+
+        # Only the document whose ingestion did not succeed runs again, and no rows are duplicated
+        IngestionJob.objects.filter(document__title='a').update(status=IngestionJob.STATUS_SUCCEEDED)
+        run_job.reset_mock()
+        call_command('import_corpus', corpus, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(Document.objects.count(), 2)
+        run_job.assert_called_once()
+        self.assertEqual(IngestionJob.objects.get(public_id=run_job.call_args.args[0]).document.title, 'b')
+
+    @patch('documents.management.commands.import_corpus.semantic_cache')
+    @patch('documents.management.commands.import_corpus.get_es_client')
+    @patch('documents.management.commands.import_corpus.ensure_index')
+    @patch('documents.management.commands.import_corpus.run_job')
+    def test_import_corpus_resumes_jobs_left_running(self, import_run_job, ensure_index, get_es_client, semantic_cache):
+        corpus = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, corpus, True)
+        for path in ('a.txt', 'b.txt'):
+            with open(os.path.join(corpus, path), 'w') as file:
+                file.write("hello")
+        call_command('import_corpus', corpus, stdout=StringIO(), stderr=StringIO())
+
+        # The run was killed while ingesting 'a'
+        IngestionJob.objects.filter(document__title='a').update(status=IngestionJob.STATUS_RUNNING)
+        IngestionJob.objects.filter(document__title='b').update(status=IngestionJob.STATUS_SUCCEEDED)
+        import_run_job.reset_mock()
+        call_command('import_corpus', corpus, stdout=StringIO(), stderr=StringIO())
+
+        import_run_job.assert_called_once()
+        job = IngestionJob.objects.get(public_id=import_run_job.call_args.args[0])
+        self.assertEqual((job.document.title, job.status), ('a', IngestionJob.STATUS_QUEUED))
+        with patch('documents.ingestion.add_docs_pipeline', return_value={'chunk_ids': ['c1'], 'transferred': {}}):
+            run_job(str(job.public_id))
+        job.refresh_from_db()
+        self.assertEqual(job.status, IngestionJob.STATUS_SUCCEEDED)
+
+    @patch('documents.management.commands.import_corpus.semantic_cache')
+    @patch('documents.management.commands.import_corpus.get_es_client')
+    @patch('documents.management.commands.import_corpus.ensure_index')
+    @patch('documents.management.commands.import_corpus.run_job')
+    def test_import_corpus_crash_before_commit_does_not_duplicate(self, run_job, ensure_index, get_es_client,
+                                                                   semantic_cache):
+        corpus = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, corpus, True)
+        for path in ('a.txt', 'b.txt'):
+            with open(os.path.join(corpus, path), 'w') as file:
+                file.write("hello")
+        stored = os.path.join(MEDIA_ROOT, 'documents')
+        os.makedirs(stored, exist_ok=True)
+        before = set(os.listdir(stored))
+        save_checkpoint = ImportCorpusCommand._save_checkpoint
+
+        def crash_after_writing(path, checkpoint):
+            save_checkpoint(path, checkpoint)
+            raise KeyboardInterrupt
+
+        with patch.object(ImportCorpusCommand, '_save_checkpoint', side_effect=crash_after_writing):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('import_corpus', corpus, stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Document.objects.exists())
+        self.assertEqual(set(os.listdir(stored)), before)
+
+        call_command('import_corpus', corpus, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(sorted(Document.objects.values_list('title', flat=True)), ['a', 'b'])
+        self.assertEqual(len(set(os.listdir(stored)) - before), 2)
+        self.assertEqual(run_job.call_count, 2)
+
+
+class WorkerMemoryTestCase(SimpleTestCase):
+    def test_parser_processes_count_towards_worker_memory(self):
+        if not os.path.exists('/proc/self/statm'):
+            self.skipTest("needs procfs")
+        child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+        self.assertIn(child.pid, _child_pids())
+        self.assertGreater(worker_rss_bytes(), 0)
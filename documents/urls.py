@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DocumentViewSet
+from .views import DocumentViewSet, DeletionJobViewSet
 from django.conf import settings
 from django.conf.urls.static import static
 
 router = DefaultRouter()
+# Registered first so "deletions/..." is not taken for a document id
+router.register(r'deletions', DeletionJobViewSet, basename='deletion')
 router.register(r'', DocumentViewSet, basename='document')
 
 urlpatterns = [
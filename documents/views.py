@@ -1,13 +1,12 @@
-from rest_framework import viewsets, permissions, parsers, status, serializers
+from rest_framework import viewsets, mixins, permissions, parsers, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.http import FileResponse
 from django.core.exceptions import ValidationError
 import logging # TODO: improve usage of logging 
-from .models import Document
-from .serializers import DocumentSerializer
-# TODO: add docker-compose then uncomment this line
-from rag_utils.elastic import add_docs_pipeline, delete_docs_pipeline, es_client
+from .models import Document, IngestionJob, DeletionJob
+from .serializers import DocumentSerializer, IngestionJobSerializer, DeletionJobSerializer
+from .ingestion import IngestionInProgress, enqueue, queue_ingestion, start_deletion
 
 
 class AdminOnlyPermission(permissions.BasePermission):
@@ -31,16 +30,36 @@ class DocumentViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
         self.logger.info("Creating a new document.")
         document = serializer.save()
-        file_path = document.file.path
-        file_public_id = str(document.public_id)
+        # Parsing and embedding run in the ingestion worker; the upload returns right away
+        job = IngestionJob.objects.create(document=document)
         try:
-            add_docs_pipeline(file_path, file_public_id)
+            enqueue(job)
         except Exception as e:
-            self.logger.error(f"Failed to add document to Elasticsearch: {e}", exc_info=True)
+            self.logger.error(f"Failed to queue document for ingestion: {e}", exc_info=True)
             document.delete()
-            self.logger.warning(f"Deleting document with public ID {document.public_id} due to Elasticsearch failure.")
-            raise serializers.ValidationError({"error": "Failed to add document to Elasticsearch."})
-        
+            self.logger.warning(f"Deleting document with public ID {document.public_id} due to queue failure.")
+            raise serializers.ValidationError({"error": "Failed to queue document for ingestion."})
+
+    def perform_update(self, serializer: DocumentSerializer):
+        if 'file' not in serializer.validated_data:
+            serializer.save()
+            return
+        old_file = serializer.instance.file
+        old_name = old_file.name
+        document = serializer.save()
+        if old_name and old_name != document.file.name:
+            old_file.storage.delete(old_name)
+        # Only chunks whose content changed are re-embedded, see add_docs_pipeline
+        self.logger.info(f"File of document {document.public_id} replaced, queueing re-ingestion.")
+        self._queue_ingestion(document)
+
+    def _queue_ingestion(self, document: Document) -> IngestionJob:
+        # Coalesces with a job already queued or running for the document, see queue_ingestion
+        try:
+            return queue_ingestion(document)
+        except Exception as e:
+            self.logger.error(f"Failed to queue document for ingestion: {e}", exc_info=True)
+            raise serializers.ValidationError({"error": "Failed to queue document for ingestion."})
 
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def download(self, request, public_id=None):
@@ -72,6 +91,21 @@ class DocumentViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(document)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='status')
+    def ingestion_status(self, request, public_id=None):
+        document = self.get_object()
+        job = document.ingestion_jobs.first()
+        if job is None:
+            return Response({"error": "No ingestion job for this document."},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(IngestionJobSerializer(job).data)
+
+    @action(detail=True, methods=['post'], url_path='reingest')
+    def reingest(self, request, public_id=None):
+        document = self.get_object()
+        job = self._queue_ingestion(document)
+        return Response(IngestionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
     def list(self, request, *args, **kwargs):
         self.permission_classes = [permissions.IsAuthenticated]
         return super().list(request, *args, **kwargs)
@@ -80,14 +114,26 @@ class DocumentViewSet(viewsets.ModelViewSet):
         self.permission_classes = [permissions.IsAuthenticated]
         return super().retrieve(request, *args, **kwargs)
 
-    def perform_destroy(self, instance):
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
         self.logger.warning(f"Deleting document with public ID {instance.public_id}.")
         try:
-            delete_docs_pipeline(str(instance.public_id))
+            # Chunks are hidden from retrieval right away and removed by a background task
+            job = start_deletion(instance)
+        except IngestionInProgress:
+            return Response({"error": "Document is being ingested; delete it once ingestion has finished."},
+                            status=status.HTTP_409_CONFLICT)
         except Exception as e:
             self.logger.error(f"Failed to delete document from elastic database: {e}")
             return Response({"error": "Failed to delete document from elastic database."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        instance.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(DeletionJobSerializer(job, context={'request': request}).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class DeletionJobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = DeletionJob.objects.all()
+    serializer_class = DeletionJobSerializer
+    permission_classes = [AdminOnlyPermission]
+    lookup_field = 'public_id'
@@ -1,13 +1,56 @@
 from manthrabin_backend import settings
-import redis.asyncio as redis
+import threading
+import redis
+import redis.asyncio as aioredis
+from elasticsearch import Elasticsearch, AsyncElasticsearch
 
-redis_connection_pool = redis.ConnectionPool(
+redis_connection_pool = aioredis.ConnectionPool(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
     db=settings.REDIS_DB,
     password=settings.REDIS_PASSWORD,
     max_connections=100
 )
-redis_client_from_pool = redis.Redis(connection_pool=redis_connection_pool)
+redis_client_from_pool = aioredis.Redis(connection_pool=redis_connection_pool)
 def get_redis_client():
-    return redis_client_from_pool
\ No newline at end of file
+    return redis_client_from_pool
+
+# Blocking counterpart for code that runs outside the event loop (sync views, worker threads)
+sync_redis_connection_pool = redis.ConnectionPool(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DB,
+    password=settings.REDIS_PASSWORD,
+    max_connections=100
+)
+sync_redis_client_from_pool = redis.Redis(connection_pool=sync_redis_connection_pool)
+def get_sync_redis_client():
+    return sync_redis_client_from_pool
+
+# Elasticsearch clients are created on first use, so importing this module never touches the network
+_es_lock = threading.Lock()
+_es_client = None
+_async_es_client = None
+
+def _es_options():
+    return dict(
+        hosts=[settings.ES_HOST],
+        basic_auth=(settings.ES_USER, settings.ES_PASS),
+        verify_certs=settings.ES_VERIFY_CERTS,
+        connections_per_node=settings.ES_CONNECTIONS_PER_NODE,
+        request_timeout=settings.ES_REQUEST_TIMEOUT,
+    )
+
+def get_es_client():
+    global _es_client
+    with _es_lock:
+        if _es_client is None:
+            _es_client = Elasticsearch(**_es_options())
+        return _es_client
+
+def get_async_es_client():
+    global _async_es_client
+    with _es_lock:
+        if _async_es_client is None:
+            _async_es_client = AsyncElasticsearch(**_es_options())
+        return _async_es_client
@@ -51,6 +51,20 @@ else:
 ES_URL = os.environ.get('ES_URL', 'localhost')
 ES_PORT = os.environ.get('ES_PORT', '9200')
 ES_SCHEMA = os.environ.get('ES_SCHEMA', 'http')
+ES_HOST = f'{ES_SCHEMA}://{ES_URL}:{ES_PORT}'
+ES_USER = os.environ.get('ES_USER', 'elastic')
+ES_PASS = os.environ.get('ES_PASS', '12345678')
+ES_INDEX = os.environ.get('ES_INDEX', 'manthrabin')
+ES_VERIFY_CERTS = os.getenv('ES_VERIFY_CERTS', 'False').lower() in ('true', '1')
+ES_CONNECTIONS_PER_NODE = int(os.getenv('ES_CONNECTIONS_PER_NODE', 10))
+ES_REQUEST_TIMEOUT = float(os.getenv('ES_REQUEST_TIMEOUT', 10))
+# Vector index layout, applied through a versioned index template whenever the index is (re)built.
+# Quantized HNSW keeps the graph small enough for the page cache; original floats stay on disk for rescoring
+ES_VECTOR_INDEX_TYPE = os.getenv('ES_VECTOR_INDEX_TYPE', 'int8_hnsw')  # hnsw, int8_hnsw, int4_hnsw or bbq_hnsw
+ES_VECTOR_HNSW_M = int(os.getenv('ES_VECTOR_HNSW_M', 16))
+ES_VECTOR_HNSW_EF_CONSTRUCTION = int(os.getenv('ES_VECTOR_HNSW_EF_CONSTRUCTION', 100))
+# Index file extensions loaded into memory up front; empty means the graph and quantized vectors of the type above
+ES_VECTOR_PRELOAD = [ext.strip() for ext in os.getenv('ES_VECTOR_PRELOAD', '').split(',') if ext.strip()]
 
 
 REDIS_HOST=os.getenv('REDIS_HOST', 'localhost')
@@ -61,6 +75,9 @@ REDIS_PASSWORD = os.getenv('REDIS_PASSWORD','')
 RATE_LIMIT_DURATION_SECONDS= os.getenv('RATE_LIMIT_DURATION_SECONDS', 14400)
 RATE_LIMIT_MAX_PROMPTS = int(os.getenv('RATE_LIMIT_MAX_PROMPTS', 100))
 
+# Bearer token the metrics scraper sends to /metrics/; the endpoint is disabled while it is empty
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 INSTALLED_APPS = [
     'daphne',
     'django.contrib.admin',
@@ -73,12 +90,13 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'corsheaders',
     'channels',
+    # Must come before the project apps: documents.apps replaces its connection on ready()
+    'django_elasticsearch_dsl',
     'users',
     'conversations',
     'documents',
     'drf_spectacular',
     'drf_spectacular_sidecar',
-    'django_elasticsearch_dsl',
 ]
 
 HAYSTACK_CONNECTIONS = {
@@ -234,7 +252,7 @@ STORAGES = {
 
 ELASTICSEARCH_DSL={
     'default': {
-        'hosts': f'{ES_SCHEMA}://{ES_URL}:{ES_PORT}',
-        'http_auth': (os.environ.get('ES_USER', 'elastic'), os.environ.get('ES_PASS', '12345678'))
+        'hosts': ES_HOST,
+        'http_auth': (ES_USER, ES_PASS)
     }
 }
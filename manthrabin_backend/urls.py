@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
-from users.views import HealthCheckView
+from users.views import HealthCheckView, MetricsView
 from conversations.views import LLMModelListView
 
 
@@ -32,4 +32,5 @@ path('api/models/', LLMModelListView.as_view(), name='llm-model-list'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
     path("health/", HealthCheckView, name="health"),
+    path("metrics/", MetricsView, name="metrics"),
 ]
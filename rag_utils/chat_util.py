@@ -1,7 +1,6 @@
-from langchain_openai import ChatOpenAI
+from .llm_clients import get_chat_model
 from langchain.prompts import PromptTemplate
 from langchain.schema.output_parser import StrOutputParser
-from os import getenv
 from dotenv import load_dotenv
 
 # Example of using it in a chain
@@ -21,13 +20,7 @@ def simple_chat(
         sessionID: str,
         model: str = "google/gemini-2.0-flash-exp:free"
 ):
-    llm = llm = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0,
-        openai_api_key=getenv("OPENAI_API_KEY"),
-        # openai_api_base=getenv("OPENROUTER_BASE_URL"),
-        # model_name=model,
-    )
+    llm = get_chat_model("gpt-4o", temperature=0)
 
     chain = prompt | llm | StrOutputParser()
 
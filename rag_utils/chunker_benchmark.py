@@ -0,0 +1,97 @@
+"""
+Offline comparison of chunker settings.
+
+Splits the same pages with every chunker configuration and reports, per configuration:
+   - index size: number of chunks, stored text and vector bytes,
+   - embedding cost: tokens sent to the embeddings API,
+   - retrieval hit rate: the share of queries for which one of the top k chunks (by cosine
+     similarity, exactly as at query time but without Elasticsearch) contains the answer.
+
+Queries come as (question, answer snippet) pairs. Without labelled queries, sentences sampled
+from the pages serve as both question and answer; a sentence cut by a chunk boundary without
+enough overlap then counts as a miss.
+
+Nothing is written to the index. Chunk vectors go through the embedding store, so re-running
+with the same settings does not call the API again.
+"""
+
+import random
+import re
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .chunking import _SENTENCE
+from .embedding_cache import shorten
+from .embedding_engine import EmbeddingEngine
+from .embedding_store import EMBEDDING_STORE_ENABLED, get_store, text_digest
+from .tokens import count_tokens
+from .elastic import EMBEDDING_DIMS, INDEX_DIMS
+
+
+Query = Tuple[str, str]
+
+_MIN_QUERY_WORDS = 8
+
+
+def sample_queries(pages: List[Document], count: int, seed: int = 42) -> List[Query]:
+    sentences = []
+    for page in pages:
+        for match in _SENTENCE.finditer(page.page_content):
+            sentence = match.group().strip()
+            if len(sentence.split()) >= _MIN_QUERY_WORDS:
+                sentences.append(sentence)
+    random.Random(seed).shuffle(sentences)
+    return [(sentence, sentence) for sentence in sentences[:count]]
+
+
+def chunk_stats(chunks: List[Document], model: Optional[str] = None) -> Dict[str, int]:
+    texts = [chunk.page_content for chunk in chunks]
+    return {
+        "chunks": len(chunks),
+        "tokens": sum(count_tokens(text, model) for text in texts),
+        "text_bytes": sum(len(text.encode("utf-8")) for text in texts),
+        "vector_bytes": len(chunks) * INDEX_DIMS * 4,
+    }
+
+
+def embed_texts(texts: List[str], engine: Optional[EmbeddingEngine] = None, store: bool = True) -> np.ndarray:
+    """
+    Unit-length vectors of `texts`, shortened like the index's. Returns an (n, INDEX_DIMS) matrix.
+    """
+    engine = engine or EmbeddingEngine()
+    embedding_store = get_store(engine.model, EMBEDDING_DIMS) if store and EMBEDDING_STORE_ENABLED else None
+    digests = [text_digest(text) for text in texts]
+    vectors = embedding_store.get_many(digests) if embedding_store and texts else {}
+    missing = [i for i, digest in enumerate(digests) if digest not in vectors]
+    for offset, batch in engine.embed([texts[i] for i in missing]):
+        pairs = [(digests[missing[offset + j]], vector) for j, vector in enumerate(batch)]
+        vectors.update(pairs)
+        if embedding_store:
+            embedding_store.put_many(pairs)
+    matrix = np.asarray([shorten(vectors[digest], INDEX_DIMS) for digest in digests], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True) if len(matrix) else 1.0
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _SPACES.sub(" ", text).strip()
+
+
+def hit_rate(queries: List[Query], query_vectors: np.ndarray, chunks: List[Document],
+             chunk_vectors: np.ndarray, k: int = 10) -> float:
+    """Share of queries with their answer contained in one of the k most similar chunks."""
+    if not queries or not chunks:
+        return 0.0
+    texts = [_normalize(chunk.page_content) for chunk in chunks]
+    similarities = query_vectors @ chunk_vectors.T
+    hits = 0
+    for (_, answer), row in zip(queries, similarities):
+        top = np.argsort(-row)[:k]
+        answer = _normalize(answer)
+        hits += any(answer in texts[i] for i in top)
+    return hits / len(queries)
@@ -0,0 +1,178 @@
+"""
+Splitting extracted pages into the chunks that get embedded and indexed.
+
+Chunkers are pluggable and picked with `RAG_CHUNKER`:
+   - "tokens" (default): sizes chunks in embedding-model tokens rather than characters, so
+     Persian and English text get comparable chunks. A page is cut into paragraphs (and long
+     paragraphs into sentences, then words), which are packed into chunks of at most
+     `RAG_CHUNK_TOKENS` tokens. Headings always start a new chunk and are kept as the chunk's
+     `section`. Chunks overlap by whole trailing paragraphs / sentences, up to
+     `RAG_CHUNK_OVERLAP_TOKENS`.
+   - "characters": the previous fixed 2000-character splitter with a 500-character overlap.
+
+Chunks never cross pages and always record their `start_index` in the page, which the context
+packer uses to merge neighbouring hits. Every chunker has a `version` derived from its settings;
+chunks are re-embedded whenever it changes.
+
+Exposes:
+   - `get_chunker(name, ...)`: a configured chunker.
+   - `Chunker.split_documents(pages)`: page `Document`s -> chunk `Document`s.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Dict, Callable, Optional
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .tokens import count_tokens
+from .embedding_cache import EMBEDDING_MODEL
+
+
+RAG_CHUNKER = os.getenv("RAG_CHUNKER", "tokens")
+RAG_CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "400"))
+RAG_CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "50"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+# Sentence ends in Latin and Persian script, or a line break inside a paragraph
+_SENTENCE = re.compile(r"[^\n.!?؟]*(?:[.!?؟]+[\"'»)\]]*\s*|\n\s*|$)")
+_WORD = re.compile(r"\S+\s*")
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+\S")
+_NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVX]+\.|فصل|بخش|ماده|Chapter|Section|Article)\s+\S", re.I)
+_TERMINAL_PUNCTUATION = ".!?؟,،;؛:"
+_MAX_HEADING_CHARS = 120
+
+
+def is_heading(text: str) -> bool:
+    """A single short line that looks like a title rather than a sentence."""
+    text = text.strip()
+    if not text or "\n" in text or len(text) > _MAX_HEADING_CHARS:
+        return False
+    if _MARKDOWN_HEADING.match(text):
+        return True
+    return bool(_NUMBERED_HEADING.match(text)) and text[-1] not in _TERMINAL_PUNCTUATION
+
+
+@dataclass
+class _Unit:
+    start: int
+    end: int
+    tokens: int
+    heading: bool = False
+
+
+class TokenChunker:
+    algorithm_version = "1"
+
+    def __init__(self, chunk_tokens: int = RAG_CHUNK_TOKENS, overlap_tokens: int = RAG_CHUNK_OVERLAP_TOKENS,
+                 counter: Optional[Callable[[str], int]] = None):
+        self.chunk_tokens = max(chunk_tokens, 1)
+        self.overlap_tokens = max(min(overlap_tokens, self.chunk_tokens // 2), 0)
+        self.counter = counter or (lambda text: count_tokens(text, EMBEDDING_MODEL))
+        self.version = f"tokens-{self.algorithm_version}-{self.chunk_tokens}-{self.overlap_tokens}"
+
+    def _spans(self, text: str, pattern: re.Pattern, start: int, end: int) -> List[_Unit]:
+        units = []
+        for match in pattern.finditer(text, start, end):
+            if match.group().strip():
+                units.append(_Unit(match.start(), match.end(), self.counter(match.group())))
+        return units
+
+    def _units(self, text: str) -> List[_Unit]:
+        """Paragraphs of the page, with oversized ones broken into sentences, then word runs."""
+        units = []
+        start = 0
+        for match in list(_PARAGRAPH_BREAK.finditer(text)) + [None]:
+            end = match.start() if match else len(text)
+            paragraph = text[start:end]
+            if paragraph.strip():
+                tokens = self.counter(paragraph)
+                if tokens <= self.chunk_tokens:
+                    units.append(_Unit(start, end, tokens, is_heading(paragraph)))
+                else:
+                    for sentence in self._spans(text, _SENTENCE, start, end):
+                        if sentence.tokens <= self.chunk_tokens:
+                            units.append(sentence)
+                        else:
+                            units.extend(self._spans(text, _WORD, sentence.start, sentence.end))
+            start = match.end() if match else len(text)
+        return units
+
+    def _overlap(self, units: List[_Unit], next_tokens: int) -> List[_Unit]:
+        tail, tokens = [], 0
+        # Never carry the whole chunk over, or the split would not advance
+        for unit in reversed(units[1:]):
+            if tokens + unit.tokens > self.overlap_tokens:
+                break
+            tail.insert(0, unit)
+            tokens += unit.tokens
+        while tail and tokens + next_tokens > self.chunk_tokens:
+            tokens -= tail.pop(0).tokens
+        return tail
+
+    def split_page(self, page: Document) -> List[Document]:
+        text = page.page_content
+        chunks = []
+        section = None
+        current: List[_Unit] = []
+        current_section = None
+
+        def emit():
+            raw = text[current[0].start:current[-1].end]
+            metadata = {**page.metadata, "start_index": current[0].start + len(raw) - len(raw.lstrip())}
+            if current_section:
+                metadata["section"] = current_section
+            chunks.append(Document(page_content=raw.strip(), metadata=metadata))
+
+        for unit in self._units(text):
+            if unit.heading:
+                section = text[unit.start:unit.end].strip().lstrip("#").strip()
+            tokens = sum(u.tokens for u in current)
+            if current and (unit.heading or tokens + unit.tokens > self.chunk_tokens):
+                emit()
+                current = [] if unit.heading else self._overlap(current, unit.tokens)
+            if not current:
+                current_section = section
+            current.append(unit)
+        if current:
+            emit()
+        return chunks
+
+    def split_documents(self, pages: List[Document]) -> List[Document]:
+        return [chunk for page in pages for chunk in self.split_page(page)]
+
+
+class CharacterChunker:
+    # Chunks indexed before chunkers were configurable carry this version
+    version = "1"
+
+    def __init__(self):
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=2000,       # Maximum size of each text chunk
+            chunk_overlap=500,     # Overlap between chunks for context preservation
+            length_function=len,   # Function to determine chunk length
+            is_separator_regex=False,  # Whether the separator is a regex pattern
+            add_start_index=True,      # Record offsets so adjacent chunks can be merged at query time
+        )
+
+    def split_documents(self, pages: List[Document]) -> List[Document]:
+        return self._splitter.split_documents(pages)
+
+
+_CHUNKERS: Dict[str, Callable[..., object]] = {
+    "tokens": TokenChunker,
+    "characters": CharacterChunker,
+}
+
+
+def get_chunker(name: str = RAG_CHUNKER, **options):
+    """
+    Args:
+        name: One of the registered chunkers ("tokens", "characters").
+        options: Chunker settings, e.g. chunk_tokens / overlap_tokens for "tokens".
+    """
+    if name not in _CHUNKERS:
+        raise ValueError(f"Unknown chunker '{name}', expected one of {', '.join(_CHUNKERS)}.")
+    return _CHUNKERS[name](**options)
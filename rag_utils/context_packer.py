@@ -0,0 +1,135 @@
+"""
+Packs retrieved chunks into the prompt context under a token budget.
+
+Documents are split with overlapping chunks, so neighbouring hits from the same document repeat
+part of each other's text. Before the chunks reach the prompt the packer:
+1. drops hits scoring below a floor,
+2. merges overlapping or adjacent chunks of the same document into one passage,
+3. adds passages in relevance order until the model's context budget is used up.
+"""
+
+import os
+import json
+from typing import List, Dict, Any, Tuple, Callable, Optional
+
+from langchain_core.documents import Document
+
+from .tokens import count_tokens, truncate_to_tokens
+
+
+# Minimum retrieval score a hit needs to be used. Scores depend on RAG_RETRIEVAL_MODE:
+# kNN scores are normalized cosine similarities, hybrid scores are RRF sums.
+SCORE_FLOOR = float(os.getenv("RAG_CONTEXT_SCORE_FLOOR", "0"))
+DEFAULT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+# Per-model overrides, e.g. RAG_CONTEXT_TOKEN_BUDGETS='{"gpt-4o": 6000, "gpt-4o-mini": 4000}'
+TOKEN_BUDGETS: Dict[str, int] = json.loads(os.getenv("RAG_CONTEXT_TOKEN_BUDGETS", "{}"))
+# Shortest shared text that counts as an overlap between two chunks
+MIN_OVERLAP_CHARS = 32
+# Don't start a truncated passage with less room than this
+MIN_PASSAGE_TOKENS = 50
+
+
+def token_budget(model_name: Optional[str]) -> int:
+    return TOKEN_BUDGETS.get(model_name or "", DEFAULT_TOKEN_BUDGET)
+
+
+def _overlap(first: str, second: str) -> int:
+    """
+    Length of the longest suffix of `first` that is a prefix of `second`, 0 if below MIN_OVERLAP_CHARS.
+    """
+    if len(first) < MIN_OVERLAP_CHARS or len(second) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = second[:MIN_OVERLAP_CHARS]
+    start = max(0, len(first) - len(second))
+    position = first.find(probe, start)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
+
+
+def _join(first: Document, second: Document) -> Optional[str]:
+    """
+    Return the merged text if `second` continues `first`, otherwise None.
+    """
+    if second.page_content in first.page_content:
+        return first.page_content
+
+    overlap = _overlap(first.page_content, second.page_content)
+    if overlap:
+        return first.page_content + second.page_content[overlap:]
+
+    # Chunks that touch without overlapping, when the splitter recorded their offsets
+    first_start = first.metadata.get("start_index")
+    second_start = second.metadata.get("start_index")
+    if (first_start is not None and second_start is not None
+            and first.metadata.get("page") == second.metadata.get("page")
+            and first_start + len(first.page_content) == second_start):
+        return first.page_content + second.page_content
+    return None
+
+
+def merge_chunks(results: List[Tuple[Document, float]]) -> List[Dict[str, Any]]:
+    """
+    Merge hits of the same document whose text overlaps or touches.
+
+    Returns passages in relevance order (a passage ranks as its best hit):
+        {'document': Document, 'score': float, 'hits': [(Document, score), ...]}
+    """
+    passages: List[Dict[str, Any]] = []
+    for doc, score in results:
+        merged = False
+        for passage in passages:
+            current = passage["document"]
+            if current.metadata.get("public_id") != doc.metadata.get("public_id"):
+                continue
+            text = _join(current, doc) or _join(doc, current)
+            if text is not None:
+                passage["document"] = Document(page_content=text, metadata=current.metadata)
+                passage["hits"].append((doc, score))
+                merged = True
+                break
+        if not merged:
+            passages.append({"document": doc, "score": score, "hits": [(doc, score)]})
+    return passages
+
+
+def pack(
+    results: List[Tuple[Document, float]],
+    model_name: Optional[str] = None,
+    budget: Optional[int] = None,
+    score_floor: float = SCORE_FLOOR,
+    counter: Callable[[str], int] = None,
+    truncate: Callable[[str, int], str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Select the passages that go into the prompt.
+
+    Args:
+        results: (document, score) pairs, best first.
+        model_name: Model the prompt is built for; picks the budget and the tokenizer.
+        budget: Token budget; defaults to the model's configured budget.
+
+    Returns:
+        Passages as produced by `merge_chunks`, each with a 'text' key holding the
+        (possibly truncated) text to put in the prompt.
+    """
+    counter = counter or (lambda text: count_tokens(text, model_name))
+    truncate = truncate or (lambda text, limit: truncate_to_tokens(text, limit, model_name))
+    budget = token_budget(model_name) if budget is None else budget
+
+    kept = [(doc, score) for doc, score in results if score >= score_floor]
+    packed = []
+    remaining = budget
+    for passage in merge_chunks(kept):
+        text = passage["document"].page_content
+        tokens = counter(text)
+        if tokens > remaining:
+            if remaining < MIN_PASSAGE_TOKENS:
+                break
+            text = truncate(text, remaining)
+            tokens = remaining
+        packed.append({**passage, "text": text})
+        remaining -= tokens
+    return packed
@@ -3,24 +3,23 @@ This module generates a concise, memorable chat name based on conversation histo
 
 The overall workflow:
 1. Loads environment variables from a .env file.
-2. Initializes the OpenAI chat model (GPT-4o-mini).
+2. Uses the shared OpenAI chat model (GPT-4o-mini) from the client registry.
 3. Defines a structured system prompt that instructs the model to create a chat name.
 4. Creates a prompt template combining chat history and system instructions.
 5. Exposes a function:
    - `chat_name(history, user_favorites=None)`: Returns a generated chat name or “I don’t know.”
+   - `achat_name(history, user_favorites=None)`: Async variant for use inside the event loop.
 """
 
 import os
 from typing import List, Optional
 from dotenv import load_dotenv
 
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 
+from .llm_clients import get_chat_model
 
-# 2. Initialize the OpenAI chat model (GPT-4o-mini)
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.0, max_tokens=50)
 
 # 3. Define a structured system prompt for generating a chat name.
 system_prompt = (
@@ -40,8 +39,9 @@ prompt = ChatPromptTemplate.from_messages([
     ("human", "Based on the above, generate a concise chat name:")
 ])
 
-# Combine the template with the LLM into a single chain
-chain = prompt | llm
+# 5. Combine the template with the shared OpenAI chat model (GPT-4o-mini) into a single chain
+def _chain():
+    return prompt | get_chat_model("gpt-4o-mini", temperature=0.0, max_tokens=50)
 
 def _reformat_history(
     history: List[dict], user_role_env: str = "USER_ROLE"
@@ -78,6 +78,25 @@ def chat_name(
     :param user_favorites: (Optional) A string of user preferences or favorites to influence naming.
     :return: The generated chat name, or “I don’t know.” if no suitable name can be derived.
     """
+    conversation = _build_conversation(history, user_favorites)
+
+    # Invoke the chain with chat_history; the chain prompt already includes system instructions
+    response = _chain().invoke({"chat_history": conversation})
+    return response.content.strip()
+
+async def achat_name(
+    history: List[dict], user_favorites: Optional[str] = None
+) -> str:
+    """
+    Async variant of `chat_name`; takes the same arguments and returns the same value.
+    """
+    conversation = _build_conversation(history, user_favorites)
+    response = await _chain().ainvoke({"chat_history": conversation})
+    return response.content.strip()
+
+def _build_conversation(
+    history: List[dict], user_favorites: Optional[str] = None
+) -> List[BaseMessage]:
     # Reformat the raw history into BaseMessage objects
     conversation = _reformat_history(history)
 
@@ -88,9 +107,7 @@ def chat_name(
         pref_message = AIMessage(content=f"(User Favorites: {user_favorites})")
         conversation.insert(0, pref_message)
 
-    # Invoke the chain with chat_history; the chain prompt already includes system instructions
-    response = chain.invoke({"chat_history": conversation})
-    return response.content.strip()
+    return conversation
 
 if __name__ == "__main__":
     # Example usage when running this file directly
@@ -0,0 +1,103 @@
+"""
+Near-duplicate detection for chunks at ingest time.
+
+Revised editions and re-uploads of the same document produce chunks that differ by a few
+words. Every chunk gets a 64-bit SimHash over its word 3-shingles; two chunks whose
+fingerprints differ in at most `DEDUP_MAX_HAMMING` bits are treated as the same text, and
+the later one is linked to the indexed one instead of being embedded again.
+
+To find candidates without comparing against the whole index, a fingerprint is also stored
+as `DEDUP_BANDS` 16-bit bands. Fingerprints within 3 bits of each other always share at least
+one band, so an exact terms query on the bands, read to the end, returns every possible match.
+
+Exposes:
+   - `simhash(text)`: the fingerprint of a text.
+   - `bands(fingerprint)`: the band terms stored with a chunk and used to look up candidates.
+   - `match(fingerprints, candidates)`: pick the closest near-duplicate for each fingerprint.
+"""
+
+import os
+import hashlib
+from typing import List, Dict, Iterable, Tuple
+
+import numpy as np
+
+from .embedding_cache import normalize_text
+
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "True").lower() in ("true", "1")
+DEDUP_MAX_HAMMING = int(os.getenv("DEDUP_MAX_HAMMING", "3"))
+# Short chunks (headers, page numbers) look alike across unrelated documents
+DEDUP_MIN_CHARS = int(os.getenv("DEDUP_MIN_CHARS", "200"))
+
+DEDUP_BANDS = 4
+_BAND_BITS = 64 // DEDUP_BANDS
+_SHINGLE_WORDS = 3
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    words = normalize_text(text).split()
+    if len(words) < _SHINGLE_WORDS:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + _SHINGLE_WORDS]) for i in range(len(words) - _SHINGLE_WORDS + 1)]
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    return np.frombuffer(digests, dtype=">u8")
+
+
+def simhash(text: str) -> int:
+    hashes = _shingle_hashes(text)
+    # One row of 64 bits per shingle, most significant bit first
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+    votes = (2 * bits.astype(np.int32) - 1).sum(axis=0)
+    fingerprint = 0
+    for vote in votes:
+        fingerprint = (fingerprint << 1) | int(vote > 0)
+    return fingerprint
+
+
+def hamming(first: int, second: int) -> int:
+    return bin(first ^ second).count("1")
+
+
+def to_hex(fingerprint: int) -> str:
+    return f"{fingerprint:016x}"
+
+
+def bands(fingerprint: int) -> List[str]:
+    mask = (1 << _BAND_BITS) - 1
+    return [f"{band}:{(fingerprint >> (band * _BAND_BITS)) & mask:04x}" for band in range(DEDUP_BANDS)]
+
+
+def is_candidate(text: str) -> bool:
+    return DEDUP_ENABLED and len(text) >= DEDUP_MIN_CHARS
+
+
+def match(fingerprints: Dict[int, int], candidates: Iterable[Tuple[str, int]],
+          max_distance: int = DEDUP_MAX_HAMMING) -> Dict[int, str]:
+    """
+    Args:
+        fingerprints: Position of a chunk -> its SimHash.
+        candidates: (Elasticsearch id, SimHash) of indexed chunks sharing a band with any of them.
+            Read once, so it can stream straight from a scroll over the index.
+
+    Returns:
+        Position -> id of the closest indexed chunk within `max_distance` bits.
+    """
+    positions_by_band: Dict[str, List[int]] = {}
+    for position, fingerprint in fingerprints.items():
+        for band in bands(fingerprint):
+            positions_by_band.setdefault(band, []).append(position)
+
+    best: Dict[int, Tuple[int, str]] = {}
+    for _id, candidate in candidates:
+        # Within fewer bits than there are bands, two fingerprints always share a band
+        if max_distance < DEDUP_BANDS:
+            positions = {position for band in bands(candidate) for position in positions_by_band.get(band, ())}
+        else:
+            positions = fingerprints.keys()
+        for position in positions:
+            distance = hamming(fingerprints[position], candidate)
+            if distance <= max_distance and (position not in best or distance < best[position][0]):
+                best[position] = (distance, _id)
+    return {position: _id for position, (_, _id) in best.items()}
@@ -1,59 +1,605 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_elasticsearch import ElasticsearchStore
-
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_elasticsearch import ElasticsearchStore, AsyncElasticsearchStore
 
+import time
+import uuid
+import hashlib
+from collections import Counter
 from os import getenv
-from elasticsearch import Elasticsearch
+from typing import Callable, Optional, List, Dict, Any
+
+from elasticsearch import helpers, BadRequestError
+from langchain_core.documents import Document
+
+from manthrabin_backend import settings
+from manthrabin_backend.connections import get_es_client, get_async_es_client
+from .embedding_cache import get_embeddings, shorten
+from .embedding_engine import EmbeddingEngine
+from .embedding_store import EMBEDDING_STORE_ENABLED, get_store
+from .embedding_cache import EMBEDDING_MODEL
+from . import semantic_cache, parsers, dedup, chunking, resilience
 
 
-es_client = Elasticsearch(hosts=[f"{getenv('ES_SCHEMA')}://{getenv('ES_URL')}:{getenv('ES_PORT')}"])
 index_name = getenv('ES_INDEX', 'manthrabin')
-if not es_client.indices.exists(index=index_name):
-    es_client.indices.create(index=index_name)
+# Dimensions returned by the embedding model; the embedding store keeps vectors at this size
+EMBEDDING_DIMS = 1536
+# Dimensions of the vectors in the kNN index. Fewer dims shrink the HNSW graph and vectors several
+# times over; retrieval then rescores the top hits with the full vectors, see `rescoring`.
+# Changing it changes the mapping, so it only takes effect once the index is rebuilt.
+INDEX_DIMS = int(getenv('EMBEDDING_INDEX_DIMS', str(EMBEDDING_DIMS)))
+# Pages held in memory at once while ingesting a document
+INGESTION_WINDOW_PAGES = int(getenv('INGESTION_WINDOW_PAGES', '16'))
+# Changes with the chunker settings (RAG_CHUNKER, RAG_CHUNK_TOKENS, ...), so every chunk is re-embedded
+# on the next ingestion after they change
+CHUNKER_VERSION = chunking.get_chunker().version
+_CHUNK_ID_NAMESPACE = uuid.UUID('5d1c4f0e-8f0a-4f43-9a55-6c3f2b1e7a10')
+
+# Bump whenever INDEX_MAPPINGS or INDEX_SETTINGS change; indexes built afterwards pick up the new template
+INDEX_TEMPLATE_VERSION = 2
+# Vector files worth keeping in memory per index type: the HNSW graph and the vectors it is searched with
+_VECTOR_PRELOAD = {
+    "hnsw": ["vex", "vec"],
+    "int8_hnsw": ["vex", "veq"],
+    "int4_hnsw": ["vex", "veq"],
+    "bbq_hnsw": ["vex", "veb"],
+}
+
+
+def vector_mapping(index_type: str = settings.ES_VECTOR_INDEX_TYPE) -> Dict[str, Any]:
+    return {
+        "type": "dense_vector",
+        "dims": INDEX_DIMS,
+        "index": True,
+        "similarity": "cosine",
+        "index_options": {
+            "type": index_type,
+            "m": settings.ES_VECTOR_HNSW_M,
+            "ef_construction": settings.ES_VECTOR_HNSW_EF_CONSTRUCTION,
+        },
+    }
+
+
+# Field names follow the LangChain ElasticsearchStore defaults
+INDEX_MAPPINGS = {
+    "properties": {
+        "text": {"type": "text"},
+        "vector": vector_mapping(),
+        "metadata": {
+            "type": "object",
+            "properties": {
+                "public_id": {"type": "keyword"},
+                "content_hash": {"type": "keyword"},
+                "chunker_version": {"type": "keyword"},
+                "simhash": {"type": "keyword"},
+                "simhash_bands": {"type": "keyword"},
+                # Documents whose near-duplicate chunks were linked to this one instead of indexed
+                "linked_public_ids": {"type": "keyword"},
+            },
+        },
+    }
+}
+
+INDEX_SETTINGS = {
+    "index": {
+        "store": {"preload": settings.ES_VECTOR_PRELOAD or _VECTOR_PRELOAD.get(settings.ES_VECTOR_INDEX_TYPE, [])},
+    }
+}
+
+_vector_store = None
+_async_vector_store = None
+
+
+def get_vector_store() -> ElasticsearchStore:
+    """Returns the shared vector store, built on the pooled client on first use."""
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = ElasticsearchStore(
+            index_name=index_name,
+            embedding=get_embeddings(EMBEDDING_MODEL, INDEX_DIMS),
+            es_connection=get_es_client(),
+        )
+    return _vector_store
+
+
+def get_async_vector_store() -> AsyncElasticsearchStore:
+    """Returns the shared vector store over the async client."""
+    global _async_vector_store
+    if _async_vector_store is None:
+        _async_vector_store = AsyncElasticsearchStore(
+            index_name=index_name,
+            embedding=get_embeddings(EMBEDDING_MODEL, INDEX_DIMS),
+            es_connection=get_async_es_client(),
+        )
+    return _async_vector_store
+
+
+def knn_search(question: str, k: int, filters: Optional[List[Dict[str, Any]]] = None):
+    """kNN search of the chunk index through the Elasticsearch circuit breaker. Returns (document, score) pairs."""
+    with resilience.elasticsearch.guard():
+        return get_vector_store().similarity_search_with_score(query=question, k=k, filter=filters)
+
+
+async def aknn_search(question: str, k: int, filters: Optional[List[Dict[str, Any]]] = None):
+    """Async variant of `knn_search`."""
+    with resilience.elasticsearch.guard():
+        return await get_async_vector_store().asimilarity_search_with_score(query=question, k=k, filter=filters)
+
+
+def versioned_index_name(version: str) -> str:
+    return f"{index_name}-v{version}"
+
+
+def ensure_index():
+    """Creates the vector index if it is missing. Run once at deployment, not per request.
+
+    `index_name` is an alias: the first index is created as `<index_name>-v1` behind it, and
+    `rebuild_vector_index` later swaps the alias to rebuilt indexes without downtime.
+
+    Returns:
+        bool: True if the index was created.
+    """
+    client = get_es_client()
+    # True for the alias, and for indexes created before the alias was introduced
+    if client.indices.exists(index=index_name):
+        return False
+    try:
+        create_index(versioned_index_name('1'), alias=True)
+    except BadRequestError as e:
+        # Another ingestion worker created it in the meantime
+        if e.error != 'resource_already_exists_exception':
+            raise
+        return False
+    return True
+
+
+def put_index_template() -> None:
+    """Installs the template every versioned index behind the `index_name` alias is created from."""
+    get_es_client().indices.put_index_template(
+        name=index_name,
+        index_patterns=[versioned_index_name('*')],
+        version=INDEX_TEMPLATE_VERSION,
+        template={"settings": INDEX_SETTINGS, "mappings": INDEX_MAPPINGS},
+    )
+
+
+def create_index(name: str, alias: bool = False, settings: Optional[Dict[str, Any]] = None) -> None:
+    """Creates a concrete vector index from the current template, optionally already behind the alias.
+
+    `settings` are applied on top of the template's, e.g. to disable refreshes during a bulk load.
+    """
+    put_index_template()
+    get_es_client().indices.create(
+        index=name, settings=settings,
+        aliases={index_name: {"is_write_index": True}} if alias else None,
+    )
+
+
+def aliased_indexes() -> List[str]:
+    """Concrete indexes currently served under `index_name`; the index itself if it is not an alias yet."""
+    client = get_es_client()
+    if client.indices.exists_alias(name=index_name):
+        return sorted(client.indices.get_alias(name=index_name))
+    if client.indices.exists(index=index_name):
+        return [index_name]
+    return []
+
+
+def swap_alias(new_index: str) -> List[str]:
+    """Atomically points the `index_name` alias at `new_index`.
+
+    Searches go on hitting the previous index until the swap, and the new one right after it. A
+    pre-alias index called `index_name` is deleted in the same request, since an alias cannot
+    share its name; other previous indexes are kept for the caller to drop.
+
+    Returns:
+        List[str]: Indexes the alias pointed to before and that still exist.
+    """
+    previous = aliased_indexes()
+    actions = [{"add": {"index": new_index, "alias": index_name, "is_write_index": True}}]
+    for old in previous:
+        if old == index_name:
+            actions.insert(0, {"remove_index": {"index": old}})
+        elif old != new_index:
+            actions.append({"remove": {"index": old, "alias": index_name}})
+    get_es_client().indices.update_aliases(actions=actions)
+    semantic_cache.invalidate()
+    return [old for old in previous if old not in (new_index, index_name)]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_id(public_id: str, digest: str, occurrence: int) -> str:
+    """Stable Elasticsearch id of a chunk: the same text of the same document always maps to the same id.
+
+    `occurrence` tells apart identical chunks repeated within one document.
+    """
+    return str(uuid.uuid5(_CHUNK_ID_NAMESPACE, f"{public_id}:{CHUNKER_VERSION}:{digest}:{occurrence}"))
+
+
+def _keyword_query(field: str, values: List[str]) -> Dict[str, Any]:
+    # Indexes created before these metadata fields were mapped as keyword only have the dynamic .keyword subfield
+    return {
+        "bool": {
+            "should": [
+                {"terms": {field: values}},
+                {"terms": {f"{field}.keyword": values}},
+            ],
+            "minimum_should_match": 1,
+        }
+    }
+
+
+def _document_query(public_id: str) -> Dict[str, Any]:
+    return _keyword_query("metadata.public_id", [public_id])
+
+
+def existing_chunks(public_id: str, index: str = index_name) -> Dict[str, Dict[str, Any]]:
+    """Returns the metadata of every indexed chunk of a document, keyed by Elasticsearch id."""
+    hits = helpers.scan(get_es_client(), index=index, query={"query": _document_query(public_id)},
+                        _source=["metadata"])
+    return {hit["_id"]: hit["_source"].get("metadata", {}) for hit in hits}
+
 
-embeddings = OpenAIEmbeddings(model='text-embedding-3-small')
+def _own_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    # Links are maintained by other documents' ingestion, not by the chunk's own
+    return {key: value for key, value in metadata.items() if key != "linked_public_ids"}
 
-vector_store = ElasticsearchStore(
-    es_url=f"{getenv('ES_SCHEMA')}://{getenv('ES_URL')}:{getenv('ES_PORT')}",
-    index_name=getenv('ES_INDEX', 'manthrabin'),
-    embedding=embeddings,
-    es_user=getenv('ES_USER'),
-    es_password=getenv('ES_PASS'),
-    es_params={"verify_certs": False}
-)
 
+def diff_chunks(chunks: List[Document], ids: List[str], existing: Dict[str, Dict[str, Any]]):
+    """Compares freshly split chunks with the indexed ones.
 
-def add_docs_pipeline(file_path: str, public_id: str):
-    """Processes a PDF file, splits its content, and adds it to the vector store.
+    Returns:
+        tuple: Positions of chunks to embed, positions of kept chunks whose metadata changed
+            (e.g. moved to another page), and ids of indexed chunks to delete.
+    """
+    new = [i for i, _id in enumerate(ids) if _id not in existing]
+    moved = [i for i, _id in enumerate(ids) if _id in existing and _own_metadata(existing[_id]) != chunks[i].metadata]
+    stale = set(existing) - set(ids)
+    return new, moved, stale
+
+
+def add_docs_pipeline(file_path: str, public_id: str, progress: Optional[Callable[..., None]] = None,
+                      index: str = index_name, refresh: bool = True) -> Dict[str, Any]:
+    """Extracts a document page by page, splits its content, and syncs its chunks with the vector store.
+
+    Any format in `parsers.SUPPORTED_EXTENSIONS` is accepted. Text is extracted in the parser
+    process pool and processed in windows of `INGESTION_WINDOW_PAGES`, so for PDFs memory use
+    does not grow with the size of the document. Other formats are still parsed whole in a single
+    parser task and only windowed afterwards. Chunks already indexed for this document with
+    the same content hash and chunker version are kept as they are; only new chunks are embedded
+    and only chunks no longer present are deleted. New chunks that are near-duplicates of chunks
+    of other documents are linked to those instead of being embedded, see `dedup`.
 
     Args:
-        file_path (str): The path to the PDF file to be processed.
+        file_path (str): The path to the file to be processed.
+        public_id (str): Public id of the `Document` the chunks belong to.
+        progress (callable, optional): Called with keyword counters (pages_parsed, chunks_total,
+            chunks_embedded, chunks_indexed, chunks_per_second, chunks_unchanged, chunks_deleted,
+            chunks_deduplicated, bytes_saved, embedding_calls_saved, embeddings_reused) as the work
+            advances.
+        index (str): Index or alias to write to; the live alias by default.
+        refresh (bool): Make the changes searchable before returning. Bulk loads turn this off
+            and refresh on their own schedule.
+
+    Returns:
+        dict: 'chunk_ids', the ids of the chunks the document owns, and 'transferred', the ids of
+            dropped chunks handed over to documents linking to them, keyed by their new owner.
     """
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
+    progress = progress or (lambda **counters: None)
+
+    chunker = chunking.get_chunker()
+
+    if index == index_name:
+        ensure_index()
+    client = get_es_client()
+    existing = existing_chunks(public_id, index)
+    seen = set()
+    occurrences = Counter()
+    linked = set()
+    owned = []
+    pages_parsed = embedded = reused = moved_count = deduplicated = bytes_saved = 0
+    started = time.monotonic()
+    # Counters of the index_chunks call of the current window
+    window = {}
+
+    def on_batch(chunks_embedded, chunks_indexed, chunks_per_second, embeddings_reused):
+        window['embeddings_reused'] = embeddings_reused
+        done = embedded + chunks_embedded
+        elapsed = max(time.monotonic() - started, 1e-6)
+        progress(chunks_embedded=done, chunks_indexed=done, chunks_per_second=round(done / elapsed, 2),
+                 embeddings_reused=reused + embeddings_reused)
+
+    for pages in parsers.iter_page_windows(file_path, INGESTION_WINDOW_PAGES):
+        pages_parsed += len(pages)
+        progress(pages_parsed=pages_parsed)
+
+        # Pages are split independently, so windowing yields the same chunks as splitting the whole file
+        chunks = chunker.split_documents(pages)
+        ids = []
+        for chunk in chunks:
+            digest = content_hash(chunk.page_content)
+            fingerprint = dedup.simhash(chunk.page_content)
+            chunk.metadata.update(public_id=public_id, content_hash=digest, chunker_version=CHUNKER_VERSION,
+                                  simhash=dedup.to_hex(fingerprint), simhash_bands=dedup.bands(fingerprint))
+            ids.append(chunk_id(public_id, digest, occurrences[digest]))
+            occurrences[digest] += 1
+        seen.update(ids)
+        progress(chunks_total=len(seen))
+
+        new, moved, _ = diff_chunks(chunks, ids, existing)
+        duplicates = find_near_duplicates(chunks, new, public_id, index)
+        if duplicates:
+            helpers.bulk(client, _link_actions(set(duplicates.values()), public_id, index))
+            linked.update(duplicates.values())
+            deduplicated += len(duplicates)
+            new = [i for i in new if i not in duplicates]
+            # Every skipped chunk saves its embedding input, its vector and its stored text
+            bytes_saved += sum(len(chunks[i].page_content.encode('utf-8')) + INDEX_DIMS * 4 for i in duplicates)
+            progress(chunks_deduplicated=deduplicated, bytes_saved=bytes_saved, embedding_calls_saved=deduplicated)
+        owned.extend(_id for i, _id in enumerate(ids) if i not in duplicates)
+        window.clear()
+        index_chunks([chunks[i] for i in new], on_batch, ids=[ids[i] for i in new], refresh=False, index=index)
+        reused += window.get('embeddings_reused', 0)
+        helpers.bulk(client, _metadata_updates([chunks[i] for i in moved], [ids[i] for i in moved], index))
+        embedded += len(new)
+        moved_count += len(moved)
+
+    stale = set(existing) - seen
+    transferred = _transfer_linked({"ids": {"values": list(stale)}}, index) if stale else {}
+    kept = {_id for ids in transferred.values() for _id in ids}
+    helpers.bulk(client, ({"_op_type": "delete", "_index": index, "_id": _id} for _id in stale - kept))
+    unlinked = _unlink(public_id, keep=linked, index=index, refresh=refresh)
+    progress(chunks_unchanged=len(seen) - embedded - deduplicated, chunks_deleted=len(stale))
+
+    if embedded or moved_count or stale or deduplicated or unlinked:
+        if refresh:
+            # Make the changes searchable right away, as ElasticsearchStore.add_documents did
+            client.indices.refresh(index=index)
+        if index == index_name:
+            semantic_cache.invalidate()
+    return {"chunk_ids": owned, "transferred": transferred}
+
+
+def find_near_duplicates(chunks: List[Document], positions: List[int], public_id: str,
+                         index: str = index_name) -> Dict[int, str]:
+    """Finds indexed chunks of other documents that are near-duplicates of the given chunks.
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,       # Maximum size of each text chunk
-        chunk_overlap=500,     # Overlap between chunks for context preservation
-        length_function=len,   # Function to determine chunk length
-        is_separator_regex=False,  # Whether the separator is a regex pattern
+    Returns:
+        Dict[int, str]: Position of a chunk -> Elasticsearch id of its near-duplicate.
+    """
+    fingerprints = {i: int(chunks[i].metadata["simhash"], 16) for i in positions
+                    if dedup.is_candidate(chunks[i].page_content)}
+    if not fingerprints:
+        return {}
+    band_terms = sorted({band for i in fingerprints for band in chunks[i].metadata["simhash_bands"]})
+    query = {
+        "bool": {
+            "filter": [_keyword_query("metadata.simhash_bands", band_terms)],
+            "must_not": [_document_query(public_id)],
+        }
+    }
+    # Common bands can match many chunks; scroll through all of them so no near-duplicate is missed
+    hits = helpers.scan(get_es_client(), index=index, query={"query": query}, _source=["metadata.simhash"],
+                        size=1000)
+    candidates = ((hit["_id"], int(hit["_source"]["metadata"]["simhash"], 16))
+                  for hit in hits if hit["_source"].get("metadata", {}).get("simhash"))
+    return dedup.match(fingerprints, candidates)
+
+
+_LINK_SCRIPT = """
+if (ctx._source.metadata.linked_public_ids == null) { ctx._source.metadata.linked_public_ids = []; }
+if (ctx._source.metadata.linked_public_ids.contains(params.public_id)) { ctx.op = 'noop'; }
+else { ctx._source.metadata.linked_public_ids.add(params.public_id); }
+"""
+_UNLINK_SCRIPT = """
+String publicId = params.public_id;
+ctx._source.metadata.linked_public_ids.removeIf(id -> id == publicId);
+"""
+# A released chunk that other documents link to is handed to the first of them instead of deleted
+_TRANSFER_SCRIPT = """
+ctx._source.metadata.public_id = ctx._source.metadata.linked_public_ids.remove(0);
+"""
+
+
+def _link_actions(chunk_ids, public_id: str, index: str = index_name):
+    for _id in chunk_ids:
+        yield {"_op_type": "update", "_index": index, "_id": _id,
+               "script": {"source": _LINK_SCRIPT, "params": {"public_id": public_id}}}
+
+
+def _unlink(public_id: str, keep=(), index: str = index_name, refresh: bool = True) -> int:
+    """Removes `public_id` from the links of every chunk except those in `keep`. Returns the count."""
+    query = {"bool": {"filter": [_keyword_query("metadata.linked_public_ids", [public_id])]}}
+    if keep:
+        query["bool"]["must_not"] = [{"ids": {"values": list(keep)}}]
+    response = get_es_client().update_by_query(
+        index=index, query=query, refresh=refresh, conflicts="proceed",
+        script={"source": _UNLINK_SCRIPT, "params": {"public_id": public_id}},
     )
+    return response.get("updated", 0)
 
-    split_chunks = text_splitter.split_documents(docs)
 
-    for chunk in split_chunks:
-        chunk.metadata["public_id"] = public_id
+_LINKED = {"exists": {"field": "metadata.linked_public_ids"}}
 
-    return vector_store.add_documents(documents=split_chunks)
 
+def _transfer_linked(query: Dict[str, Any], index: str = index_name) -> Dict[str, List[str]]:
+    """Hands chunks matching `query` that other documents link to over to the first of them.
+
+    Returns:
+        Dict[str, List[str]]: New owner public id -> ids of the chunks it now owns.
+    """
+    es = get_es_client()
+    transfers: Dict[str, List[str]] = {}
+    hits = helpers.scan(es, index=index, query={"query": {"bool": {"filter": [query, _LINKED]}}},
+                        _source=["metadata.linked_public_ids"])
+    for hit in hits:
+        transfers.setdefault(hit["_source"]["metadata"]["linked_public_ids"][0], []).append(hit["_id"])
+    if transfers:
+        es.update_by_query(
+            index=index, refresh=True, conflicts="proceed", script={"source": _TRANSFER_SCRIPT},
+            query={"ids": {"values": [_id for ids in transfers.values() for _id in ids]}},
+        )
+    return transfers
 
-def delete_docs_pipeline(public_id: str):
-    es = vector_store.client
-    body = {
-        "query": {
-            "term": { "metadata.public_id": public_id }
+
+def _bulk_actions(chunks: List[Document], vectors: List[List[float]], ids: List[str], index: str = index_name):
+    # Same document shape as ElasticsearchStore.add_documents, so retrieval is unaffected
+    for chunk, vector, _id in zip(chunks, vectors, ids):
+        yield {
+            "_op_type": "index",
+            "_index": index,
+            "_id": _id,
+            "text": chunk.page_content,
+            "vector": shorten(vector, INDEX_DIMS),
+            "metadata": chunk.metadata,
         }
+
+
+def _metadata_updates(chunks: List[Document], ids: List[str], index: str = index_name):
+    for chunk, _id in zip(chunks, ids):
+        yield {"_op_type": "update", "_index": index, "_id": _id, "doc": {"metadata": chunk.metadata}}
+
+
+def index_chunks(
+    chunks: List[Document],
+    progress: Optional[Callable[..., None]] = None,
+    ids: Optional[List[str]] = None,
+    refresh: bool = True,
+    index: str = index_name,
+) -> List[str]:
+    """Embeds chunks with the batched engine and bulk-indexes each batch as soon as it is embedded.
+
+    Vectors already in the local embedding store are indexed without calling the API, and
+    every vector fetched from the API is added to the store.
+
+    Args:
+        chunks (List[Document]): Chunks to index.
+        progress (callable, optional): Called with chunks_embedded, chunks_indexed,
+            chunks_per_second and embeddings_reused after every batch.
+        ids (List[str], optional): Elasticsearch ids for the chunks; random ids by default.
+        refresh (bool): Refresh the index once everything is written.
+        index (str): Index or alias to write to.
+
+    Returns:
+        List[str]: Elasticsearch ids of the indexed chunks, in input order.
+    """
+    progress = progress or (lambda **counters: None)
+
+    client = get_es_client()
+    engine = EmbeddingEngine()
+    ids = ids or [str(uuid.uuid4()) for _ in chunks]
+    digests = [chunk.metadata.get("content_hash") or content_hash(chunk.page_content) for chunk in chunks]
+    store = get_store(engine.model, EMBEDDING_DIMS) if EMBEDDING_STORE_ENABLED else None
+    stored = store.get_many(digests) if store and chunks else {}
+
+    started = time.monotonic()
+    done = 0
+
+    def write(positions: List[int], vectors: List[List[float]]):
+        nonlocal done
+        helpers.bulk(client, _bulk_actions([chunks[i] for i in positions], vectors, [ids[i] for i in positions],
+                                           index))
+        done += len(positions)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        progress(chunks_embedded=done, chunks_indexed=done, chunks_per_second=round(done / elapsed, 2),
+                 embeddings_reused=len(reused))
+
+    reused = [i for i, digest in enumerate(digests) if digest in stored]
+    for start in range(0, len(reused), engine.batch_size):
+        positions = reused[start:start + engine.batch_size]
+        write(positions, [stored[digests[i]] for i in positions])
+
+    missing = [i for i, digest in enumerate(digests) if digest not in stored]
+    for offset, vectors in engine.embed([chunks[i].page_content for i in missing]):
+        positions = missing[offset:offset + len(vectors)]
+        if store:
+            store.put_many(zip([digests[i] for i in positions], vectors))
+        write(positions, vectors)
+
+    if refresh and chunks:
+        client.indices.refresh(index=index)
+    return ids
+
+
+def backfill_embedding_store(index: str = index_name, batch_size: int = 500) -> int:
+    """Copies the vectors of an existing index into the local embedding store.
+
+    Lets chunks indexed before the store existed be re-indexed without calling the API.
+
+    Returns:
+        int: Number of vectors added to the store.
+    """
+    store = get_store(EMBEDDING_MODEL, EMBEDDING_DIMS)
+    added = 0
+    batch = []
+    for hit in helpers.scan(get_es_client(), index=index, query={"query": {"match_all": {}}},
+                            _source=["text", "vector"], size=batch_size):
+        source = hit["_source"]
+        if source.get("text") and source.get("vector"):
+            batch.append((content_hash(source["text"]), source["vector"]))
+        if len(batch) >= batch_size:
+            added += store.put_many(batch)
+            batch = []
+    return added + store.put_many(batch)
+
+
+def delete_docs(public_id: str, chunk_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Releases a document's links and deletes its chunks; runs in the ingestion worker.
+
+    Chunks other documents link to are handed over to the first of them instead of deleted.
+    The recorded chunk ids are then deleted in bulk; without them the chunks are matched by
+    `metadata.public_id` in a sliced, asynchronous delete-by-query task. Running it again after
+    an interruption is safe: handed-over chunks no longer belong to the document.
+
+    Args:
+        public_id (str): Public id of the deleted `Document`.
+        chunk_ids (List[str], optional): Ids recorded at ingestion.
+
+    Returns:
+        dict: 'task', the Elasticsearch task id to poll with `delete_task_status`, or None when
+            the chunks were deleted by id; 'deleted', the number of chunks deleted by id; and
+            'transferred', chunks handed over to documents linking to them, keyed by new owner.
+    """
+    es = get_es_client()
+    query = _document_query(public_id)
+    if chunk_ids:
+        query = {"bool": {"filter": [{"ids": {"values": chunk_ids}}, query]}}
+    _unlink(public_id)
+    transferred = _transfer_linked(query)
+    # A chunk handed over to its only linking document is left with an empty
+    # `linked_public_ids`, which `_LINKED` no longer matches, so exclude transfers by id
+    kept = {chunk for chunks in transferred.values() for chunk in chunks}
+    task, deleted = None, 0
+    if chunk_ids:
+        hits = helpers.scan(es, index=index_name, _source=False,
+                            query={"query": {"bool": {"filter": [query], "must_not": [_LINKED]}}})
+        deleted, _ = helpers.bulk(es, ({"_op_type": "delete", "_index": index_name, "_id": hit["_id"]}
+                                       for hit in hits if hit["_id"] not in kept),
+                                  ignore_status=(404,), refresh=True)
+    else:
+        must_not = [_LINKED] + ([{"ids": {"values": sorted(kept)}}] if kept else [])
+        task = es.delete_by_query(
+            index=index_name, query={"bool": {"filter": [query], "must_not": must_not}},
+            slices="auto", conflicts="proceed", refresh=True, wait_for_completion=False,
+        )["task"]
+    semantic_cache.invalidate()
+    return {"task": task, "deleted": deleted, "transferred": transferred}
+
+
+def delete_task_status(task_id: str) -> Dict[str, Any]:
+    """Progress of a delete-by-query task started by `delete_docs`.
+
+    Returns:
+        dict: 'completed', 'total', 'deleted' and 'error' (None on success).
+    """
+    response = get_es_client().tasks.get(task_id=task_id)
+    status = response["task"].get("status", {})
+    error = response.get("error")
+    failures = response.get("response", {}).get("failures")
+    return {
+        "completed": response["completed"],
+        "total": status.get("total", 0),
+        "deleted": status.get("deleted", 0),
+        "error": str(error or failures) if (error or failures) else None,
     }
-    return es.delete_by_query(index=getenv("ES_INDEX", "manthrabin"), body=body)
@@ -0,0 +1,254 @@
+"""
+Two-tier cache for query embeddings.
+
+Every chat message embeds the question before the kNN query. The same questions come back
+over and over, so query vectors are kept in an in-process LRU and in Redis (shared by all
+workers), keyed by the embedding model name and the normalized question text. Cache misses
+go to the API through the OpenAI embeddings circuit breaker, see `resilience`.
+
+Exposes:
+   - `CachedEmbeddings`: a LangChain `Embeddings` wrapper that caches `embed_query` / `aembed_query`.
+   - `get_embeddings(model, dims)`: the process-wide cached embeddings instance for a model,
+     optionally shortened to `dims` dimensions.
+   - `shorten(vector, dims)`: cut an embedding to its first `dims` dimensions.
+   - `cache_stats()`: hit / miss counters for both tiers.
+   - `metrics()`: the same counters as Prometheus text, served on `/metrics/`.
+"""
+
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+import numpy as np
+import redis
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from manthrabin_backend.connections import get_redis_client, get_sync_redis_client
+from .llm_clients import get_http_client, get_async_http_client
+from . import resilience
+
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+LOCAL_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+REDIS_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_WHITESPACE = re.compile(r"\s+")
+# Arabic code points commonly typed in place of their Persian counterparts, and the
+# zero-width non-joiner that users type inconsistently
+_PERSIAN_CHARS = str.maketrans({"\u064a": "\u06cc", "\u0643": "\u06a9", "\u200c": None})
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a question so trivially different spellings share one cache entry.
+    """
+    text = unicodedata.normalize("NFKC", text).translate(_PERSIAN_CHARS)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def cache_key(text: str, model: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"embedding:{model}:{digest}"
+
+
+class _LRU:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: List[float]) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self._values[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._values)
+
+
+_counters = _Counters()
+
+
+def _encode(vector: List[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _decode(raw: bytes) -> List[float]:
+    return np.frombuffer(raw, dtype=np.float32).tolist()
+
+
+def shorten(vector: List[float], dims: Optional[int]) -> List[float]:
+    """
+    Keep the first `dims` dimensions of an embedding and rescale it to unit length.
+
+    text-embedding-3 models are trained so that this gives the same vector as requesting
+    `dimensions=dims` from the API, so full vectors can be fetched and stored once and
+    shortened for the index.
+    """
+    if not dims or dims >= len(vector):
+        return vector
+    head = np.asarray(vector[:dims], dtype=np.float32)
+    norm = float(np.linalg.norm(head))
+    return (head / norm).tolist() if norm else head.tolist()
+
+
+class ShortenedEmbeddings(Embeddings):
+    """
+    Wraps an `Embeddings` instance and shortens every vector it returns to `dims` dimensions.
+    """
+
+    def __init__(self, embeddings: Embeddings, dims: int):
+        self.embeddings = embeddings
+        self.dims = dims
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [shorten(vector, self.dims) for vector in self.embeddings.embed_documents(texts)]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [shorten(vector, self.dims) for vector in await self.embeddings.aembed_documents(texts)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return shorten(self.embeddings.embed_query(text), self.dims)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return shorten(await self.embeddings.aembed_query(text), self.dims)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an `Embeddings` instance and caches query vectors locally and in Redis.
+
+    Document embeddings are passed through untouched.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, local_size: int = LOCAL_CACHE_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self._local = _LRU(local_size)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = cache_key(text, self.model)
+        vector = self._local.get(key)
+        if vector is not None:
+            _counters.incr("local_hits")
+            return vector
+
+        try:
+            raw = get_sync_redis_client().get(key)
+        except redis.RedisError as e:
+            print(f"Embedding cache unavailable: {e}")
+            raw = None
+        if raw is not None:
+            _counters.incr("redis_hits")
+            vector = _decode(raw)
+            self._local.set(key, vector)
+            return vector
+
+        _counters.incr("misses")
+        with resilience.openai_embeddings.guard():
+            vector = self.embeddings.embed_query(text)
+        self._local.set(key, vector)
+        try:
+            get_sync_redis_client().set(key, _encode(vector), ex=REDIS_CACHE_TTL_SECONDS)
+        except redis.RedisError as e:
+            print(f"Embedding cache unavailable: {e}")
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = cache_key(text, self.model)
+        vector = self._local.get(key)
+        if vector is not None:
+            _counters.incr("local_hits")
+            return vector
+
+        try:
+            raw = await get_redis_client().get(key)
+        except redis.RedisError as e:
+            print(f"Embedding cache unavailable: {e}")
+            raw = None
+        if raw is not None:
+            _counters.incr("redis_hits")
+            vector = _decode(raw)
+            self._local.set(key, vector)
+            return vector
+
+        _counters.incr("misses")
+        with resilience.openai_embeddings.guard():
+            vector = await self.embeddings.aembed_query(text)
+        self._local.set(key, vector)
+        try:
+            await get_redis_client().set(key, _encode(vector), ex=REDIS_CACHE_TTL_SECONDS)
+        except redis.RedisError as e:
+            print(f"Embedding cache unavailable: {e}")
+        return vector
+
+
+_instances: Dict[str, CachedEmbeddings] = {}
+_instances_lock = threading.Lock()
+
+
+def get_embeddings(model: str = EMBEDDING_MODEL, dims: Optional[int] = None) -> Embeddings:
+    """
+    Return the process-wide cached embeddings for `model`, creating it on first use.
+
+    With `dims`, vectors are shortened to that many dimensions; the cache keeps full vectors,
+    so full and shortened lookups of the same question share one entry.
+    """
+    with _instances_lock:
+        if model not in _instances:
+            openai_embeddings = OpenAIEmbeddings(model=model, http_client=get_http_client(),
+                                                 http_async_client=get_async_http_client())
+            _instances[model] = CachedEmbeddings(openai_embeddings, model)
+        embeddings = _instances[model]
+    return ShortenedEmbeddings(embeddings, dims) if dims else embeddings
+
+
+def cache_stats() -> Dict[str, int]:
+    """
+    Hit / miss counters of this process since start-up.
+    """
+    return _counters.snapshot()
+
+
+def metrics() -> str:
+    """
+    Cache counters of this process in the Prometheus text exposition format.
+    """
+    name = "rag_embedding_cache_lookups_total"
+    lines = [
+        f"# HELP {name} Query embedding lookups by outcome (local hit, Redis hit or miss).",
+        f"# TYPE {name} counter",
+    ]
+    lines.extend(f'{name}{{result="{result}"}} {value}' for result, value in cache_stats().items())
+    return "\n".join(lines) + "\n"
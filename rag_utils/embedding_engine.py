@@ -0,0 +1,169 @@
+"""
+Batched embedding of document chunks for ingestion.
+
+Chunks are sent to the embeddings endpoint in batches of `EMBEDDING_BATCH_SIZE` texts, with up
+to `EMBEDDING_CONCURRENCY` batches in flight. Rate limiting is handled here rather than by the
+SDK: the `x-ratelimit-*` / `retry-after` headers of every response feed a gate shared by all
+in-flight batches, so one 429 pauses the whole engine instead of every thread hammering the
+provider with its own retries.
+
+Exposes:
+   - `EmbeddingEngine`: `embed(texts)` yields `(offset, vectors)` per batch as batches complete.
+   - `parse_duration(value)` / `retry_delay(headers, attempt)`: header parsing helpers.
+"""
+
+import os
+import re
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Iterator, Tuple, Optional, Mapping
+
+import openai
+
+from .llm_clients import get_http_client
+from .embedding_cache import EMBEDDING_MODEL
+
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))
+EMBEDDING_BACKOFF_BASE_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_BASE_SECONDS", "1"))
+EMBEDDING_BACKOFF_MAX_SECONDS = float(os.getenv("EMBEDDING_BACKOFF_MAX_SECONDS", "60"))
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Errors worth retrying; anything else (bad input, auth) fails the batch immediately
+_TRANSIENT_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a rate-limit reset value such as "20ms", "1.5s", "6m0s" or a bare number of seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def _header_delay(headers: Mapping[str, str]) -> Optional[float]:
+    retry_after_ms = parse_duration(headers.get("retry-after-ms"))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    delays = [parse_duration(headers.get(name)) for name in
+              ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    delays = [delay for delay in delays if delay is not None]
+    return max(delays) if delays else None
+
+
+def retry_delay(headers: Mapping[str, str], attempt: int) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based): what the provider asked for,
+    otherwise exponential backoff with jitter.
+    """
+    delay = _header_delay(headers)
+    if delay is None:
+        delay = EMBEDDING_BACKOFF_BASE_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.0)
+    return min(delay, EMBEDDING_BACKOFF_MAX_SECONDS)
+
+
+class _RateLimitGate:
+    """A pause shared by all batches of one engine."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def remaining(self) -> float:
+        with self._lock:
+            return max(self._resume_at - time.monotonic(), 0.0)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Hold back further requests when a successful response says the quota is used up."""
+        if headers.get("x-ratelimit-remaining-requests") == "0":
+            self.pause(parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0)
+        if headers.get("x-ratelimit-remaining-tokens") == "0":
+            self.pause(parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+
+
+class EmbeddingEngine:
+    def __init__(
+        self,
+        model: str = EMBEDDING_MODEL,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        client: Optional[openai.OpenAI] = None,
+    ):
+        self.model = model
+        self.batch_size = max(batch_size, 1)
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max_retries
+        # The SDK's own retries would ignore the shared gate, so they are disabled
+        self._client = client or openai.OpenAI(http_client=get_http_client(), max_retries=0)
+        self._gate = _RateLimitGate()
+        self._sleep = time.sleep
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed one batch, waiting out rate limits. Raises once `max_retries` is exhausted.
+        """
+        attempt = 0
+        while True:
+            wait = self._gate.remaining()
+            if wait:
+                self._sleep(wait)
+            try:
+                with self._stats_lock:
+                    self.requests += 1
+                raw = self._client.embeddings.with_raw_response.create(model=self.model, input=texts)
+            except _TRANSIENT_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                response = getattr(e, "response", None)
+                self._gate.pause(retry_delay(response.headers if response is not None else {}, attempt))
+                with self._stats_lock:
+                    self.retries += 1
+                attempt += 1
+                continue
+
+            self._gate.observe(raw.headers)
+            data = sorted(raw.parse().data, key=lambda item: item.index)
+            return [item.embedding for item in data]
+
+    def embed(self, texts: List[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        Embed `texts` in parallel batches, yielding `(offset, vectors)` in completion order so
+        the caller can index finished batches while later ones are still being embedded.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embedding")
+        try:
+            futures = {
+                pool.submit(self.embed_batch, texts[start:start + self.batch_size]): start
+                for start in range(0, len(texts), self.batch_size)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {"requests": self.requests, "retries": self.retries}
@@ -0,0 +1,142 @@
+"""
+Persistent, content-addressed store of chunk embeddings.
+
+Every vector fetched from the embeddings API during ingestion is kept on local disk, keyed by
+(model, dims, sha256(text)). Re-ingesting a document, rebuilding the index with a new mapping
+or moving to a new cluster then reads vectors from disk instead of paying for the API again.
+
+Layout: one directory per (model, dims, dtype) under `EMBEDDING_STORE_DIR`, holding two
+append-only files:
+   - `keys.bin`: 32-byte sha256 digests, one per row.
+   - `vectors.bin`: raw little-endian float16/float32 rows, memory-mapped for reads.
+Vectors are appended before their keys, so a crash can only leave unreferenced vector bytes,
+which are truncated on the next write. Writers from several processes serialize on a lock file.
+
+Exposes:
+   - `get_store(model, dims)`: the process-wide store for a model and dimension count.
+   - `EmbeddingStore.get_many(digests)` / `put_many(vectors)`: batch lookups and inserts.
+"""
+
+import os
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Iterable, Tuple
+
+import numpy as np
+
+
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "True").lower() in ("true", "1")
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "embedding_store")
+# float16 halves the disk footprint; cosine rankings are unaffected at this precision
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float16")
+
+_KEY_BYTES = 32
+
+
+def text_digest(text: str) -> str:
+    """Hex sha256 of a chunk text, the same value ingestion stores as `content_hash`."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, directory: str, dims: int, dtype: str = EMBEDDING_STORE_DTYPE):
+        self.directory = directory
+        self.dims = dims
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self._row_bytes = self.dims * self.dtype.itemsize
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._vectors_path = os.path.join(directory, "vectors.bin")
+        self._lock_path = os.path.join(directory, ".lock")
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}
+        self._keys_offset = 0
+        self._vectors = None
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Pick up keys appended since the last read, by this or another process."""
+        if not os.path.exists(self._keys_path):
+            return
+        size = os.path.getsize(self._keys_path)
+        size -= size % _KEY_BYTES
+        if size <= self._keys_offset:
+            return
+        with open(self._keys_path, "rb") as keys:
+            keys.seek(self._keys_offset)
+            data = keys.read(size - self._keys_offset)
+        start = self._keys_offset // _KEY_BYTES
+        for row in range(len(data) // _KEY_BYTES):
+            self._rows[data[row * _KEY_BYTES:(row + 1) * _KEY_BYTES]] = start + row
+        self._keys_offset = size
+        self._vectors = None
+
+    def _matrix(self) -> np.ndarray:
+        if self._vectors is None:
+            rows = self._keys_offset // _KEY_BYTES
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dims))
+        return self._vectors
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def get_many(self, digests: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Return the stored vectors (as float32 lists) of the given hex digests that are present.
+        """
+        with self._lock:
+            self._refresh()
+            found = {digest: self._rows.get(bytes.fromhex(digest)) for digest in digests}
+            found = {digest: row for digest, row in found.items() if row is not None}
+            if not found:
+                return {}
+            matrix = self._matrix()
+            return {digest: matrix[row].astype(np.float32).tolist() for digest, row in found.items()}
+
+    def put_many(self, vectors: Iterable[Tuple[str, List[float]]]) -> int:
+        """
+        Append (hex digest, vector) pairs that are not stored yet. Returns the number added.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            new = {}
+            for digest, vector in vectors:
+                key = bytes.fromhex(digest)
+                if key not in self._rows and len(vector) == self.dims:
+                    new[key] = vector
+            if not new:
+                return 0
+            rows = self._keys_offset // _KEY_BYTES
+            with open(self._vectors_path, "ab") as out:
+                # Drop vectors of an append whose keys never made it to disk
+                out.truncate(rows * self._row_bytes)
+                out.write(np.asarray(list(new.values()), dtype=self.dtype).tobytes())
+            with open(self._keys_path, "ab") as out:
+                out.write(b"".join(new))
+            self._refresh()
+            return len(new)
+
+
+_stores_lock = threading.Lock()
+_stores: Dict[Tuple[str, int], EmbeddingStore] = {}
+
+
+def get_store(model: str, dims: int) -> EmbeddingStore:
+    key = (model, dims)
+    with _stores_lock:
+        if key not in _stores:
+            directory = os.path.join(EMBEDDING_STORE_DIR, f"{model}-{dims}-{EMBEDDING_STORE_DTYPE}")
+            _stores[key] = EmbeddingStore(directory, dims)
+        return _stores[key]
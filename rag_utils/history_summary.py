@@ -0,0 +1,125 @@
+"""
+Rolling conversation summary.
+
+Instead of sending the last ten raw prompt/response pairs on every turn, the chat prompt gets
+a running summary of the older turns plus only the most recent raw turns. The summary is
+extended incrementally (previous summary + turns that just fell out of the raw window) after
+a message has been answered, outside the streaming path.
+
+Exposes:
+   - `compose_history(summary, recent_history, model_name)`: the capped history for the prompt.
+   - `summarize(summary, history)` / `asummarize(...)`: fold turns into the running summary.
+"""
+
+import os
+from typing import List, Dict, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from .tokens import count_tokens, truncate_to_tokens
+from .llm_clients import get_chat_model
+
+
+# Number of most recent prompt/response pairs kept verbatim
+RAW_TURNS = int(os.getenv("RAG_HISTORY_RAW_TURNS", "3"))
+# Upper bound for everything the history contributes to the prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("RAG_HISTORY_TOKEN_BUDGET", "1500"))
+SUMMARY_MODEL = os.getenv("RAG_HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_MAX_TOKENS = int(os.getenv("RAG_HISTORY_SUMMARY_MAX_TOKENS", "300"))
+# Most prompts folded into the summary in one update
+SUMMARY_BATCH_PROMPTS = int(os.getenv("RAG_HISTORY_SUMMARY_BATCH", "10"))
+
+SUMMARY_ROLE = "system"
+
+prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You maintain a running summary of a conversation between a user and an assistant. "
+     "Extend the current summary with the new turns. Keep facts, names, numbers and open "
+     "questions the user may refer back to; drop greetings and repetition. "
+     "Write in the language of the conversation and never exceed {max_words} words."),
+    ("human",
+     "### Current summary:\n{summary}\n\n"
+     "### New turns:\n{turns}\n\n"
+     "### Updated summary:")
+])
+
+def _chain():
+    return prompt | get_chat_model(SUMMARY_MODEL, temperature=0.0, max_tokens=SUMMARY_MAX_TOKENS)
+
+
+def _turns_text(history: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{item.get('Role', '')}: {item.get('Message', '')}" for item in history)
+
+
+def _inputs(summary: str, history: List[Dict[str, str]]) -> Dict[str, str]:
+    return {
+        "summary": summary or "(empty)",
+        "turns": _turns_text(history),
+        # Roughly two words per token leaves the model room to finish its last sentence
+        "max_words": SUMMARY_MAX_TOKENS // 2,
+    }
+
+
+def summarize(summary: str, history: List[Dict[str, str]]) -> str:
+    """
+    Return `summary` extended with the given history entries ({"Role", "Message"} dicts).
+    """
+    if not history:
+        return summary
+    return _chain().invoke(_inputs(summary, history)).content.strip()
+
+
+async def asummarize(summary: str, history: List[Dict[str, str]]) -> str:
+    """
+    Async variant of `summarize`.
+    """
+    if not history:
+        return summary
+    response = await _chain().ainvoke(_inputs(summary, history))
+    return response.content.strip()
+
+
+def compose_history(
+    summary: str,
+    recent_history: List[Dict[str, str]],
+    model_name: Optional[str] = None,
+    budget: int = HISTORY_TOKEN_BUDGET
+) -> List[Dict[str, str]]:
+    """
+    Build the history sent with a question: the running summary followed by the most recent
+    raw turns, dropping the oldest raw messages until everything fits in `budget` tokens.
+    The latest turn, which a follow-up question usually refers to, is always kept and is cut
+    down if it alone exceeds the budget.
+    """
+    history: List[Dict[str, str]] = []
+    remaining = budget
+
+    start = max((i for i, item in enumerate(recent_history) if item.get("Role", "").lower() == "user"),
+                default=len(recent_history))
+    latest: List[Dict[str, str]] = []
+    for item in recent_history[start:]:
+        message = truncate_to_tokens(item.get("Message", ""), remaining, model_name)
+        if not message and item.get("Message"):
+            break
+        latest.append({**item, "Message": message})
+        remaining -= count_tokens(message, model_name)
+
+    if summary and remaining > 0:
+        summary = truncate_to_tokens(summary, remaining, model_name)
+        remaining -= count_tokens(summary, model_name)
+        history.append({"Role": SUMMARY_ROLE, "Message": f"Summary of the earlier conversation: {summary}"})
+
+    kept: List[Dict[str, str]] = []
+    for item in reversed(recent_history[:start]):
+        tokens = count_tokens(item.get("Message", ""), model_name)
+        if tokens > remaining:
+            break
+        kept.append(item)
+        remaining -= tokens
+
+    # Never start the raw part with a dangling assistant answer
+    kept.reverse()
+    while kept and kept[0].get("Role", "").lower() != "user":
+        kept.pop(0)
+
+    return history + kept + latest
@@ -0,0 +1,132 @@
+"""
+Hybrid BM25 + kNN retrieval fused with reciprocal rank fusion (RRF).
+
+Both searches go to Elasticsearch in a single `_msearch` request, so hybrid mode costs one
+round trip like plain kNN. The two rankings are then merged client-side with weighted RRF:
+
+    score(doc) = sum(weight_i / (rank_constant + rank_i(doc)))
+
+Doing the fusion here keeps per-deployment weights configurable and works on every
+Elasticsearch license level.
+"""
+
+import os
+import asyncio
+from typing import List, Dict, Any, Tuple, Optional, Callable
+
+from langchain_core.documents import Document
+
+
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "knn").lower()  # "knn" or "hybrid"
+TOP_K = int(os.getenv("RAG_TOP_K", "10"))
+KNN_NUM_CANDIDATES = int(os.getenv("RAG_KNN_NUM_CANDIDATES", "100"))
+HYBRID_WINDOW_SIZE = int(os.getenv("RAG_HYBRID_WINDOW_SIZE", "50"))
+BM25_WEIGHT = float(os.getenv("RAG_HYBRID_BM25_WEIGHT", "1.0"))
+KNN_WEIGHT = float(os.getenv("RAG_HYBRID_KNN_WEIGHT", "1.0"))
+RRF_RANK_CONSTANT = int(os.getenv("RAG_RRF_RANK_CONSTANT", "60"))
+
+TEXT_FIELD = "text"
+VECTOR_FIELD = "vector"
+
+
+def is_enabled() -> bool:
+    return RETRIEVAL_MODE == "hybrid"
+
+
+def build_searches(question: str, query_vector: List[float],
+                   filters: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Build the `_msearch` body: a BM25 `match` search followed by a `knn` search, both
+    restricted by the optional `filters` clauses.
+    """
+    source = [TEXT_FIELD, "metadata"]
+    filters = filters or []
+    return [
+        {},
+        {
+            "query": {"bool": {"must": [{"match": {TEXT_FIELD: {"query": question}}}], "filter": filters}},
+            "size": HYBRID_WINDOW_SIZE,
+            "_source": source,
+        },
+        {},
+        {
+            "knn": {
+                "field": VECTOR_FIELD,
+                "query_vector": query_vector,
+                "k": HYBRID_WINDOW_SIZE,
+                "num_candidates": max(KNN_NUM_CANDIDATES, HYBRID_WINDOW_SIZE),
+                "filter": filters,
+            },
+            "size": HYBRID_WINDOW_SIZE,
+            "_source": source,
+        },
+    ]
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Dict[str, Any]]],
+    weights: List[float],
+    rank_constant: int = RRF_RANK_CONSTANT,
+    top_k: int = TOP_K
+) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Fuse several ranked hit lists into one, returning (hit, fused score) pairs best first.
+    """
+    scores: Dict[str, float] = {}
+    hits_by_id: Dict[str, Dict[str, Any]] = {}
+    for hits, weight in zip(rankings, weights):
+        for rank, hit in enumerate(hits, 1):
+            scores[hit["_id"]] = scores.get(hit["_id"], 0.0) + weight / (rank_constant + rank)
+            hits_by_id.setdefault(hit["_id"], hit)
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(hits_by_id[doc_id], score) for doc_id, score in ranked]
+
+
+Rerank = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+
+
+def _to_documents(response, rerank_knn: Optional[Rerank] = None) -> List[Tuple[Document, float]]:
+    rankings = []
+    for result in response["responses"]:
+        if "error" in result:
+            print(f"Hybrid search error: {result['error']}")
+            rankings.append([])
+        else:
+            rankings.append(result["hits"]["hits"])
+    if rerank_knn is not None:
+        rankings[1] = rerank_knn(rankings[1])
+
+    fused = reciprocal_rank_fusion(rankings, [BM25_WEIGHT, KNN_WEIGHT])
+    return [
+        (
+            Document(page_content=hit["_source"].get(TEXT_FIELD, ""),
+                     metadata=hit["_source"].get("metadata", {})),
+            score
+        )
+        for hit, score in fused
+    ]
+
+
+def search(client, index: str, question: str, query_vector: List[float],
+           filters: Optional[List[Dict[str, Any]]] = None,
+           rerank_knn: Optional[Rerank] = None) -> List[Tuple[Document, float]]:
+    """
+    Run the hybrid search with a sync Elasticsearch client. `rerank_knn` may re-order the kNN
+    hits before fusion, e.g. with full-precision vectors.
+    """
+    response = client.msearch(index=index, searches=build_searches(question, query_vector, filters))
+    return _to_documents(response, rerank_knn)
+
+
+async def asearch(client, index: str, question: str, query_vector: List[float],
+                  filters: Optional[List[Dict[str, Any]]] = None,
+                  rerank_knn: Optional[Rerank] = None) -> List[Tuple[Document, float]]:
+    """
+    Run the hybrid search with an async Elasticsearch client.
+    """
+    response = await client.msearch(index=index, searches=build_searches(question, query_vector, filters))
+    if rerank_knn is None:
+        return _to_documents(response)
+    # Reranking may read from disk
+    return await asyncio.to_thread(_to_documents, response, rerank_knn)
@@ -0,0 +1,115 @@
+"""
+Picks the passages of fetched web pages that are worth putting in the prompt.
+
+A rendered page is often tens of thousands of tokens, most of it unrelated to the question.
+Pages are split into passages of about `RAG_LINK_PASSAGE_TOKENS` tokens, ranked against the
+question with BM25 (computed locally over the passages of all fetched pages, so no extra
+request is made), and the best ones are kept until `RAG_LINK_TOKEN_BUDGET` is used up. Kept
+passages are shown per link in page order.
+
+When no passage shares a word with the question (e.g. "summarize https://..."), the opening
+passages of each page are used instead.
+"""
+
+import os
+import re
+import math
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+
+from langchain_core.documents import Document
+
+from .chunking import TokenChunker
+from .web_search import extract_urls
+
+
+RAG_LINK_TOKEN_BUDGET = int(os.getenv("RAG_LINK_TOKEN_BUDGET", "1500"))
+RAG_LINK_PASSAGE_TOKENS = int(os.getenv("RAG_LINK_PASSAGE_TOKENS", "200"))
+
+# Usual BM25 defaults
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TERM = re.compile(r"\w+")
+# Arabic letter forms that Persian text mixes with their Persian counterparts
+_LETTERS = str.maketrans({"ي": "ی", "ك": "ک", "ة": "ه"})
+
+
+def terms(text: str) -> List[str]:
+    return _TERM.findall(text.lower().translate(_LETTERS))
+
+
+def bm25_scores(query: str, passages: List[str]) -> List[float]:
+    query_terms = set(terms(query))
+    documents = [Counter(terms(passage)) for passage in passages]
+    if not query_terms or not documents:
+        return [0.0] * len(passages)
+    average_length = sum(sum(counts.values()) for counts in documents) / len(documents) or 1.0
+    frequencies = {term: sum(1 for counts in documents if term in counts) for term in query_terms}
+
+    scores = []
+    for counts in documents:
+        length = sum(counts.values())
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(documents) - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+        scores.append(score)
+    return scores
+
+
+def select(
+    question: str,
+    links: List[Dict[str, Any]],
+    budget: int = RAG_LINK_TOKEN_BUDGET,
+    chunker: TokenChunker = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Keep the passages of the fetched `links` most relevant to `question`, within `budget` tokens.
+
+    Returns:
+        - the links that kept any text, as {'Link', 'Passages'} in fetch order with passages in page order,
+        - token counts {'page_tokens', 'kept_tokens'}.
+    """
+    chunker = chunker or TokenChunker(RAG_LINK_PASSAGE_TOKENS, 0)
+    passages = []
+    for entry in links:
+        if "error" in entry or not entry.get("Content"):
+            continue
+        page = Document(page_content=entry["Content"], metadata={"Link": entry["Link"]})
+        for position, passage in enumerate(chunker.split_page(page)):
+            passages.append({
+                "link": entry["Link"],
+                "position": position,
+                "text": passage.page_content,
+                "tokens": chunker.counter(passage.page_content),
+            })
+
+    # The links themselves say nothing about what the user wants to know
+    query = question
+    for url in extract_urls(question):
+        query = query.replace(url, " ")
+    for passage, score in zip(passages, bm25_scores(query, [passage["text"] for passage in passages])):
+        passage["score"] = score
+    relevant = any(passage["score"] > 0 for passage in passages)
+
+    # Best score first; ties (and pages without any match) fall back to page order
+    ranked = sorted(
+        (passage for passage in passages if passage["score"] > 0 or not relevant),
+        key=lambda passage: (-passage["score"], passage["position"])
+    )
+    kept, used = [], 0
+    for passage in ranked:
+        if used + passage["tokens"] <= budget:
+            kept.append(passage)
+            used += passage["tokens"]
+
+    selected = []
+    for entry in links:
+        texts = [p["text"] for p in sorted(kept, key=lambda p: p["position"]) if p["link"] == entry["Link"]]
+        if texts:
+            selected.append({"Link": entry["Link"], "Passages": texts})
+    return selected, {"page_tokens": sum(passage["tokens"] for passage in passages), "kept_tokens": used}
@@ -0,0 +1,158 @@
+"""
+Process-wide registry of OpenAI clients.
+
+Building a `ChatOpenAI` per message throws away its HTTP connection pool and TLS session.
+Here chat models are created once per `LLMModel.name` (plus options) and all of them, the
+embeddings included, share one keep-alive `httpx` pool per sync/async flavour.
+
+Connection reuse is measured with httpcore's trace hooks: every request is counted, and every
+request that had to open a TCP connection first is counted as new.
+
+Exposes:
+   - `get_chat_model(name, **options)`: the shared `ChatOpenAI` for a model name.
+   - `get_http_client()` / `get_async_http_client()`: the shared httpx clients.
+   - `connection_stats()`: requests sent, connections opened and reused.
+   - `metrics()`: the same counters as Prometheus text, served on `/metrics/`.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+
+MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+TIMEOUT_SECONDS = float(os.getenv("LLM_HTTP_TIMEOUT_SECONDS", "60"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+
+class _ConnectionCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def record(self, event: str) -> None:
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+        elif event.endswith(".send_request_headers.started"):
+            with self._lock:
+                self.requests += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": max(self.requests - self.new_connections, 0),
+            }
+
+
+_counters = _ConnectionCounters()
+
+
+def _trace(event: str, info: Dict[str, Any]) -> None:
+    _counters.record(event)
+
+
+async def _atrace(event: str, info: Dict[str, Any]) -> None:
+    _counters.record(event)
+
+
+def _add_trace(request: httpx.Request) -> None:
+    request.extensions["trace"] = _trace
+
+
+async def _aadd_trace(request: httpx.Request) -> None:
+    request.extensions["trace"] = _atrace
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+
+
+_lock = threading.Lock()
+_http_client = None
+_async_http_client = None
+_chat_models: Dict[Tuple, ChatOpenAI] = {}
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(limits=_limits(), timeout=_timeout(),
+                                        event_hooks={"request": [_add_trace]})
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout(),
+                                                   event_hooks={"request": [_aadd_trace]})
+        return _async_http_client
+
+
+def get_chat_model(name: str, **options: Any) -> ChatOpenAI:
+    """
+    Return the shared `ChatOpenAI` for `name` (an `LLMModel.name`) and the given options,
+    e.g. `temperature` or `max_tokens`. Instances are created on first use.
+    """
+    key = (name, tuple(sorted(options.items())))
+    model = _chat_models.get(key)
+    if model is None:
+        model = ChatOpenAI(
+            model=name,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            timeout=_timeout(),
+            max_retries=MAX_RETRIES,
+            **options
+        )
+        with _lock:
+            model = _chat_models.setdefault(key, model)
+    return model
+
+
+def connection_stats() -> Dict[str, int]:
+    """
+    Requests sent through the shared pools and how many needed a new connection.
+    """
+    return _counters.snapshot()
+
+
+_METRICS = (
+    ("requests", "Requests sent through the shared OpenAI connection pools."),
+    ("new_connections", "Requests that had to open a new connection first."),
+    ("reused_connections", "Requests sent on a kept-alive connection."),
+)
+
+
+def metrics() -> str:
+    """
+    Connection counters of this process in the Prometheus text exposition format.
+    """
+    stats = connection_stats()
+    lines = []
+    for key, description in _METRICS:
+        name = f"rag_openai_{key}_total"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {stats[key]}")
+    return "\n".join(lines) + "\n"
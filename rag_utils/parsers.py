@@ -0,0 +1,210 @@
+"""
+Text extraction for every upload format accepted by `Document.file`.
+
+Parsing is CPU-bound pure Python, so it runs in a process pool sized to the machine's cores
+instead of on the ingestion worker's threads. Large PDFs are split into page ranges that are
+parsed in parallel; other formats are parsed in one task per file. Results come back as
+plain (text, metadata) pairs, one per page, slide or sheet, and are handed to the caller in
+document order and in bounded windows.
+
+Exposes:
+   - `SUPPORTED_EXTENSIONS`: the formats that can be extracted.
+   - `extract_pages(path, start, stop)`: parse one file (or a PDF page range) in this process.
+   - `iter_page_windows(path, window)`: parse in the pool, yielding lists of LangChain `Document`s.
+"""
+
+import os
+import re
+import subprocess
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterator, Tuple, Optional, Any
+
+from langchain_core.documents import Document
+
+
+PARSER_WORKERS = int(os.getenv("INGESTION_PARSER_WORKERS", str(os.cpu_count() or 1)))
+# PDF page ranges parsed ahead of the indexer; bounds the text held in memory per document
+PARSER_PREFETCH_WINDOWS = int(os.getenv("INGESTION_PARSER_PREFETCH_WINDOWS", str(PARSER_WORKERS)))
+
+Page = Tuple[str, Dict[str, Any]]
+
+_WHITESPACE_LINES = re.compile(r"\n\s*\n+")
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower().lstrip(".")
+
+
+def _pdf_page_count(path: str) -> int:
+    import pypdf
+    return len(pypdf.PdfReader(path).pages)
+
+
+def _pdf(path: str, start: int = 0, stop: Optional[int] = None) -> List[Page]:
+    import pypdf
+    reader = pypdf.PdfReader(path)
+    total = len(reader.pages)
+    pages = []
+    for number in range(start, min(stop if stop is not None else total, total)):
+        pages.append((reader.pages[number].extract_text().strip(), {
+            "source": path,
+            "total_pages": total,
+            "page": number,
+            "page_label": reader.page_labels[number],
+        }))
+    return pages
+
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def _docx_has_page_break(paragraph) -> bool:
+    return any(br.get(f"{_WORD_NS}type") == "page" for br in paragraph._p.iter(f"{_WORD_NS}br"))
+
+
+def _docx(path: str, start: int = 0, stop: Optional[int] = None) -> List[Page]:
+    import docx
+    from docx.table import Table
+    document = docx.Document(path)
+    # Word files have no stored pagination; explicit page breaks are the closest equivalent
+    pages: List[List[str]] = [[]]
+    for block in document.iter_inner_content():
+        if isinstance(block, Table):
+            for row in block.rows:
+                pages[-1].append(" | ".join(cell.text.strip() for cell in row.cells))
+            continue
+        if block.text.strip():
+            pages[-1].append(block.text)
+        if _docx_has_page_break(block):
+            pages.append([])
+    return [("\n".join(lines), {"source": path, "page": number})
+            for number, lines in enumerate(pages) if lines]
+
+
+def _doc(path: str, start: int = 0, stop: Optional[int] = None) -> List[Page]:
+    # Legacy binary Word files need the antiword command line tool (installed in the Docker image)
+    try:
+        result = subprocess.run(["antiword", "-w", "0", path], capture_output=True, check=True, timeout=300)
+    except FileNotFoundError:
+        raise RuntimeError("antiword is required to extract text from .doc files.")
+    text = result.stdout.decode("utf-8", errors="replace")
+    return _split_form_feeds(text, path)
+
+
+def _txt(path: str, start: int = 0, stop: Optional[int] = None) -> List[Page]:
+    with open(path, encoding="utf-8", errors="replace") as file:
+        return _split_form_feeds(file.read(), path)
+
+
+def _split_form_feeds(text: str, path: str) -> List[Page]:
+    return [(page.strip(), {"source": path, "page": number})
+            for number, page in enumerate(text.split("\f")) if page.strip()]
+
+
+def _pptx(path: str, start: int = 0, stop: Optional[int] = None) -> List[Page]:
+    import pptx
+    presentation = pptx.Presentation(path)
+    pages = []
+    for number, slide in enumerate(presentation.slides):
+        lines = []
+        for shape in slide.shapes:
+            if shape.has_text_frame and shape.text_frame.text.strip():
+                lines.append(shape.text_frame.text)
+            if shape.has_table:
+                for row in shape.table.rows:
+                    lines.append(" | ".join(cell.text.strip() for cell in row.cells))
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame.text.strip():
+            lines.append(slide.notes_slide.notes_text_frame.text)
+        if lines:
+            pages.append((_WHITESPACE_LINES.sub("\n", "\n".join(lines)).strip(),
+                          {"source": path, "page": number, "slide": number + 1}))
+    return pages
+
+
+def _xlsx(path: str, start: int = 0, stop: Optional[int] = None) -> List[Page]:
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    pages = []
+    try:
+        for number, sheet in enumerate(workbook.worksheets):
+            rows = []
+            for row in sheet.iter_rows(values_only=True):
+                cells = ["" if value is None else str(value) for value in row]
+                if any(cells):
+                    rows.append(" | ".join(cells).rstrip(" |"))
+            if rows:
+                pages.append(("\n".join(rows), {"source": path, "page": number, "sheet": sheet.title}))
+    finally:
+        workbook.close()
+    return pages
+
+
+_PARSERS = {
+    "pdf": _pdf,
+    "docx": _docx,
+    "doc": _doc,
+    "txt": _txt,
+    "pptx": _pptx,
+    "xlsx": _xlsx,
+}
+SUPPORTED_EXTENSIONS = tuple(_PARSERS)
+
+
+def extract_pages(path: str, start: int = 0, stop: Optional[int] = None) -> List[Page]:
+    """
+    Extract the text of a file as (text, metadata) pairs, one per page, slide or sheet.
+    `start` / `stop` select a page range and are only honoured for PDFs.
+    """
+    parser = _PARSERS.get(_extension(path))
+    if parser is None:
+        raise ValueError(f"Unsupported file format: {path}")
+    return parser(path, start, stop)
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Forking a threaded worker process is unsafe; children start fresh instead
+            _pool = ProcessPoolExecutor(max_workers=max(PARSER_WORKERS, 1),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _tasks(path: str, window: int) -> Iterator[Tuple[int, Optional[int]]]:
+    if _extension(path) != "pdf":
+        yield 0, None
+        return
+    total = _get_pool().submit(_pdf_page_count, path).result()
+    for start in range(0, total, window):
+        yield start, start + window
+
+
+def iter_page_windows(path: str, window: int) -> Iterator[List[Document]]:
+    """
+    Parse `path` in the process pool and yield its pages in document order, `window` at a time.
+    At most `PARSER_PREFETCH_WINDOWS` PDF page ranges are parsed ahead of the consumer.
+    """
+    if _extension(path) not in _PARSERS:
+        raise ValueError(f"Unsupported file format: {path}")
+    pool = _get_pool()
+    pending = deque()
+    tasks = _tasks(path, window)
+    for start, stop in tasks:
+        pending.append(pool.submit(extract_pages, path, start, stop))
+        if len(pending) > PARSER_PREFETCH_WINDOWS:
+            yield from _as_windows(pending.popleft().result(), window)
+    while pending:
+        yield from _as_windows(pending.popleft().result(), window)
+
+
+def _as_windows(pages: List[Page], window: int) -> Iterator[List[Document]]:
+    for start in range(0, len(pages), window):
+        yield [Document(page_content=text, metadata=metadata) for text, metadata in pages[start:start + window]]
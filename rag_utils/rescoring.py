@@ -0,0 +1,88 @@
+"""
+Full-precision rescoring of kNN candidates.
+
+The kNN index holds shortened (`EMBEDDING_INDEX_DIMS`) and quantized vectors to keep it small.
+The best hits it returns are re-ranked here by their cosine similarity to the full query
+vector, using the full-size chunk vectors of the local embedding store (looked up by the
+`content_hash` every chunk carries). Chunks missing from the store keep their index score.
+
+Exposes:
+   - `is_enabled()`: whether retrieval should oversample and rescore.
+   - `fetch_k(top_k)`: how many kNN hits to retrieve for a final `top_k`.
+   - `rescore(query_vector, results, top_k)`: re-rank (Document, score) pairs.
+   - `rescore_hits(query_vector, hits)`: re-order raw Elasticsearch hits, e.g. before rank fusion.
+"""
+
+import os
+from typing import List, Dict, Any, Tuple, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .embedding_cache import EMBEDDING_MODEL
+from .embedding_store import EMBEDDING_STORE_ENABLED, get_store
+from .elastic import EMBEDDING_DIMS
+
+
+RESCORE_ENABLED = os.getenv("RAG_RESCORE_ENABLED", "True").lower() in ("true", "1")
+# kNN hits retrieved per final result when rescoring
+RESCORE_OVERSAMPLE = float(os.getenv("RAG_RESCORE_OVERSAMPLE", "3"))
+
+
+def is_enabled() -> bool:
+    return RESCORE_ENABLED and EMBEDDING_STORE_ENABLED
+
+
+def fetch_k(top_k: int) -> int:
+    return max(int(top_k * RESCORE_OVERSAMPLE), top_k) if is_enabled() else top_k
+
+
+def _similarities(query_vector: List[float], digests: List[Optional[str]]) -> Dict[str, float]:
+    """Elasticsearch-scaled cosine score, (1 + cos) / 2, of every digest found in the store."""
+    wanted = sorted({digest for digest in digests if digest})
+    if not wanted or len(query_vector) != EMBEDDING_DIMS:
+        return {}
+    try:
+        stored = get_store(EMBEDDING_MODEL, EMBEDDING_DIMS).get_many(wanted)
+    except Exception as e:
+        print(f"Embedding store unavailable: {e}")
+        return {}
+    if not stored:
+        return {}
+    query = np.asarray(query_vector, dtype=np.float32)
+    query /= np.linalg.norm(query) or 1.0
+    found = list(stored)
+    matrix = np.asarray([stored[digest] for digest in found], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    cosines = matrix @ query / norms
+    return {digest: float((1.0 + cosine) / 2.0) for digest, cosine in zip(found, cosines)}
+
+
+def rescore(query_vector: List[float], results: List[Tuple[Document, float]],
+            top_k: int) -> List[Tuple[Document, float]]:
+    """
+    Re-rank (document, score) kNN results by full-precision similarity, best first, cut to `top_k`.
+    """
+    if not is_enabled():
+        return results[:top_k]
+    scores = _similarities(query_vector, [doc.metadata.get("content_hash") for doc, _ in results])
+    rescored = [(doc, scores.get(doc.metadata.get("content_hash"), score)) for doc, score in results]
+    return sorted(rescored, key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def rescore_hits(query_vector: List[float], hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Re-order raw kNN hits (with `metadata` in `_source`) by full-precision similarity.
+    """
+    if not is_enabled():
+        return hits
+    digests = [hit.get("_source", {}).get("metadata", {}).get("content_hash") for hit in hits]
+    scores = _similarities(query_vector, digests)
+    if not scores:
+        return hits
+    rescored = [(scores.get(digest, hit.get("_score") or 0.0), position, hit)
+                for position, (digest, hit) in enumerate(zip(digests, hits))]
+    # Position breaks ties so equal scores keep the index's order
+    rescored.sort(key=lambda item: (-item[0], item[1]))
+    return [hit for _, _, hit in rescored]
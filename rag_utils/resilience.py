@@ -0,0 +1,193 @@
+"""
+Circuit breakers and a shared latency budget for the services a chat answer depends on.
+
+Without them, a degraded Jina Reader, OpenAI or Elasticsearch makes every chat request wait for
+its full timeouts, and workers pile up behind it. Each dependency has one process-wide breaker:
+   - closed: calls go through; `CIRCUIT_FAILURE_THRESHOLD` failures in a row open it,
+   - open: calls fail at once with `CircuitOpenError` for `CIRCUIT_RESET_SECONDS`,
+   - half-open: one trial call is let through; its outcome closes or re-opens the breaker.
+Callers treat an open breaker like any other failure of that dependency and answer without it
+(no web links, no retrieved chunks, ...). Calls cancelled for running out of time count as
+failures, so a dependency that is slow rather than down is cut off too.
+
+A `Deadline` is created per chat request and bounds everything before generation starts, so
+slow dependencies share one budget instead of adding up their own timeouts.
+
+Breaker state is per process; `metrics()` renders it in the Prometheus text format.
+
+Exposes:
+   - `jina`, `openai_embeddings`, `openai_chat`, `elasticsearch`: the breakers.
+   - `CircuitBreaker.guard()`: context manager running one call through a breaker.
+   - `Deadline(seconds)`: time left in a request's budget.
+   - `metrics()`: breaker state and counters as Prometheus text.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple, Type
+
+import openai as openai_sdk
+from elasticsearch import NotFoundError, BadRequestError
+
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+# Budget for everything a chat request does before the answer starts streaming
+RAG_REQUEST_DEADLINE_SECONDS = float(os.getenv("RAG_REQUEST_DEADLINE_SECONDS", "15"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"{name} is unavailable (circuit open)")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_seconds: float = CIRCUIT_RESET_SECONDS,
+                 ignore: Tuple[Type[BaseException], ...] = (),
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            ignore: Exceptions that are the caller's fault (bad request, missing index) rather than
+                the dependency's; they are re-raised without counting as failures.
+        """
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self.ignore = ignore
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.counters = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go out now. In half-open state only the first caller gets through.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED or (state == HALF_OPEN and not self._trial_running):
+                self._trial_running = state == HALF_OPEN
+                self.counters["calls"] += 1
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive_failures = 0
+            self._trial_running = False
+            if self._state != CLOSED:
+                print(f"Circuit for {self.name} closed.")
+                self._state = CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counters["failures"] += 1
+            self._consecutive_failures += 1
+            self._trial_running = False
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._consecutive_failures >= self.failure_threshold):
+                print(f"Circuit for {self.name} opened after {self._consecutive_failures} failure(s).")
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self.counters["opened"] += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._trial_running = False
+
+    @contextmanager
+    def guard(self):
+        """
+        Run the body as one call to the dependency: raises `CircuitOpenError` without running it
+        when the breaker is open, and records the outcome otherwise.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            yield
+        except self.ignore:
+            self.record_success()
+            raise
+        except GeneratorExit:
+            # The consumer stopped reading a stream; says nothing about the dependency
+            self._release()
+            raise
+        except BaseException:
+            self.record_failure()
+            raise
+        self.record_success()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"state": _STATE_VALUES[self._current_state()], **self.counters}
+
+
+jina = CircuitBreaker("jina")
+# Embeddings and chat completions fail independently (different models, quotas and endpoints)
+openai_embeddings = CircuitBreaker("openai_embeddings", ignore=(openai_sdk.BadRequestError,))
+openai_chat = CircuitBreaker("openai_chat", ignore=(openai_sdk.BadRequestError,))
+elasticsearch = CircuitBreaker("elasticsearch", ignore=(NotFoundError, BadRequestError))
+
+_BREAKERS = (jina, openai_embeddings, openai_chat, elasticsearch)
+
+
+class Deadline:
+    def __init__(self, seconds: float = RAG_REQUEST_DEADLINE_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self, cap: float = None) -> float:
+        """
+        Seconds left, never negative; at most `cap` when given (a dependency's own timeout).
+        """
+        left = max(self.expires_at - self._clock(), 0.0)
+        return left if cap is None else min(left, cap)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+
+_METRICS = (
+    ("state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)."),
+    ("calls", "counter", "Calls let through the breaker."),
+    ("failures", "counter", "Calls that failed or timed out."),
+    ("rejected", "counter", "Calls refused while the breaker was open."),
+    ("opened", "counter", "Times the breaker opened."),
+)
+
+
+def metrics() -> str:
+    """
+    Breaker state and counters of this process in the Prometheus text exposition format.
+    """
+    snapshots = [(breaker.name, breaker.snapshot()) for breaker in _BREAKERS]
+    lines = []
+    for key, kind, description in _METRICS:
+        name = f"rag_circuit_{key}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f'{name}{{dependency="{dependency}"}} {values[key]}' for dependency, values in snapshots)
+    return "\n".join(lines) + "\n"
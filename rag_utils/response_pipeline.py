@@ -12,43 +12,50 @@ Main workflow:
 6. Create two main interface functions:
    - `invoke(...)` for synchronous Q&A.
    - `stream(...)` for streamed response generation with sources.
+   - `astream(...)` the non-blocking counterpart of `stream` for the websocket consumer.
+
+External services are called through circuit breakers and each request has one latency budget
+(see `resilience`). A failing or open-circuited dependency is left out of the answer: no web
+links without Jina, no retrieved chunks without Elasticsearch, no semantic cache without query
+embeddings. Only without a chat model is the user told to try again later.
 """
 
 import os
-from typing import List, Dict, Any
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Tuple, Optional
 from dotenv import load_dotenv
-from elasticsearch import Elasticsearch
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_elasticsearch import ElasticsearchStore
 from langchain_core.runnables import RunnableLambda
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 
-from .web_search import  fetch_links_content
+from .web_search import fetch_links_content, afetch_links_content, extract_urls
+from .embedding_cache import get_embeddings, shorten
+from . import semantic_cache
+from . import hybrid_search
+from . import context_packer
+from . import tombstones
+from . import rescoring
+from . import link_passages
+from . import resilience
+from .resilience import Deadline
+from .llm_clients import get_chat_model
+from .elastic import knn_search, aknn_search, index_name, INDEX_DIMS
+from manthrabin_backend.connections import get_es_client, get_async_es_client
 
 
 
 
-# Step 2: Initialize text embedding model
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+# Step 2: Initialize text embedding model (query vectors are cached locally and in Redis)
+embeddings = get_embeddings("text-embedding-3-small")
 
 
-# Step 3: Configure connection to Elasticsearch for storing and retrieving vector data
-vector_store = ElasticsearchStore(
-    es_url=os.getenv("ES_SCHEMA")+"://"+os.getenv("ES_URL")+":"+os.getenv("ES_PORT"),
-    index_name=os.getenv("ES_INDEX"),
-    embedding=embeddings,
-    es_user=os.getenv("ES_USER"),
-    es_password=os.getenv("ES_PASS"),
-    es_params={"verify_certs": False}  # Useful for local/dev environments
-)
-es = Elasticsearch(
-    hosts=[os.getenv("ES_SCHEMA")+"://"+os.getenv("ES_URL")+":"+os.getenv("ES_PORT")]
-)
+# Step 3: Elasticsearch vector stores are shared with the ingestion pipeline and created on
+# first use (see rag_utils.elastic), so importing this module does not touch the network
 
 # Step 4: Define logic for retrieving related documents using similarity search
-def _similarity_search(question: str) -> Dict[str, Any]:
+def _similarity_search(question: str, model_name: str = None) -> Dict[str, Any]:
     """
     Fetch documents from Elasticsearch that are similar to the input query.
 
@@ -57,24 +64,67 @@ def _similarity_search(question: str) -> Dict[str, Any]:
         - 'chunks': Metadata and scores for each retrieved segment
     """
     try:
-        if not es.indices.exists(index="manthrabin"):
-            print("Index 'manthrabin' does not exist. Creating index.")
-            es.indices.create(index="manthrabin")
-        results = vector_store.similarity_search_with_score(query=question, k=10)
+        # Documents being deleted are hidden before their chunks are gone
+        filters = tombstones.exclusion_filters()
+        # Full-size query vector; the index may hold shortened ones (EMBEDDING_INDEX_DIMS)
+        query_vector = embeddings.embed_query(question)
+        if hybrid_search.is_enabled():
+            with resilience.elasticsearch.guard():
+                results = hybrid_search.search(get_es_client(), index_name, question,
+                                               shorten(query_vector, INDEX_DIMS), filters,
+                                               lambda hits: rescoring.rescore_hits(query_vector, hits))
+        else:
+            results = knn_search(question, rescoring.fetch_k(hybrid_search.TOP_K), filters)
+            results = rescoring.rescore(query_vector, results, hybrid_search.TOP_K)
+    except Exception as e:
+        print(f"Error: {e}")
+        results = []
+    return _format_retrieval(results, model_name)
+
+
+async def _asimilarity_search(question: str, model_name: str = None) -> Dict[str, Any]:
+    """
+    Async variant of `_similarity_search`, querying through the async Elasticsearch client.
+    """
+    try:
+        filters = await tombstones.aexclusion_filters()
+        query_vector = await embeddings.aembed_query(question)
+        if hybrid_search.is_enabled():
+            with resilience.elasticsearch.guard():
+                results = await hybrid_search.asearch(get_async_es_client(), index_name, question,
+                                                      shorten(query_vector, INDEX_DIMS), filters,
+                                                      lambda hits: rescoring.rescore_hits(query_vector, hits))
+        else:
+            results = await aknn_search(question, rescoring.fetch_k(hybrid_search.TOP_K), filters)
+            results = await asyncio.to_thread(rescoring.rescore, query_vector, results, hybrid_search.TOP_K)
     except Exception as e:
         print(f"Error: {e}")
+        results = []
+    return _format_retrieval(results, model_name)
+
+
+def _format_retrieval(results, model_name: str = None) -> Dict[str, Any]:
+    """
+    Build the prompt context and the source metadata from (document, score) pairs.
+
+    Overlapping chunks are merged and the context is cut to the model's token budget,
+    see `context_packer`. Only hits that made it into the prompt are reported as sources.
+    """
+    passages = context_packer.pack(results, model_name)
+
     retrieved_chunks = []
-    for doc, score in results:
-        retrieved_chunks.append({
-            "ID": doc.metadata.get("public_id", ""),
-            "Context": doc.page_content,
-            "Reliability": score
-        })
+    for passage in passages:
+        for doc, score in passage["hits"]:
+            retrieved_chunks.append({
+                "ID": doc.metadata.get("public_id", ""),
+                "Context": doc.page_content,
+                "Reliability": score
+            })
 
     # Assemble text to be used in the LLM prompt
     context_text = "\n\nRelated Chunks:\n"
-    for i, (doc, _) in enumerate(results, 1):
-        context_text += f"\nSource {i} – {doc.metadata.get('Title', '')}:\n{doc.page_content}"
+    for i, passage in enumerate(passages, 1):
+        context_text += f"\nSource {i} – {passage['document'].metadata.get('Title', '')}:\n{passage['text']}"
 
     return {
         "context": context_text,
@@ -117,20 +167,161 @@ def _reformat_history(history: List[Dict[str, str]]) -> List[BaseMessage]:
     for item in history:
         role = item.get("Role", "").lower()
         message = item.get("Message", "")
-        formatted.append(HumanMessage(content=message) if role == user_role else AIMessage(content=message))
+        if role == "system":
+            # Running summary of older turns, see history_summary.compose_history
+            formatted.append(SystemMessage(content=message))
+        else:
+            formatted.append(HumanMessage(content=message) if role == user_role else AIMessage(content=message))
 
     return formatted
 
 
 # Utility: Convert link data into a formatted string block
-def _reformat_link_data(data: dict) -> str:
+def _reformat_link_data(data: List[Dict[str, Any]], question: str) -> str:
+    """
+    Only the passages of each page relevant to the question are kept, see `link_passages`.
+    """
     output = "\nFetched link data:\n"
-    for entry in data:
-        if 'error' not in entry:
-            output += f"\nSource {entry['Link']} \n–{entry['Content']}"
+    selected, tokens = link_passages.select(question, data)
+    for entry in selected:
+        passages = "\n...\n".join(entry['Passages'])
+        output += f"\nSource {entry['Link']} \n–{passages}"
+    if tokens["page_tokens"]:
+        print(f"Web links: kept {tokens['kept_tokens']} of {tokens['page_tokens']} page tokens "
+              f"({tokens['page_tokens'] - tokens['kept_tokens']} saved).")
     return output
 
 
+# Retrieval and link fetching are independent I/O waits, so they run side by side under
+# one shared deadline (capped by what is left of the request's budget); whatever has not
+# finished by then is replaced by an empty result.
+RETRIEVAL_DEADLINE_SECONDS = float(os.getenv("RAG_RETRIEVAL_DEADLINE_SECONDS", "12"))
+_fanout_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RAG_FANOUT_WORKERS", "8")),
+    thread_name_prefix="rag-fanout"
+)
+
+
+def _prompt_inputs(
+    query: str,
+    retrieval: Dict[str, Any],
+    formatted_history: List[BaseMessage],
+    link_data: str,
+    favorites: List[str]
+) -> Dict[str, Any]:
+    return {
+        "context": retrieval["context"],
+        "question": query,
+        "link_data": link_data,
+        "chat_history": formatted_history,
+        "user_favorites": ", ".join(favorites) if favorites else ""
+    }
+
+
+def _gather_inputs(
+    query: str,
+    history: List[Dict[str, str]],
+    favorites: List[str],
+    model_name: str,
+    deadline: Deadline
+) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Run vector search and link fetching concurrently and format the history meanwhile.
+
+    Returns:
+        (prompt inputs, retrieval result, fetched links)
+    """
+    retrieval_future = _fanout_executor.submit(_similarity_search, query, model_name)
+    links_future = _fanout_executor.submit(fetch_links_content, query, deadline)
+    formatted_history = _reformat_history(history)
+
+    wait([retrieval_future, links_future], timeout=deadline.remaining(RETRIEVAL_DEADLINE_SECONDS))
+
+    if retrieval_future.done():
+        retrieval = retrieval_future.result()
+    else:
+        print("Similarity search ran out of time, answering without it.")
+        retrieval_future.cancel()
+        retrieval = _format_retrieval([], model_name)
+
+    if links_future.done() and links_future.exception() is None:
+        web_links = links_future.result()
+    else:
+        print("Link fetching did not finish in time, answering without it.")
+        links_future.cancel()
+        web_links = []
+
+    link_data = _reformat_link_data(web_links, query)
+    return _prompt_inputs(query, retrieval, formatted_history, link_data, favorites), retrieval, web_links
+
+
+async def _agather_inputs(
+    query: str,
+    history: List[Dict[str, str]],
+    favorites: List[str],
+    model_name: str,
+    deadline: Deadline
+) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Async counterpart of `_gather_inputs`.
+    """
+    retrieval_task = asyncio.ensure_future(_asimilarity_search(query, model_name))
+    links_task = asyncio.ensure_future(afetch_links_content(query, deadline))
+    formatted_history = _reformat_history(history)
+
+    await asyncio.wait([retrieval_task, links_task], timeout=deadline.remaining(RETRIEVAL_DEADLINE_SECONDS))
+
+    if retrieval_task.done():
+        retrieval = retrieval_task.result()
+    else:
+        print("Similarity search ran out of time, answering without it.")
+        retrieval_task.cancel()
+        retrieval = _format_retrieval([], model_name)
+
+    if links_task.done() and links_task.exception() is None:
+        web_links = links_task.result()
+    else:
+        print("Link fetching did not finish in time, answering without it.")
+        links_task.cancel()
+        web_links = []
+
+    # Splitting and ranking long pages is CPU work, keep it off the event loop
+    link_data = await asyncio.to_thread(_reformat_link_data, web_links, query)
+    return _prompt_inputs(query, retrieval, formatted_history, link_data, favorites), retrieval, web_links
+
+
+# Shown instead of an answer when the chat model cannot be reached
+UNAVAILABLE_MESSAGE = "The assistant is temporarily unavailable. Please try again in a moment."
+
+
+def _query_vector(query: str, deadline: Deadline) -> Optional[List[float]]:
+    """
+    Embed the question for the semantic cache, or None if OpenAI fails or exceeds the budget.
+    """
+    future = _fanout_executor.submit(embeddings.embed_query, query)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except Exception as e:
+        print(f"Query embedding failed, skipping the semantic cache: {e!r}")
+        return None
+
+
+async def _aquery_vector(query: str, deadline: Deadline) -> Optional[List[float]]:
+    try:
+        return await asyncio.wait_for(embeddings.aembed_query(query), deadline.remaining())
+    except Exception as e:
+        print(f"Query embedding failed, skipping the semantic cache: {e!r}")
+        return None
+
+
+def _chat_model_unavailable() -> bool:
+    # Gathering inputs for an answer that cannot be generated would only add load
+    if resilience.openai_chat.state == resilience.OPEN:
+        print("OpenAI chat circuit is open, not answering.")
+        return True
+    return False
+
+
 # Step 6a: Synchronous query-answer interface
 def invoke(
     query: str,
@@ -145,21 +336,32 @@ def invoke(
         - 'response': The generated text answer
         - 'sourcePoints': List of source document segments
     """
+    if _chat_model_unavailable():
+        return {"response": UNAVAILABLE_MESSAGE, "sourcePoints": [], "links_data": []}
+    deadline = Deadline()
+
+    cacheable = semantic_cache.is_cacheable(history, extract_urls(query))
+    if cacheable:
+        query_vector = _query_vector(query, deadline)
+        cacheable = query_vector is not None
+    if cacheable:
+        cached = semantic_cache.lookup(query_vector, model_name, favorites)
+        if cached:
+            return {**cached, "links_data": []}
+
     # Retrieve relevant text and supporting metadata
-    retrieval = _similarity_search(query)
-    formatted_history = _reformat_history(history)
-    web_links = fetch_links_content(query)
+    prompt_inputs, retrieval, web_links = _gather_inputs(query, history, favorites, model_name, deadline)
 
-    prompt_inputs = {
-        "context": retrieval["context"],
-        "question": query,
-        "link_data": _reformat_link_data(web_links),
-        "chat_history": formatted_history,
-        "user_favorites": ", ".join(favorites) if favorites else ""
-    }
+    model = get_chat_model(model_name)
+    try:
+        with resilience.openai_chat.guard():
+            answer = model.invoke(prompt.invoke(prompt_inputs)).content
+    except Exception as e:
+        print(f"Generation failed: {e!r}")
+        return {"response": UNAVAILABLE_MESSAGE, "sourcePoints": [], "links_data": []}
 
-    model = ChatOpenAI(model=model_name)
-    answer = model.invoke(prompt.invoke(prompt_inputs)).content
+    if cacheable:
+        semantic_cache.store(query, query_vector, model_name, favorites, answer, retrieval["chunks"])
 
     return {
         "response": answer,
@@ -182,22 +384,91 @@ def stream(
         - {'type': 'chunk', 'response': '...'} for each streamed token group
         - {'type': 'source', 'sourcePoints': [...]} once streaming ends
     """
-    retrieval = _similarity_search(query)
-    formatted_history = _reformat_history(history)
-    web_links = fetch_links_content(query)
+    if _chat_model_unavailable():
+        yield from _unavailable_events()
+        return
+    deadline = Deadline()
+
+    cacheable = semantic_cache.is_cacheable(history, extract_urls(query))
+    if cacheable:
+        query_vector = _query_vector(query, deadline)
+        cacheable = query_vector is not None
+    if cacheable:
+        cached = semantic_cache.lookup(query_vector, model_name, favorites)
+        if cached:
+            yield from _cached_events(cached)
+            return
+
+    prompt_inputs, retrieval, web_links = _gather_inputs(query, history, favorites, model_name, deadline)
+
+    model = get_chat_model(model_name, streaming=True)
+
+    answer = ""
+    try:
+        with resilience.openai_chat.guard():
+            for output in model.stream(prompt.invoke(prompt_inputs)):
+                answer += output.content
+                yield {"type": "chunk", "response": output.content}
+    except Exception as e:
+        print(f"Generation failed: {e!r}")
+        # Whatever was streamed stays; the user learns why the answer stops there
+        yield {"type": "chunk", "response": UNAVAILABLE_MESSAGE}
+        cacheable = False
 
-    prompt_inputs = {
-        "context": retrieval["context"],
-        "question": query,
-        "link_data": _reformat_link_data(web_links),
-        "chat_history": formatted_history,
-        "user_favorites": ", ".join(favorites) if favorites else ""
+    yield {
+        "type": "source",
+        "sourcePoints": retrieval["chunks"],
+        "links_data": web_links
     }
 
-    model = ChatOpenAI(model=model_name, streaming=True)
+    if cacheable:
+        semantic_cache.store(query, query_vector, model_name, favorites, answer, retrieval["chunks"])
 
-    for output in model.stream(prompt.invoke(prompt_inputs)):
-        yield {"type": "chunk", "response": output.content}
+
+# Step 6c: Async streaming interface used by the websocket consumer
+async def astream(
+    query: str,
+    history: List[Dict[str, str]],
+    favorites: List[str],
+    model_name: str
+):
+    """
+    Async counterpart of `stream`. Retrieval, link fetching and generation all go through
+    async clients, so other websocket streams keep running while this one waits on I/O.
+
+    Yields the same events as `stream`.
+    """
+    if _chat_model_unavailable():
+        for event in _unavailable_events():
+            yield event
+        return
+    deadline = Deadline()
+
+    cacheable = semantic_cache.is_cacheable(history, extract_urls(query))
+    if cacheable:
+        query_vector = await _aquery_vector(query, deadline)
+        cacheable = query_vector is not None
+    if cacheable:
+        cached = await semantic_cache.alookup(query_vector, model_name, favorites)
+        if cached:
+            for event in _cached_events(cached):
+                yield event
+            return
+
+    prompt_inputs, retrieval, web_links = await _agather_inputs(query, history, favorites, model_name, deadline)
+
+    model = get_chat_model(model_name, streaming=True)
+
+    answer = ""
+    try:
+        with resilience.openai_chat.guard():
+            async for output in model.astream(await prompt.ainvoke(prompt_inputs)):
+                answer += output.content
+                yield {"type": "chunk", "response": output.content}
+    except Exception as e:
+        print(f"Generation failed: {e!r}")
+        yield {"type": "chunk", "response": UNAVAILABLE_MESSAGE}
+        cacheable = False
 
     yield {
         "type": "source",
@@ -205,6 +476,24 @@ def stream(
         "links_data": web_links
     }
 
+    if cacheable:
+        await semantic_cache.astore(query, query_vector, model_name, favorites, answer, retrieval["chunks"])
+
+
+# Utility: Replay a semantic-cache hit as the usual stream events
+def _cached_events(cached: Dict[str, Any]):
+    yield {"type": "chunk", "response": cached["response"]}
+    yield {
+        "type": "source",
+        "sourcePoints": cached["sourcePoints"],
+        "links_data": []
+    }
+
+
+def _unavailable_events():
+    yield {"type": "chunk", "response": UNAVAILABLE_MESSAGE}
+    yield {"type": "source", "sourcePoints": [], "links_data": []}
+
 
 # For debugging or standalone testing
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+"""
+Semantic answer cache for repeated questions.
+
+Answers to history-free questions are stored in a small Elasticsearch index together with
+the question embedding. A later question whose embedding is within a cosine threshold of a
+stored one (same model, same user preferences) is answered from the cache instead of running
+retrieval and an LLM call. Lookups and stores are skipped while the Elasticsearch circuit is open.
+
+The cache is opt-in (SEMANTIC_CACHE_ENABLED) and is emptied whenever the document corpus
+changes, see `invalidate()`.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional
+
+from elasticsearch import NotFoundError, BadRequestError
+
+from manthrabin_backend.connections import get_es_client, get_async_es_client
+from . import resilience
+
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "False").lower() in ("true", "1")
+SEMANTIC_CACHE_INDEX = os.getenv("SEMANTIC_CACHE_INDEX", "manthrabin_answer_cache")
+# Cosine similarity a new question needs to reuse a stored answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+
+_MAPPING = {
+    "properties": {
+        "question": {"type": "text", "index": False},
+        "question_vector": {"type": "dense_vector", "similarity": "cosine", "index": True},
+        "model_name": {"type": "keyword"},
+        "favorites": {"type": "keyword"},
+        "answer": {"type": "text", "index": False},
+        "source_points": {"type": "object", "enabled": False},
+        "created_at": {"type": "date"},
+    }
+}
+
+
+def is_cacheable(history: List[Dict[str, str]], links: List[str]) -> bool:
+    """
+    Only first questions without links are cached: their answer depends on nothing but the corpus.
+    """
+    return SEMANTIC_CACHE_ENABLED and not history and not links
+
+
+def _favorites_key(favorites: List[str]) -> str:
+    return "|".join(sorted(favorites or []))
+
+
+def _search_body(vector: List[float], model_name: str, favorites: List[str]) -> Dict[str, Any]:
+    since = datetime.now(timezone.utc) - timedelta(seconds=SEMANTIC_CACHE_TTL_SECONDS)
+    return {
+        "knn": {
+            "field": "question_vector",
+            "query_vector": vector,
+            "k": 1,
+            "num_candidates": 10,
+            "filter": [
+                {"term": {"model_name": model_name}},
+                {"term": {"favorites": _favorites_key(favorites)}},
+                {"range": {"created_at": {"gte": since.isoformat()}}},
+            ],
+        },
+        "_source": ["answer", "source_points"],
+        "size": 1,
+    }
+
+
+def _best_hit(response) -> Optional[Dict[str, Any]]:
+    hits = response["hits"]["hits"]
+    if not hits:
+        return None
+    # Elasticsearch reports cosine kNN scores as (1 + cosine) / 2
+    cosine = 2 * hits[0]["_score"] - 1
+    if cosine < SEMANTIC_CACHE_THRESHOLD:
+        return None
+    source = hits[0]["_source"]
+    return {"response": source["answer"], "sourcePoints": source.get("source_points", [])}
+
+
+def _entry(question: str, vector: List[float], model_name: str, favorites: List[str],
+           answer: str, source_points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "question": question,
+        "question_vector": vector,
+        "model_name": model_name,
+        "favorites": _favorites_key(favorites),
+        "answer": answer,
+        "source_points": source_points,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def lookup(vector: List[float], model_name: str, favorites: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Return {'response', 'sourcePoints'} of a stored answer close enough to `vector`, or None.
+    """
+    try:
+        with resilience.elasticsearch.guard():
+            return _best_hit(get_es_client().search(index=SEMANTIC_CACHE_INDEX,
+                                                    body=_search_body(vector, model_name, favorites)))
+    except NotFoundError:
+        return None
+    except Exception as e:
+        print(f"Semantic cache lookup failed: {e}")
+        return None
+
+
+async def alookup(vector: List[float], model_name: str, favorites: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Async variant of `lookup`.
+    """
+    try:
+        with resilience.elasticsearch.guard():
+            response = await get_async_es_client().search(index=SEMANTIC_CACHE_INDEX,
+                                                          body=_search_body(vector, model_name, favorites))
+        return _best_hit(response)
+    except NotFoundError:
+        return None
+    except Exception as e:
+        print(f"Semantic cache lookup failed: {e}")
+        return None
+
+
+def store(question: str, vector: List[float], model_name: str, favorites: List[str],
+          answer: str, source_points: List[Dict[str, Any]]) -> None:
+    try:
+        client = get_es_client()
+        with resilience.elasticsearch.guard():
+            if not client.indices.exists(index=SEMANTIC_CACHE_INDEX):
+                client.indices.create(index=SEMANTIC_CACHE_INDEX, mappings=_MAPPING)
+            client.index(index=SEMANTIC_CACHE_INDEX,
+                         document=_entry(question, vector, model_name, favorites, answer, source_points))
+    except BadRequestError:
+        # Index was created concurrently by another worker; the next answer will be stored
+        pass
+    except Exception as e:
+        print(f"Semantic cache store failed: {e}")
+
+
+async def astore(question: str, vector: List[float], model_name: str, favorites: List[str],
+                 answer: str, source_points: List[Dict[str, Any]]) -> None:
+    """
+    Async variant of `store`.
+    """
+    try:
+        client = get_async_es_client()
+        with resilience.elasticsearch.guard():
+            if not await client.indices.exists(index=SEMANTIC_CACHE_INDEX):
+                await client.indices.create(index=SEMANTIC_CACHE_INDEX, mappings=_MAPPING)
+            await client.index(index=SEMANTIC_CACHE_INDEX,
+                               document=_entry(question, vector, model_name, favorites, answer, source_points))
+    except BadRequestError:
+        pass
+    except Exception as e:
+        print(f"Semantic cache store failed: {e}")
+
+
+def invalidate() -> None:
+    """
+    Drop every cached answer. Called whenever documents are added to or removed from the corpus.
+    """
+    try:
+        get_es_client().indices.delete(index=SEMANTIC_CACHE_INDEX, ignore_unavailable=True)
+    except Exception as e:
+        print(f"Semantic cache invalidation failed: {e}")
@@ -0,0 +1,76 @@
+import numpy as np
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from rag_utils.chunker_benchmark import hit_rate
+from rag_utils.chunking import TokenChunker, CharacterChunker, get_chunker, is_heading
+
+
+def _words(text):
+    return len(text.split())
+
+
+def _paragraph(label, words):
+    return " ".join(f"{label}{i}" for i in range(words - 1)) + " end."
+
+
+class TokenChunkerTests(SimpleTestCase):
+
+    def _chunker(self, chunk_tokens=20, overlap_tokens=0):
+        return TokenChunker(chunk_tokens, overlap_tokens, counter=_words)
+
+    def test_paragraphs_are_packed_up_to_the_token_limit(self):
+        text = "\n\n".join(_paragraph(label, 8) for label in "abcd")
+        chunks = self._chunker().split_page(Document(page_content=text, metadata={"page": 3}))
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[0].page_content.startswith("a0") and chunks[0].page_content.endswith("b6 end."))
+        self.assertEqual(chunks[1].metadata, {"page": 3, "start_index": text.index("c0")})
+        self.assertEqual(text[chunks[1].metadata["start_index"]:].split("\n\n")[0], _paragraph("c", 8))
+
+    def test_headings_start_a_chunk_and_name_its_section(self):
+        text = "\n\n".join(["# Installation", _paragraph("a", 5), "2.1 Configuration", _paragraph("b", 5)])
+        chunks = self._chunker().split_page(Document(page_content=text))
+        self.assertEqual([chunk.page_content.split("\n")[0] for chunk in chunks],
+                         ["# Installation", "2.1 Configuration"])
+        self.assertEqual([chunk.metadata["section"] for chunk in chunks], ["Installation", "2.1 Configuration"])
+
+    def test_overlap_repeats_whole_trailing_units(self):
+        text = "\n\n".join(_paragraph(label, 5) for label in "abcdef")
+        chunks = self._chunker(chunk_tokens=15, overlap_tokens=5).split_page(Document(page_content=text))
+        self.assertTrue(all(_words(chunk.page_content) <= 15 for chunk in chunks))
+        # Each chunk after the first starts with the paragraph that ended the previous one
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(chunk.page_content.split("\n\n")[0], previous.page_content.split("\n\n")[-1])
+
+    def test_oversized_paragraph_falls_back_to_sentences_and_words(self):
+        sentences = " ".join(_paragraph(f"s{n}x", 10) for n in range(4))
+        text = sentences + "\n\n" + " ".join(f"w{i}" for i in range(45))
+        chunks = self._chunker().split_page(Document(page_content=text))
+        self.assertTrue(all(_words(chunk.page_content) <= 20 for chunk in chunks))
+        self.assertTrue(chunks[0].page_content.endswith("end."))
+        self.assertEqual(" ".join(chunk.page_content for chunk in chunks).split(), text.split())
+
+    def test_persian_sentence_and_heading_markers(self):
+        self.assertTrue(is_heading("فصل ۲ مقررات عمومی"))
+        self.assertTrue(is_heading("ماده 5 - تعاریف"))
+        self.assertFalse(is_heading("ماده 5 به شرح زیر است:"))
+        text = "اولین جمله بسیار طولانی است؟ " * 12
+        chunks = self._chunker().split_page(Document(page_content=text.strip()))
+        self.assertTrue(all(chunk.page_content.endswith("؟") for chunk in chunks))
+
+    def test_version_follows_settings(self):
+        self.assertNotEqual(self._chunker(20, 0).version, self._chunker(20, 5).version)
+        self.assertEqual(CharacterChunker.version, "1")
+        with self.assertRaises(ValueError):
+            get_chunker("sentences")
+
+
+class ChunkerBenchmarkTests(SimpleTestCase):
+
+    def test_hit_requires_answer_inside_a_top_k_chunk(self):
+        chunks = [Document(page_content="alpha beta\ngamma"), Document(page_content="delta epsilon")]
+        chunk_vectors = np.array([[1.0, 0.0], [0.0, 1.0]])
+        queries = [("q1", "beta gamma"), ("q2", "delta epsilon"), ("q3", "zeta")]
+        query_vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+        self.assertAlmostEqual(hit_rate(queries, query_vectors, chunks, chunk_vectors, k=1), 1 / 3)
+        self.assertAlmostEqual(hit_rate(queries, query_vectors, chunks, chunk_vectors, k=2), 2 / 3)
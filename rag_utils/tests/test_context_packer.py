@@ -0,0 +1,66 @@
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from rag_utils import context_packer
+
+
+def _words(text):
+    return len(text.split())
+
+
+def _truncate(text, limit):
+    return " ".join(text.split()[:limit])
+
+
+def _doc(text, public_id="doc-1", **metadata):
+    return Document(page_content=text, metadata={"public_id": public_id, **metadata})
+
+
+BASE = " ".join(f"word{i}" for i in range(60))
+
+
+class MergeChunksTests(SimpleTestCase):
+    def test_overlapping_chunks_of_same_document_are_merged(self):
+        first = _doc(BASE[:300])
+        second = _doc(BASE[200:])
+        passages = context_packer.merge_chunks([(first, 0.9), (second, 0.8)])
+        self.assertEqual(len(passages), 1)
+        self.assertEqual(passages[0]["document"].page_content, BASE)
+        self.assertEqual(passages[0]["score"], 0.9)
+        self.assertEqual(len(passages[0]["hits"]), 2)
+
+    def test_chunks_are_merged_in_either_order(self):
+        passages = context_packer.merge_chunks([(_doc(BASE[200:]), 0.9), (_doc(BASE[:300]), 0.8)])
+        self.assertEqual(passages[0]["document"].page_content, BASE)
+
+    def test_other_documents_are_not_merged(self):
+        passages = context_packer.merge_chunks([(_doc(BASE[:300], "a"), 0.9), (_doc(BASE[200:], "b"), 0.8)])
+        self.assertEqual(len(passages), 2)
+
+    def test_adjacent_chunks_are_merged_by_offset(self):
+        first = _doc(BASE[:100], page=1, start_index=0)
+        second = _doc(BASE[100:200], page=1, start_index=100)
+        passages = context_packer.merge_chunks([(first, 0.9), (second, 0.8)])
+        self.assertEqual(passages[0]["document"].page_content, BASE[:200])
+
+
+class PackTests(SimpleTestCase):
+    def _pack(self, results, **kwargs):
+        return context_packer.pack(results, counter=_words, truncate=_truncate, **kwargs)
+
+    def test_score_floor_drops_weak_hits(self):
+        packed = self._pack([(_doc("strong", "a"), 0.9), (_doc("weak", "b"), 0.1)], budget=100, score_floor=0.5)
+        self.assertEqual([p["text"] for p in packed], ["strong"])
+
+    def test_budget_stops_packing(self):
+        long_text = " ".join(["x"] * 80)
+        results = [(_doc(long_text, "a"), 0.9), (_doc(long_text, "b"), 0.8), (_doc(long_text, "c"), 0.7)]
+        packed = self._pack(results, budget=220, score_floor=0)
+        self.assertEqual(len(packed), 3)
+        self.assertEqual(_words(packed[2]["text"]), 60)
+        self.assertLessEqual(sum(_words(p["text"]) for p in packed), 220)
+
+    def test_small_leftover_budget_is_not_used(self):
+        long_text = " ".join(["x"] * 80)
+        packed = self._pack([(_doc(long_text, "a"), 0.9), (_doc(long_text, "b"), 0.8)], budget=100, score_floor=0)
+        self.assertEqual(len(packed), 1)
@@ -0,0 +1,61 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from rag_utils import dedup, elastic
+
+
+# Roughly the size of an ingested chunk
+TEXT = " ".join(
+    f"Article {i}: the applicant must submit form {i * 7} together with a copy of the identity card "
+    f"to registry office number {i + 3} within thirty days of the decision."
+    for i in range(12)
+)
+
+
+class DedupTests(SimpleTestCase):
+
+    def test_revised_wording_stays_within_threshold(self):
+        revised = TEXT.replace("thirty days", "30 days", 1)
+        self.assertLessEqual(dedup.hamming(dedup.simhash(TEXT), dedup.simhash(revised)), dedup.DEDUP_MAX_HAMMING)
+
+    def test_normalization_makes_spacing_and_case_irrelevant(self):
+        self.assertEqual(dedup.simhash(TEXT), dedup.simhash("  " + TEXT.upper().replace(" ", "  ")))
+
+    def test_unrelated_text_is_far_apart(self):
+        other = ("Quarterly revenue grew by twelve percent, driven by subscription renewals in the enterprise "
+                 "segment and a lower churn rate among small business customers in the northern region.")
+        self.assertGreater(dedup.hamming(dedup.simhash(TEXT), dedup.simhash(other)), 10)
+
+    def test_close_fingerprints_share_a_band(self):
+        fingerprint = dedup.simhash(TEXT)
+        # Flip three bits spread over three different bands
+        close = fingerprint ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)
+        self.assertTrue(set(dedup.bands(fingerprint)) & set(dedup.bands(close)))
+
+    def test_match_picks_closest_candidate_within_threshold(self):
+        fingerprint = dedup.simhash(TEXT)
+        candidates = [("far", fingerprint ^ 0xFFFF), ("near", fingerprint ^ 0b11), ("nearest", fingerprint ^ 0b1)]
+        self.assertEqual(dedup.match({0: fingerprint, 1: ~fingerprint & (2 ** 64 - 1)}, candidates), {0: "nearest"})
+
+    def test_short_chunks_are_not_candidates(self):
+        self.assertFalse(dedup.is_candidate("Page 3"))
+        self.assertTrue(dedup.is_candidate(TEXT))
+
+
+class FindNearDuplicatesTests(SimpleTestCase):
+
+    @patch('rag_utils.elastic.get_es_client', return_value=MagicMock())
+    @patch('rag_utils.elastic.helpers.scan')
+    def test_match_beyond_the_first_page_of_candidates_is_found(self, scan, get_es_client):
+        fingerprint = dedup.simhash(TEXT)
+        chunk = Document(page_content=TEXT, metadata={"simhash": dedup.to_hex(fingerprint),
+                                                      "simhash_bands": dedup.bands(fingerprint)})
+        # Share the first band only, but are far apart elsewhere
+        decoys = [{"_id": f"decoy-{i}", "_source": {"metadata": {"simhash": dedup.to_hex(fingerprint ^ (0xFFFF << 16))}}}
+                  for i in range(500)]
+        near = {"_id": "near", "_source": {"metadata": {"simhash": dedup.to_hex(fingerprint ^ 0b101)}}}
+        scan.return_value = iter(decoys + [near])
+
+        self.assertEqual(elastic.find_near_duplicates([chunk], [0], "doc"), {0: "near"})
@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from rag_utils import elastic
+
+
+class DeleteDocsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.es = MagicMock()
+        self.es.delete_by_query.return_value = {"task": "node:1"}
+        self.deleted = []
+
+        def bulk(client, actions, **kwargs):
+            self.deleted.extend(action["_id"] for action in actions)
+            return len(self.deleted), []
+
+        for patcher in (patch('rag_utils.elastic.get_es_client', return_value=self.es),
+                        patch('rag_utils.elastic.semantic_cache'),
+                        patch('rag_utils.elastic._unlink', return_value=0),
+                        patch('rag_utils.elastic.helpers.bulk', side_effect=bulk)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch('rag_utils.elastic.helpers.scan')
+    def test_recorded_chunks_are_deleted_in_bulk(self, scan):
+        scan.side_effect = [
+            # Chunks other documents link to
+            [{"_id": "c2", "_source": {"metadata": {"linked_public_ids": ["other"]}}}],
+            # Chunks still owned by the document; a transfer that lost a version conflict still matches
+            [{"_id": "c1"}, {"_id": "c2"}],
+        ]
+
+        result = elastic.delete_docs("doc", ["c1", "c2"])
+
+        self.assertEqual(result, {"task": None, "deleted": 1, "transferred": {"other": ["c2"]}})
+        self.assertEqual(self.deleted, ["c1"])
+        self.es.delete_by_query.assert_not_called()
+        query = scan.call_args.kwargs["query"]["query"]["bool"]
+        self.assertIn({"ids": {"values": ["c1", "c2"]}}, query["filter"][0]["bool"]["filter"])
+        self.assertEqual(query["must_not"], [elastic._LINKED])
+
+    @patch('rag_utils.elastic.helpers.scan')
+    def test_without_recorded_ids_chunks_are_deleted_by_query(self, scan):
+        scan.return_value = [{"_id": "c2", "_source": {"metadata": {"linked_public_ids": ["other"]}}}]
+
+        result = elastic.delete_docs("doc")
+
+        self.assertEqual(result["task"], "node:1")
+        query = self.es.delete_by_query.call_args.kwargs["query"]["bool"]
+        self.assertEqual(query["filter"], [elastic._document_query("doc")])
+        # After the transfer `linked_public_ids` is empty, which `exists` does not match
+        self.assertEqual(query["must_not"], [elastic._LINKED, {"ids": {"values": ["c2"]}}])
@@ -0,0 +1,62 @@
+from unittest.mock import patch, MagicMock
+
+from django.test import SimpleTestCase
+
+from rag_utils import embedding_cache
+from rag_utils.embedding_cache import CachedEmbeddings, cache_key, normalize_text, _encode
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [0.5, 0.25]
+
+
+class NormalizeTextTests(SimpleTestCase):
+    def test_whitespace_and_case(self):
+        self.assertEqual(normalize_text("  What   IS\nAI? "), "what is ai?")
+
+    def test_arabic_letters_map_to_persian(self):
+        self.assertEqual(normalize_text("يك"), "یک")
+
+    def test_key_depends_on_model(self):
+        self.assertNotEqual(cache_key("hello", "model-a"), cache_key("hello", "model-b"))
+        self.assertEqual(cache_key("Hello ", "model-a"), cache_key("hello", "model-a"))
+
+
+class CachedEmbeddingsTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = MagicMock()
+        self.redis.get.return_value = None
+        patcher = patch("rag_utils.embedding_cache.get_sync_redis_client", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_miss_then_local_hit(self):
+        inner = FakeEmbeddings()
+        cached = CachedEmbeddings(inner, "m")
+        self.assertEqual(cached.embed_query("q"), [0.5, 0.25])
+        self.assertEqual(cached.embed_query(" Q "), [0.5, 0.25])
+        self.assertEqual(inner.calls, 1)
+        self.redis.set.assert_called_once()
+
+    def test_redis_hit_skips_provider(self):
+        self.redis.get.return_value = _encode([1.0, 2.0])
+        inner = FakeEmbeddings()
+        cached = CachedEmbeddings(inner, "m")
+        self.assertEqual(cached.embed_query("q"), [1.0, 2.0])
+        self.assertEqual(inner.calls, 0)
+
+    def test_metrics_count_each_tier(self):
+        with patch.object(embedding_cache, "_counters", embedding_cache._Counters()):
+            cached = CachedEmbeddings(FakeEmbeddings(), "m")
+            cached.embed_query("q")
+            cached.embed_query("q")
+            text = embedding_cache.metrics()
+        self.assertIn("# TYPE rag_embedding_cache_lookups_total counter", text)
+        self.assertIn('rag_embedding_cache_lookups_total{result="misses"} 1\n', text)
+        self.assertIn('rag_embedding_cache_lookups_total{result="local_hits"} 1\n', text)
+        self.assertIn('rag_embedding_cache_lookups_total{result="redis_hits"} 0\n', text)
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import httpx
+import openai
+from django.test import SimpleTestCase
+
+from rag_utils.embedding_engine import EmbeddingEngine, parse_duration, retry_delay
+
+
+def _rate_limit_error(headers):
+    request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+    return openai.RateLimitError("rate limited", response=httpx.Response(429, headers=headers, request=request),
+                                 body=None)
+
+
+class _FakeRaw:
+    def __init__(self, texts, headers=None):
+        self.headers = headers or {}
+        self._data = [SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(texts)]
+
+    def parse(self):
+        # The API does not promise to return items in input order
+        return SimpleNamespace(data=list(reversed(self._data)))
+
+
+class _FakeClient:
+    def __init__(self, failures=0, headers=None):
+        self.failures = failures
+        self.headers = headers or {}
+        self.calls = []
+        self.embeddings = SimpleNamespace(with_raw_response=SimpleNamespace(create=self._create))
+
+    def _create(self, model, input):
+        self.calls.append(list(input))
+        if self.failures:
+            self.failures -= 1
+            raise _rate_limit_error(self.headers)
+        return _FakeRaw(input)
+
+
+class EmbeddingEngineTests(SimpleTestCase):
+
+    def _engine(self, client, **options):
+        engine = EmbeddingEngine(model="m", client=client, **options)
+        engine.sleeps = []
+        engine._sleep = engine.sleeps.append
+        return engine
+
+    def test_parse_duration(self):
+        self.assertEqual(parse_duration("20ms"), 0.02)
+        self.assertEqual(parse_duration("1.5s"), 1.5)
+        self.assertEqual(parse_duration("6m0s"), 360)
+        self.assertEqual(parse_duration("3"), 3)
+        self.assertIsNone(parse_duration("soon"))
+        self.assertIsNone(parse_duration(None))
+
+    def test_retry_delay_prefers_headers(self):
+        self.assertEqual(retry_delay({"retry-after-ms": "250"}, attempt=3), 0.25)
+        self.assertEqual(retry_delay({"x-ratelimit-reset-requests": "2s", "x-ratelimit-reset-tokens": "5s"}, 0), 5)
+        self.assertLessEqual(retry_delay({}, attempt=0), 1)
+
+    def test_embed_batches_in_order(self):
+        client = _FakeClient()
+        engine = self._engine(client, batch_size=2, concurrency=2)
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+        results = dict(engine.embed(texts))
+
+        self.assertEqual(sorted(results), [0, 2, 4])
+        flattened = [vector for offset in sorted(results) for vector in results[offset]]
+        self.assertEqual(flattened, [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual(len(client.calls), 3)
+
+    def test_rate_limit_is_retried_after_reset(self):
+        client = _FakeClient(failures=2, headers={"x-ratelimit-reset-tokens": "1s"})
+        engine = self._engine(client, batch_size=10, concurrency=1)
+
+        vectors = engine.embed_batch(["a", "bb"])
+
+        self.assertEqual(vectors, [[1.0], [2.0]])
+        self.assertEqual(engine.stats(), {"requests": 3, "retries": 2})
+        self.assertEqual(len(engine.sleeps), 2)
+        self.assertTrue(all(0 < delay <= 1 for delay in engine.sleeps))
+
+    def test_gives_up_after_max_retries(self):
+        engine = self._engine(_FakeClient(failures=5, headers={"retry-after": "0"}), max_retries=2)
+        with self.assertRaises(openai.RateLimitError):
+            engine.embed_batch(["a"])
+        self.assertEqual(engine.stats()["requests"], 3)
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from rag_utils.embedding_store import EmbeddingStore, text_digest
+
+
+class EmbeddingStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_round_trip_keeps_float16_precision(self):
+        store = EmbeddingStore(self.directory, dims=3)
+        digest = text_digest("chunk text")
+        self.assertEqual(store.put_many([(digest, [0.1, -0.5, 0.25])]), 1)
+        vector = store.get_many([digest, text_digest("missing")])[digest]
+        for stored, expected in zip(vector, [0.1, -0.5, 0.25]):
+            self.assertAlmostEqual(stored, expected, places=3)
+        self.assertEqual(list(store.get_many([text_digest("missing")])), [])
+
+    def test_existing_digests_are_not_appended_again(self):
+        store = EmbeddingStore(self.directory, dims=2)
+        digest = text_digest("chunk text")
+        store.put_many([(digest, [1.0, 0.0])])
+        self.assertEqual(store.put_many([(digest, [0.0, 1.0]), (text_digest("other"), [0.5, 0.5])]), 1)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get_many([digest])[digest], [1.0, 0.0])
+
+    def test_rows_written_by_another_instance_are_visible(self):
+        writer = EmbeddingStore(self.directory, dims=2)
+        reader = EmbeddingStore(self.directory, dims=2)
+        self.assertEqual(len(reader), 0)
+        writer.put_many([(text_digest("chunk text"), [0.5, 0.5])])
+        self.assertEqual(reader.get_many([text_digest("chunk text")]), {text_digest("chunk text"): [0.5, 0.5]})
+
+    def test_vectors_without_keys_are_dropped_on_next_write(self):
+        store = EmbeddingStore(self.directory, dims=2)
+        store.put_many([(text_digest("first"), [1.0, 0.0])])
+        # An append interrupted between the vectors and the keys file
+        with open(os.path.join(self.directory, "vectors.bin"), "ab") as vectors:
+            vectors.write(b"\x00" * 4)
+        store.put_many([(text_digest("second"), [0.0, 1.0])])
+        reopened = EmbeddingStore(self.directory, dims=2)
+        self.assertEqual(reopened.get_many([text_digest("second")])[text_digest("second")], [0.0, 1.0])
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, "vectors.bin")), 2 * 2 * 2)
@@ -0,0 +1,44 @@
+from django.test import SimpleTestCase
+
+from rag_utils.history_summary import compose_history
+from rag_utils.tokens import count_tokens, truncate_to_tokens
+
+
+def _turns(count):
+    history = []
+    for i in range(count):
+        history.append({"Role": "user", "Message": f"question {i}"})
+        history.append({"Role": "assistant", "Message": f"answer {i} " + "detail " * 20})
+    return history
+
+
+class ComposeHistoryTests(SimpleTestCase):
+    def test_summary_comes_first(self):
+        history = compose_history("They asked about taxes.", _turns(1), budget=1000)
+        self.assertEqual(history[0]["Role"], "system")
+        self.assertIn("They asked about taxes.", history[0]["Message"])
+        self.assertEqual(history[1:], _turns(1))
+
+    def test_without_summary_only_raw_turns(self):
+        self.assertEqual(compose_history("", _turns(2), budget=1000), _turns(2))
+
+    def test_budget_drops_oldest_turns_and_keeps_pairs(self):
+        turns = _turns(5)
+        last_pair = turns[-2:]
+        budget = sum(count_tokens(item["Message"]) for item in last_pair) + 1
+        history = compose_history("", turns, budget=budget)
+        self.assertEqual(history, last_pair)
+
+    def test_latest_turn_over_budget_is_truncated_not_dropped(self):
+        turns = _turns(3)
+        turns[-1]["Message"] = "long answer " * 200
+        history = compose_history("They asked about taxes.", turns, budget=50)
+        self.assertEqual([item["Role"] for item in history], ["user", "assistant"])
+        self.assertEqual(history[0]["Message"], "question 2")
+        self.assertEqual(history[1]["Message"], truncate_to_tokens(turns[-1]["Message"], 50 - count_tokens("question 2")))
+
+    def test_latest_question_alone_over_budget_is_kept(self):
+        turns = _turns(1)
+        turns[0]["Message"] = "why " * 100
+        history = compose_history("", turns, budget=10)
+        self.assertEqual(history, [{"Role": "user", "Message": truncate_to_tokens(turns[0]["Message"], 10)}])
@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase
+
+from rag_utils.hybrid_search import reciprocal_rank_fusion, _to_documents, build_searches
+from rag_utils.tombstones import _filters
+
+
+def _hit(doc_id, text=""):
+    return {"_id": doc_id, "_source": {"text": text, "metadata": {"public_id": doc_id}}}
+
+
+class ReciprocalRankFusionTests(SimpleTestCase):
+    def test_documents_found_by_both_searches_rank_first(self):
+        bm25 = [_hit("a"), _hit("b")]
+        knn = [_hit("c"), _hit("b")]
+        fused = reciprocal_rank_fusion([bm25, knn], [1.0, 1.0], rank_constant=60, top_k=3)
+        self.assertEqual([hit["_id"] for hit, _ in fused], ["b", "a", "c"])
+
+    def test_weights_shift_the_ranking(self):
+        bm25 = [_hit("a")]
+        knn = [_hit("c")]
+        fused = reciprocal_rank_fusion([bm25, knn], [0.5, 2.0], top_k=2)
+        self.assertEqual(fused[0][0]["_id"], "c")
+
+    def test_top_k_limits_results(self):
+        fused = reciprocal_rank_fusion([[_hit(str(i)) for i in range(20)]], [1.0], top_k=5)
+        self.assertEqual(len(fused), 5)
+
+    def test_failed_search_is_ignored(self):
+        response = {"responses": [{"error": "boom"}, {"hits": {"hits": [_hit("x", "body")]}}]}
+        documents = _to_documents(response)
+        self.assertEqual(len(documents), 1)
+        self.assertEqual(documents[0][0].page_content, "body")
+        self.assertEqual(documents[0][0].metadata["public_id"], "x")
+
+    def test_knn_hits_can_be_reranked_before_fusion(self):
+        response = {"responses": [{"hits": {"hits": []}}, {"hits": {"hits": [_hit("a"), _hit("b")]}}]}
+        documents = _to_documents(response, rerank_knn=lambda hits: hits[::-1])
+        self.assertEqual([doc.metadata["public_id"] for doc, _ in documents], ["b", "a"])
+
+    def test_deleted_documents_are_filtered_from_both_searches(self):
+        filters = _filters([b"doc-1"])
+        bm25, knn = build_searches("question", [0.1, 0.2], filters)[1::2]
+        self.assertEqual(bm25["query"]["bool"]["filter"], filters)
+        self.assertEqual(knn["knn"]["filter"], filters)
+        self.assertEqual(filters[0]["bool"]["must_not"][0], {"terms": {"metadata.public_id": ["doc-1"]}})
+
+    def test_no_filter_without_deleted_documents(self):
+        self.assertEqual(_filters([]), [])
@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from rag_utils.elastic import chunk_id, content_hash, diff_chunks
+
+
+def _chunk(text, page=0):
+    return Document(page_content=text, metadata={"public_id": "doc", "content_hash": content_hash(text),
+                                                 "chunker_version": "1", "page": page})
+
+
+class IncrementalIngestionTests(SimpleTestCase):
+
+    def test_chunk_id_is_stable_and_content_addressed(self):
+        digest = content_hash("hello")
+        self.assertEqual(chunk_id("doc", digest, 0), chunk_id("doc", digest, 0))
+        self.assertNotEqual(chunk_id("doc", digest, 0), chunk_id("doc", digest, 1))
+        self.assertNotEqual(chunk_id("doc", digest, 0), chunk_id("other", digest, 0))
+        self.assertNotEqual(chunk_id("doc", digest, 0), chunk_id("doc", content_hash("hello!"), 0))
+
+    def test_diff_only_touches_changed_chunks(self):
+        old = [_chunk("a"), _chunk("b"), _chunk("c", page=1)]
+        old_ids = [chunk_id("doc", c.metadata["content_hash"], 0) for c in old]
+        existing = {_id: dict(c.metadata) for _id, c in zip(old_ids, old)}
+
+        # "b" was edited and "c" moved to the next page
+        new = [_chunk("a"), _chunk("b2"), _chunk("c", page=2)]
+        new_ids = [chunk_id("doc", c.metadata["content_hash"], 0) for c in new]
+
+        to_embed, moved, stale = diff_chunks(new, new_ids, existing)
+
+        self.assertEqual(to_embed, [1])
+        self.assertEqual(moved, [2])
+        self.assertEqual(stale, {old_ids[1]})
+
+    def test_unchanged_document_needs_no_work(self):
+        chunks = [_chunk("a"), _chunk("b")]
+        ids = [chunk_id("doc", c.metadata["content_hash"], 0) for c in chunks]
+        existing = {_id: dict(c.metadata) for _id, c in zip(ids, chunks)}
+        self.assertEqual(diff_chunks(chunks, ids, existing), ([], [], set()))
+
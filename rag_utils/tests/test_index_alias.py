@@ -0,0 +1,41 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+
+from rag_utils import elastic
+
+
+class IndexAliasTests(SimpleTestCase):
+
+    def setUp(self):
+        self.es = MagicMock()
+        patcher = patch('rag_utils.elastic.get_es_client', return_value=self.es)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch('rag_utils.elastic.semantic_cache')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_swap_moves_alias_in_one_request(self):
+        old = elastic.versioned_index_name('1')
+        self.es.indices.exists_alias.return_value = True
+        self.es.indices.get_alias.return_value = {old: {"aliases": {elastic.index_name: {}}}}
+
+        replaced = elastic.swap_alias(elastic.versioned_index_name('2'))
+
+        self.assertEqual(replaced, [old])
+        self.es.indices.update_aliases.assert_called_once_with(actions=[
+            {"add": {"index": elastic.versioned_index_name('2'), "alias": elastic.index_name,
+                     "is_write_index": True}},
+            {"remove": {"index": old, "alias": elastic.index_name}},
+        ])
+
+    def test_swap_replaces_index_created_before_the_alias(self):
+        self.es.indices.exists_alias.return_value = False
+        self.es.indices.exists.return_value = True
+
+        replaced = elastic.swap_alias(elastic.versioned_index_name('2'))
+
+        self.assertEqual(replaced, [])
+        actions = self.es.indices.update_aliases.call_args.kwargs["actions"]
+        self.assertEqual(actions[0], {"remove_index": {"index": elastic.index_name}})
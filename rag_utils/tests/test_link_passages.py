@@ -0,0 +1,57 @@
+from django.test import SimpleTestCase
+
+from rag_utils import link_passages
+from rag_utils.chunking import TokenChunker
+
+
+def _words(text):
+    return len(text.split())
+
+
+def _chunker():
+    return TokenChunker(chunk_tokens=20, overlap_tokens=0, counter=_words)
+
+
+def _paragraph(topic, index):
+    return f"Paragraph {index} talks about {topic} and nothing else at all, just filler words here."
+
+
+PAGE = "\n\n".join(_paragraph("gardening" if i != 7 else "elasticsearch shards", i) for i in range(12))
+
+
+class Bm25Tests(SimpleTestCase):
+    def test_passages_with_query_terms_score_higher(self):
+        scores = link_passages.bm25_scores("how many shards", ["about gardening", "about shards and shards"])
+        self.assertEqual(scores[0], 0.0)
+        self.assertGreater(scores[1], 0.0)
+
+    def test_arabic_letter_forms_match_persian(self):
+        scores = link_passages.bm25_scores("كتاب", ["این کتاب خوب است", "متن دیگر"])
+        self.assertGreater(scores[0], 0.0)
+
+
+class SelectTests(SimpleTestCase):
+    def test_keeps_relevant_passages_within_budget(self):
+        links = [{"Link": "https://a.com", "Content": PAGE}]
+        selected, tokens = link_passages.select("How are elasticsearch shards sized?", links, 40, _chunker())
+        self.assertEqual(len(selected), 1)
+        self.assertEqual(len(selected[0]["Passages"]), 1)
+        self.assertIn("elasticsearch shards", selected[0]["Passages"][0])
+        self.assertLessEqual(tokens["kept_tokens"], 40)
+        self.assertEqual(tokens["page_tokens"], _words(PAGE))
+
+    def test_falls_back_to_page_openings_without_matching_terms(self):
+        links = [
+            {"Link": "https://a.com", "Content": PAGE},
+            {"Link": "https://b.com", "Content": PAGE.replace("Paragraph", "Section")},
+        ]
+        selected, _ = link_passages.select("summarize https://a.com https://b.com", links, 40, _chunker())
+        self.assertEqual([entry["Link"] for entry in selected], ["https://a.com", "https://b.com"])
+        self.assertTrue(selected[0]["Passages"][0].startswith("Paragraph 0"))
+        self.assertTrue(selected[1]["Passages"][0].startswith("Section 0"))
+
+    def test_failed_links_are_skipped(self):
+        links = [{"Link": "https://a.com", "Content": None, "error": "Blocked"}]
+        selected, tokens = link_passages.select("anything", links, 40, _chunker())
+        self.assertEqual(selected, [])
+        self.assertEqual(tokens, {"page_tokens": 0, "kept_tokens": 0})
@@ -0,0 +1,44 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from rag_utils import llm_clients
+
+
+class ChatModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.dict("os.environ", {"OPENAI_API_KEY": "test-key"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_name_and_options_share_one_instance(self):
+        first = llm_clients.get_chat_model("gpt-4o-mini", temperature=0)
+        self.assertIs(first, llm_clients.get_chat_model("gpt-4o-mini", temperature=0))
+        self.assertIsNot(first, llm_clients.get_chat_model("gpt-4o-mini", temperature=1))
+
+    def test_models_share_the_http_pool(self):
+        first = llm_clients.get_chat_model("gpt-4o")
+        second = llm_clients.get_chat_model("gpt-4o-mini")
+        self.assertIs(first.http_client, second.http_client)
+        self.assertIs(first.http_client, llm_clients.get_http_client())
+
+
+class ConnectionCountersTests(SimpleTestCase):
+    def test_reused_connections_are_requests_without_connect(self):
+        counters = llm_clients._ConnectionCounters()
+        counters.record("connection.connect_tcp.complete")
+        for _ in range(3):
+            counters.record("http11.send_request_headers.started")
+        self.assertEqual(counters.snapshot(), {"requests": 3, "new_connections": 1, "reused_connections": 2})
+
+    def test_metrics_report_reuse(self):
+        counters = llm_clients._ConnectionCounters()
+        counters.record("connection.connect_tcp.complete")
+        counters.record("http11.send_request_headers.started")
+        counters.record("http11.send_request_headers.started")
+        with patch.object(llm_clients, "_counters", counters):
+            text = llm_clients.metrics()
+        self.assertIn("# TYPE rag_openai_reused_connections_total counter", text)
+        self.assertIn("rag_openai_requests_total 2\n", text)
+        self.assertIn("rag_openai_new_connections_total 1\n", text)
+        self.assertIn("rag_openai_reused_connections_total 1\n", text)
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+
+import docx
+import openpyxl
+import pptx
+import pypdf
+from django.test import SimpleTestCase
+
+from rag_utils.parsers import extract_pages, iter_page_windows
+
+
+class ParserTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_txt_pages_split_on_form_feeds(self):
+        path = self._path("notes.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("first page\fsecond page\f\n")
+        pages = extract_pages(path)
+        self.assertEqual([text for text, _ in pages], ["first page", "second page"])
+        self.assertEqual(pages[1][1], {"source": path, "page": 1})
+
+    def test_docx_pages_follow_explicit_breaks(self):
+        path = self._path("manual.docx")
+        document = docx.Document()
+        document.add_paragraph("Introduction")
+        document.add_page_break()
+        document.add_paragraph("Installation")
+        table = document.add_table(rows=1, cols=2)
+        table.rows[0].cells[0].text, table.rows[0].cells[1].text = "Step", "Run"
+        document.save(path)
+
+        pages = extract_pages(path)
+
+        self.assertEqual([text for text, _ in pages], ["Introduction", "Installation\nStep | Run"])
+
+    def test_pptx_one_page_per_slide(self):
+        path = self._path("deck.pptx")
+        presentation = pptx.Presentation()
+        for title in ("Agenda", "Results"):
+            slide = presentation.slides.add_slide(presentation.slide_layouts[0])
+            slide.shapes.title.text = title
+        presentation.save(path)
+
+        pages = extract_pages(path)
+
+        self.assertEqual([text for text, _ in pages], ["Agenda", "Results"])
+        self.assertEqual(pages[1][1]["slide"], 2)
+
+    def test_xlsx_one_page_per_sheet(self):
+        path = self._path("prices.xlsx")
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Prices"
+        workbook.active.append(["Item", "Price"])
+        workbook.active.append(["Tea", 3])
+        workbook.create_sheet("Empty")
+        workbook.save(path)
+
+        pages = extract_pages(path)
+
+        self.assertEqual(pages, [("Item | Price\nTea | 3", {"source": path, "page": 0, "sheet": "Prices"})])
+
+    def test_unsupported_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            extract_pages(self._path("image.png"))
+
+    def test_pdf_ranges_are_parsed_in_the_pool_in_order(self):
+        path = self._path("blank.pdf")
+        writer = pypdf.PdfWriter()
+        for _ in range(5):
+            writer.add_blank_page(width=200, height=200)
+        with open(path, "wb") as file:
+            writer.write(file)
+
+        windows = list(iter_page_windows(path, 2))
+
+        self.assertEqual([len(window) for window in windows], [2, 2, 1])
+        self.assertEqual([page.metadata["page"] for window in windows for page in window], [0, 1, 2, 3, 4])
+        self.assertEqual(windows[0][0].metadata["total_pages"], 5)
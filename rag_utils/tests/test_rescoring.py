@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+from django.test import SimpleTestCase
+from langchain_core.documents import Document
+
+from rag_utils import rescoring
+from rag_utils.embedding_cache import shorten
+from rag_utils.embedding_store import EmbeddingStore, text_digest
+
+
+def _unit(*values):
+    vector = np.zeros(rescoring.EMBEDDING_DIMS, dtype=np.float32)
+    vector[:len(values)] = values
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def _doc(text):
+    return Document(page_content=text, metadata={"content_hash": text_digest(text)})
+
+
+class ShortenTests(SimpleTestCase):
+
+    def test_keeps_leading_dimensions_at_unit_length(self):
+        vector = shorten([3.0, 4.0, 12.0], 2)
+        self.assertEqual(len(vector), 2)
+        self.assertAlmostEqual(vector[0], 0.6, places=6)
+        self.assertAlmostEqual(vector[1], 0.8, places=6)
+
+    def test_full_size_vectors_are_untouched(self):
+        self.assertEqual(shorten([1.0, 2.0], 2), [1.0, 2.0])
+        self.assertEqual(shorten([1.0, 2.0], None), [1.0, 2.0])
+
+
+class RescoringTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.store = EmbeddingStore(directory, rescoring.EMBEDDING_DIMS, dtype="float32")
+        patcher = patch('rag_utils.rescoring.get_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_full_vectors_reorder_candidates(self):
+        self.store.put_many([(text_digest("near"), _unit(1.0, 0.1)), (text_digest("far"), _unit(0.0, 1.0))])
+        # The shortened index ranked "far" first
+        results = [(_doc("far"), 0.95), (_doc("near"), 0.90), (_doc("unknown"), 0.80)]
+
+        rescored = rescoring.rescore(_unit(1.0), results, top_k=2)
+
+        self.assertEqual([doc.page_content for doc, _ in rescored], ["near", "unknown"])
+        self.assertGreater(rescored[0][1], 0.99)
+
+    def test_hits_missing_from_store_keep_their_place(self):
+        hits = [{"_id": str(i), "_score": 1.0 - i / 10, "_source": {"metadata": {"content_hash": text_digest(str(i))}}}
+                for i in range(3)]
+        self.assertEqual(rescoring.rescore_hits(_unit(1.0), hits), hits)
+
+    def test_oversamples_only_when_enabled(self):
+        with patch('rag_utils.rescoring.RESCORE_ENABLED', False):
+            self.assertEqual(rescoring.fetch_k(10), 10)
+        with patch('rag_utils.rescoring.RESCORE_OVERSAMPLE', 3):
+            self.assertEqual(rescoring.fetch_k(10), 30)
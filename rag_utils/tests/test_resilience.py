@@ -0,0 +1,149 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase
+from elasticsearch import NotFoundError
+
+from rag_utils import resilience
+from rag_utils.embedding_cache import CachedEmbeddings
+from rag_utils.resilience import CircuitBreaker, CircuitOpenError, Deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _fail(breaker):
+    try:
+        with breaker.guard():
+            raise ConnectionError("down")
+    except ConnectionError:
+        pass
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=30, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            _fail(self.breaker)
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+        _fail(self.breaker)
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            with self.breaker.guard():
+                self.fail("ran while open")
+        self.assertEqual(self.breaker.counters["rejected"], 1)
+
+    def test_success_resets_the_failure_count(self):
+        for _ in range(2):
+            _fail(self.breaker)
+        with self.breaker.guard():
+            pass
+        for _ in range(2):
+            _fail(self.breaker)
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+
+    def test_half_open_lets_one_trial_through(self):
+        for _ in range(3):
+            _fail(self.breaker)
+        self.clock.now = 30
+        self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, resilience.CLOSED)
+
+    def test_failed_trial_opens_again(self):
+        for _ in range(3):
+            _fail(self.breaker)
+        self.clock.now = 30
+        _fail(self.breaker)
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+        self.clock.now = 59
+        self.assertEqual(self.breaker.state, resilience.OPEN)
+
+    def test_ignored_errors_do_not_count(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, ignore=(NotFoundError,))
+        with self.assertRaises(NotFoundError):
+            with breaker.guard():
+                raise NotFoundError("missing", None, {})
+        self.assertEqual(breaker.state, resilience.CLOSED)
+
+    def test_cancelled_calls_count_as_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=1)
+
+        async def slow():
+            with breaker.guard():
+                await asyncio.sleep(5)
+
+        async def run():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(slow(), 0.01)
+
+        asyncio.run(run())
+        self.assertEqual(breaker.state, resilience.OPEN)
+
+    def test_abandoned_stream_releases_the_trial(self):
+        for _ in range(3):
+            _fail(self.breaker)
+        self.clock.now = 30
+
+        def stream():
+            with self.breaker.guard():
+                yield 1
+                yield 2
+
+        events = stream()
+        next(events)
+        events.close()
+        self.assertEqual(self.breaker.state, resilience.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+
+class OpenAIBreakerTests(SimpleTestCase):
+
+    def test_embedding_failures_leave_the_chat_breaker_closed(self):
+        embeddings = CircuitBreaker("openai_embeddings", failure_threshold=1)
+        chat = CircuitBreaker("openai_chat", failure_threshold=1)
+        inner = MagicMock()
+        inner.embed_query.side_effect = ConnectionError("down")
+        redis = MagicMock()
+        redis.get.return_value = None
+        with patch.object(resilience, "openai_embeddings", embeddings), patch.object(resilience, "openai_chat", chat), \
+                patch("rag_utils.embedding_cache.get_sync_redis_client", return_value=redis):
+            with self.assertRaises(ConnectionError):
+                CachedEmbeddings(inner, "m").embed_query("q")
+        self.assertEqual(embeddings.state, resilience.OPEN)
+        self.assertEqual(chat.state, resilience.CLOSED)
+
+
+class DeadlineTests(SimpleTestCase):
+
+    def test_remaining_is_capped_and_never_negative(self):
+        clock = FakeClock()
+        deadline = Deadline(10, clock=clock)
+        self.assertEqual(deadline.remaining(), 10)
+        self.assertEqual(deadline.remaining(4), 4)
+        clock.now = 8
+        self.assertEqual(deadline.remaining(4), 2)
+        clock.now = 12
+        self.assertEqual(deadline.remaining(), 0)
+        self.assertTrue(deadline.expired)
+
+
+class MetricsTests(SimpleTestCase):
+
+    def test_reports_every_breaker(self):
+        text = resilience.metrics()
+        self.assertIn("# TYPE rag_circuit_state gauge", text)
+        for name in ("jina", "openai_embeddings", "openai_chat", "elasticsearch"):
+            self.assertIn(f'rag_circuit_state{{dependency="{name}"}}', text)
+            self.assertIn(f'rag_circuit_rejected_total{{dependency="{name}"}}', text)
@@ -0,0 +1,28 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from rag_utils import semantic_cache
+
+
+def _response(score):
+    return {"hits": {"hits": [{"_score": score, "_source": {"answer": "cached", "source_points": []}}]}}
+
+
+class SemanticCacheTests(SimpleTestCase):
+    def test_only_first_questions_without_links_are_cacheable(self):
+        with patch.object(semantic_cache, "SEMANTIC_CACHE_ENABLED", True):
+            self.assertTrue(semantic_cache.is_cacheable([], []))
+            self.assertFalse(semantic_cache.is_cacheable([{"Role": "user", "Message": "hi"}], []))
+            self.assertFalse(semantic_cache.is_cacheable([], ["https://example.com"]))
+        with patch.object(semantic_cache, "SEMANTIC_CACHE_ENABLED", False):
+            self.assertFalse(semantic_cache.is_cacheable([], []))
+
+    def test_hit_respects_cosine_threshold(self):
+        with patch.object(semantic_cache, "SEMANTIC_CACHE_THRESHOLD", 0.9):
+            # ES score 0.96 is cosine 0.92, score 0.94 is cosine 0.88
+            self.assertEqual(semantic_cache._best_hit(_response(0.96))["response"], "cached")
+            self.assertIsNone(semantic_cache._best_hit(_response(0.94)))
+
+    def test_no_hits(self):
+        self.assertIsNone(semantic_cache._best_hit({"hits": {"hits": []}}))
@@ -0,0 +1,26 @@
+from django.test import SimpleTestCase
+
+from rag_utils import elastic
+from rag_utils.vector_benchmark import percentile, recall_at_k
+
+
+class VectorBenchmarkTests(SimpleTestCase):
+
+    def test_recall_counts_overlap_within_k(self):
+        self.assertEqual(recall_at_k(["a", "b", "c", "d"], ["b", "a", "x", "c"], k=2), 1.0)
+        self.assertEqual(recall_at_k(["a", "b", "c", "d"], ["a", "x", "y", "b"], k=4), 0.5)
+        self.assertEqual(recall_at_k([], ["a"], k=10), 1.0)
+
+    def test_percentile_uses_nearest_rank(self):
+        latencies = [float(ms) for ms in range(1, 101)]
+        self.assertEqual(percentile(latencies, 95), 95.0)
+        self.assertEqual(percentile(latencies, 50), 50.0)
+        self.assertEqual(percentile([7.0], 95), 7.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_vector_mapping_sets_hnsw_options(self):
+        mapping = elastic.vector_mapping("bbq_hnsw")
+        self.assertEqual(mapping["index_options"]["type"], "bbq_hnsw")
+        self.assertIn("m", mapping["index_options"])
+        self.assertIn("ef_construction", mapping["index_options"])
+        self.assertEqual(elastic.INDEX_MAPPINGS["properties"]["vector"]["dims"], elastic.INDEX_DIMS)
@@ -0,0 +1,145 @@
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+import httpx
+from django.test import SimpleTestCase
+
+from rag_utils import resilience, web_search
+
+
+class FakeRedis:
+    """The few sync Redis calls the link cache makes, backed by a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self):
+        pipeline = MagicMock()
+        pipeline.set.side_effect = lambda key, value, ex=None: self.data.__setitem__(key, value.encode("utf-8"))
+        return pipeline
+
+
+class FetchLinksTests(SimpleTestCase):
+
+    def setUp(self):
+        web_search._local_cache = web_search._TTLCache(16, 60)
+        self.redis = FakeRedis()
+        patcher = patch.object(web_search, "get_sync_redis_client", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Failures recorded here must not open the process-wide breaker for other tests
+        self.jina = resilience.CircuitBreaker("jina")
+        patcher = patch.object(resilience, "jina", self.jina)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.requested = []
+
+    def _serve(self, handler):
+        def client():
+            return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        patcher = patch.object(web_search, "_client", client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pages(self, request):
+        self.requested.append(str(request.url))
+        return httpx.Response(200, text=f"page of {request.url.path}")
+
+    def test_fetches_each_distinct_link_once_in_order(self):
+        self._serve(self._pages)
+        results = web_search.fetch_links_content("see https://a.com/x and https://b.com/y then https://a.com/x")
+        self.assertEqual([result["Link"] for result in results], ["https://a.com/x", "https://b.com/y"])
+        self.assertEqual(results[0]["Content"], "page of /https://a.com/x")
+        self.assertEqual(len(self.requested), 2)
+
+    def test_cached_links_are_not_fetched_again(self):
+        self._serve(self._pages)
+        web_search.fetch_links_content("https://a.com/x")
+        web_search.fetch_links_content("https://a.com/x")
+        self.assertEqual(len(self.requested), 1)
+
+        # Another worker only shares Redis
+        web_search._local_cache = web_search._TTLCache(16, 60)
+        results = web_search.fetch_links_content("https://a.com/x")
+        self.assertEqual(len(self.requested), 1)
+        self.assertEqual(results[0]["Content"], "page of /https://a.com/x")
+
+    def test_errors_are_not_cached(self):
+        self._serve(lambda request: self.requested.append(1) or httpx.Response(
+            200, text=json.dumps({"message": "blocked", "readableMessage": "Blocked"})))
+        for _ in range(2):
+            results = web_search.fetch_links_content("https://a.com/x")
+        self.assertEqual(results[0]["error"], "Blocked")
+        self.assertEqual(len(self.requested), 2)
+        self.assertEqual(self.redis.data, {})
+
+    def test_slow_links_time_out_without_holding_back_the_rest(self):
+        async def handler(request):
+            if "slow" in str(request.url):
+                await asyncio.sleep(5)
+            return httpx.Response(200, text="fast page")
+
+        self._serve(handler)
+        with patch.object(web_search, "LINK_FETCH_DEADLINE_SECONDS", 0.2):
+            results = web_search.fetch_links_content("https://slow.com/a https://fast.com/b")
+        self.assertIsNone(results[0]["Content"])
+        self.assertIn("Not fetched", results[0]["error"])
+        self.assertEqual(results[1]["Content"], "fast page")
+        # A link too slow for the deadline is a Jina failure like any other
+        self.assertEqual(self.jina.counters["failures"], 1)
+
+    def test_limits_concurrent_requests_per_host(self):
+        in_flight = {"now": 0, "max": 0}
+
+        async def handler(request):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.02)
+            in_flight["now"] -= 1
+            return httpx.Response(200, text="page")
+
+        self._serve(handler)
+        with patch.object(web_search, "LINK_FETCH_PER_HOST", 2):
+            web_search.fetch_links_content(" ".join(f"https://a.com/{i}" for i in range(6)))
+        self.assertEqual(in_flight["max"], 2)
+
+    def test_redis_outage_still_fetches(self):
+        self._serve(self._pages)
+        broken = MagicMock()
+        broken.mget.side_effect = web_search.redis.ConnectionError("down")
+        broken.pipeline.side_effect = web_search.redis.ConnectionError("down")
+        with patch.object(web_search, "get_sync_redis_client", return_value=broken):
+            results = web_search.fetch_links_content("https://a.com/x")
+        self.assertEqual(results[0]["Content"], "page of /https://a.com/x")
+
+    def test_open_circuit_serves_only_cached_links(self):
+        self._serve(self._pages)
+        web_search.fetch_links_content("https://a.com/x")
+        breaker = resilience.CircuitBreaker("jina", failure_threshold=1)
+        breaker.record_failure()
+        with patch.object(resilience, "jina", breaker):
+            results = web_search.fetch_links_content("https://a.com/x https://b.com/y")
+        self.assertEqual(results[0]["Content"], "page of /https://a.com/x")
+        self.assertIsNone(results[1]["Content"])
+        self.assertIn("circuit open", results[1]["error"])
+        self.assertEqual(len(self.requested), 1)
+
+    def test_server_errors_count_against_the_breaker(self):
+        self._serve(lambda request: httpx.Response(503, text="unavailable"))
+        results = web_search.fetch_links_content("https://a.com/x")
+        self.assertIsNone(results[0]["Content"])
+        self.assertEqual(self.jina.counters["failures"], 1)
+
+    def test_malformed_link_fails_alone(self):
+        self._serve(self._pages)
+        web_search.fetch_links_content("https://a.com/x")
+        results = web_search.fetch_links_content("https://a.com/x https://b.com/\x00y https://c.com/z")
+        self.assertEqual(results[0]["Content"], "page of /https://a.com/x")
+        self.assertIsNone(results[1]["Content"])
+        self.assertIn("error", results[1])
+        self.assertEqual(results[2]["Content"], "page of /https://c.com/z")
+        self.assertEqual(self.jina.counters["failures"], 0)
@@ -0,0 +1,56 @@
+"""
+Token counting helpers shared by the prompt builders.
+
+Uses the tiktoken encoding of the target model. When the encoding cannot be loaded (unknown
+model, or no access to the tiktoken download cache), falls back to a character estimate so
+budgets are still enforced, only less precisely.
+"""
+
+import functools
+from typing import Optional
+
+import tiktoken
+
+
+DEFAULT_ENCODING = "o200k_base"
+# Rough characters per token for the fallback estimate (Persian text tokenizes densely)
+_FALLBACK_CHARS_PER_TOKEN = 3
+
+
+@functools.lru_cache(maxsize=32)
+def get_encoding(model_name: Optional[str] = None):
+    """
+    Return the tiktoken encoding for `model_name`, or None if no encoding can be loaded.
+    """
+    try:
+        if model_name:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        print(f"Could not load tiktoken encoding, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return -(-len(text) // _FALLBACK_CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: Optional[str] = None) -> str:
+    """
+    Cut `text` down to at most `max_tokens` tokens.
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return text[:max_tokens * _FALLBACK_CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
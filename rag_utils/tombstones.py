@@ -0,0 +1,62 @@
+"""
+Documents whose chunks are being deleted.
+
+Deleting a document's chunks runs as a background Elasticsearch task. Until it finishes the
+document's public id is kept in a Redis set that every retrieval turns into a `must_not`
+filter, so deleted content stops showing up in answers the moment the delete is accepted.
+
+Exposes:
+   - `mark(public_id)` / `clear(public_id)`: add or remove a tombstone.
+   - `exclusion_filters()` / `aexclusion_filters()`: filter clauses hiding tombstoned documents.
+"""
+
+from typing import List, Dict, Any, Iterable
+
+from manthrabin_backend.connections import get_redis_client, get_sync_redis_client
+
+
+TOMBSTONES_KEY = "documents:deleting"
+
+
+def mark(public_id: str) -> None:
+    get_sync_redis_client().sadd(TOMBSTONES_KEY, public_id)
+
+
+def clear(public_id: str) -> None:
+    get_sync_redis_client().srem(TOMBSTONES_KEY, public_id)
+
+
+def _filters(members: Iterable[bytes]) -> List[Dict[str, Any]]:
+    public_ids = sorted(member.decode() if isinstance(member, bytes) else member for member in members)
+    if not public_ids:
+        return []
+    return [{
+        "bool": {
+            "must_not": [
+                {"terms": {"metadata.public_id": public_ids}},
+                {"terms": {"metadata.public_id.keyword": public_ids}},
+            ]
+        }
+    }]
+
+
+def exclusion_filters() -> List[Dict[str, Any]]:
+    """
+    Filter clauses for kNN / bool queries that drop chunks of documents being deleted.
+    """
+    try:
+        return _filters(get_sync_redis_client().smembers(TOMBSTONES_KEY))
+    except Exception as e:
+        print(f"Reading deleted documents failed: {e}")
+        return []
+
+
+async def aexclusion_filters() -> List[Dict[str, Any]]:
+    """
+    Async variant of `exclusion_filters`.
+    """
+    try:
+        return _filters(await get_redis_client().smembers(TOMBSTONES_KEY))
+    except Exception as e:
+        print(f"Reading deleted documents failed: {e}")
+        return []
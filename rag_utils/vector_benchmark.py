@@ -0,0 +1,97 @@
+"""
+Recall and latency of approximate kNN retrieval against exact float search.
+
+Query vectors are sampled from indexed chunks. For each one, the exact top k is computed with
+a brute-force `script_score` over the original float32 vectors, and compared with what the
+HNSW `knn` search returns. Quantized indexes (int8/int4/bbq) trade some recall for a much
+smaller graph; this measures how much.
+
+Exposes:
+   - `sample_queries(es, index, size)`: (chunk id, vector) pairs drawn at random from an index.
+   - `exact_neighbours(es, index, ...)` / `knn_neighbours(es, index, ...)`: top-k chunk ids.
+   - `run(es, index, queries, truth, ...)`: recall@k and latency percentiles of one index.
+"""
+
+import math
+import time
+from typing import List, Dict, Any, Tuple
+
+from elasticsearch import Elasticsearch
+
+
+VECTOR_FIELD = "vector"
+
+Query = Tuple[str, List[float]]
+
+
+def recall_at_k(expected: List[str], actual: List[str], k: int) -> float:
+    if not expected[:k]:
+        return 1.0
+    return len(set(expected[:k]) & set(actual[:k])) / len(expected[:k])
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def sample_queries(es: Elasticsearch, index: str, size: int, seed: int = 42) -> List[Query]:
+    response = es.search(
+        index=index, size=size, source=[VECTOR_FIELD],
+        query={"function_score": {"query": {"exists": {"field": VECTOR_FIELD}},
+                                  "random_score": {"seed": seed, "field": "_seq_no"}}},
+    )
+    return [(hit["_id"], hit["_source"][VECTOR_FIELD]) for hit in response["hits"]["hits"]]
+
+
+def _excluding(_id: str) -> Dict[str, Any]:
+    # The sampled chunk itself would be a trivial first hit for both searches
+    return {"bool": {"must_not": [{"ids": {"values": [_id]}}]}}
+
+
+def exact_neighbours(es: Elasticsearch, index: str, query: Query, k: int) -> List[str]:
+    _id, vector = query
+    response = es.search(
+        index=index, size=k, source=False,
+        query={"script_score": {
+            "query": _excluding(_id),
+            "script": {"source": f"cosineSimilarity(params.query_vector, '{VECTOR_FIELD}') + 1.0",
+                       "params": {"query_vector": vector}},
+        }},
+    )
+    return [hit["_id"] for hit in response["hits"]["hits"]]
+
+
+def knn_neighbours(es: Elasticsearch, index: str, query: Query, k: int, num_candidates: int) -> List[str]:
+    _id, vector = query
+    response = es.search(
+        index=index, size=k, source=False,
+        knn={"field": VECTOR_FIELD, "query_vector": vector, "k": k, "num_candidates": num_candidates,
+             "filter": [_excluding(_id)]},
+    )
+    return [hit["_id"] for hit in response["hits"]["hits"]]
+
+
+def run(es: Elasticsearch, index: str, queries: List[Query], truth: List[List[str]],
+        k: int = 10, num_candidates: int = 100, warmup: int = 10) -> Dict[str, float]:
+    """
+    Returns:
+        dict: 'recall' (mean recall@k against `truth`), 'p50_ms' and 'p95_ms' client-side latency.
+    """
+    for query in queries[:warmup]:
+        knn_neighbours(es, index, query, k, num_candidates)
+    recalls, latencies = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        actual = knn_neighbours(es, index, query, k, num_candidates)
+        latencies.append((time.perf_counter() - started) * 1000)
+        recalls.append(recall_at_k(expected, actual, k))
+    return {
+        "recall": sum(recalls) / len(recalls) if recalls else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
@@ -1,13 +1,86 @@
+"""
+Fetching the pages linked in a chat message through the Jina Reader API.
+
+All links of a message are fetched concurrently, with at most `LINK_FETCH_PER_HOST` requests
+to the same site at a time, and the whole fetch is bounded by `LINK_FETCH_DEADLINE_SECONDS`:
+links still loading by then are reported as timed out and the rest is returned. Fetched pages
+are cached by URL in an in-process LRU and in Redis (shared by all workers) for
+`LINK_CACHE_TTL_SECONDS`, so a link that was already read by anyone costs no request.
+
+Requests go through the Jina circuit breaker (see `resilience`): while it is open only cached
+pages are returned, and the other links are reported as unavailable without being requested.
+
+Exposes:
+   - `fetch_links_content(text)` / `afetch_links_content(text)`: content of every link in a text.
+   - `extract_urls(text)`: the links in a text.
+"""
+
+import os
 import re
 import json
-import requests
-from typing import List, Dict, Any
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import redis
+
+from manthrabin_backend.connections import get_redis_client, get_sync_redis_client
+from . import resilience
+from .resilience import CircuitOpenError, Deadline
 
 
 JINA_API_TOKEN = "jina_ee21df2e2d974094a5b729cdaa6224cbC8mfJB9q19JEv_ly3iOTkN863UiP"
 
+# Bounds the time links can add before the answer starts, however many there are
+LINK_FETCH_DEADLINE_SECONDS = float(os.getenv("LINK_FETCH_DEADLINE_SECONDS", "8"))
+LINK_FETCH_PER_HOST = int(os.getenv("LINK_FETCH_PER_HOST", "2"))
+LINK_FETCH_MAX_CONNECTIONS = int(os.getenv("LINK_FETCH_MAX_CONNECTIONS", "10"))
+LINK_CACHE_TTL_SECONDS = int(os.getenv("LINK_CACHE_TTL_SECONDS", "3600"))
+LINK_CACHE_SIZE = int(os.getenv("LINK_CACHE_SIZE", "256"))
+
+
+class _TTLCache:
+    """In-process LRU whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+
+_local_cache = _TTLCache(LINK_CACHE_SIZE, LINK_CACHE_TTL_SECONDS)
+
 
-def fetch_links_content(text: str) -> List[Dict[str, Any]]:
+def cache_key(url: str) -> str:
+    return f"weblink:{hashlib.sha256(url.encode('utf-8')).hexdigest()}"
+
+
+def fetch_links_content(text: str, deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
     """Extracts URLs from input text and fetches their content using Jina Reader API.
 
     If the response is JSON → it's considered an error.
@@ -15,53 +88,207 @@ def fetch_links_content(text: str) -> List[Dict[str, Any]]:
 
     Args:
         text: A string that may contain one or more HTTP/HTTPS URLs.
+        deadline: The request's latency budget; fetching stops when either it or
+            `LINK_FETCH_DEADLINE_SECONDS` runs out.
 
     Returns:
-        A list of dictionaries containing:
+        A list of dictionaries, one per distinct URL in order of appearance, containing:
             - 'link': The original extracted URL.
             - 'content': The text content (if valid), or None.
             - 'error': Error message if any.
     """
-    urls = re.findall(r'https?://[^\s)>\]\'"]+', text)
-    headers = {
-        "Authorization": f"Bearer {JINA_API_TOKEN}"
-    }
+    urls = _unique(extract_urls(text))
+    if not urls:
+        return []
+
+    results = {}
+    for url in urls:
+        cached = _local_cache.get(cache_key(url))
+        if cached is not None:
+            results[url] = cached
+    missing = [url for url in urls if url not in results]
+    if missing:
+        try:
+            raw = get_sync_redis_client().mget([cache_key(url) for url in missing])
+        except redis.RedisError as e:
+            print(f"Link cache unavailable: {e}")
+            raw = [None] * len(missing)
+        results.update(_from_redis(missing, raw))
 
-    results = []
+    missing = [url for url in urls if url not in results]
+    if missing:
+        # Runs in a worker thread, so a private event loop is fine
+        fetched = asyncio.run(_fetch_all(missing, _timeout(deadline)))
+        results.update(fetched)
+        fresh = _cacheable(fetched)
+        if fresh:
+            try:
+                pipeline = get_sync_redis_client().pipeline()
+                for key, value in fresh.items():
+                    pipeline.set(key, value, ex=LINK_CACHE_TTL_SECONDS)
+                pipeline.execute()
+            except redis.RedisError as e:
+                print(f"Link cache unavailable: {e}")
+
+    return [dict(results[url]) for url in urls]
+
+
+async def afetch_links_content(text: str, deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+    """Async variant of `fetch_links_content` built on `httpx.AsyncClient`.
 
+    Returns the same list of dictionaries, in the order the links appear in the text.
+    """
+    urls = _unique(extract_urls(text))
+    if not urls:
+        return []
+
+    results = {}
     for url in urls:
-        proxy_url = f"https://r.jina.ai/{url}"
+        cached = _local_cache.get(cache_key(url))
+        if cached is not None:
+            results[url] = cached
+    missing = [url for url in urls if url not in results]
+    if missing:
         try:
-            response = requests.get(proxy_url, headers=headers, timeout=10)
+            raw = await get_redis_client().mget([cache_key(url) for url in missing])
+        except redis.RedisError as e:
+            print(f"Link cache unavailable: {e}")
+            raw = [None] * len(missing)
+        results.update(_from_redis(missing, raw))
 
-            # Try to parse as JSON (likely an error response)
+    missing = [url for url in urls if url not in results]
+    if missing:
+        fetched = await _fetch_all(missing, _timeout(deadline))
+        results.update(fetched)
+        fresh = _cacheable(fetched)
+        if fresh:
             try:
-                error_data = response.json()
-                if isinstance(error_data, dict) and "message" in error_data:
-                    results.append({
-                        "Link": url,
-                        "Content": None,
-                        "error": error_data.get("readableMessage", "Unknown error")
-                    })
-                    continue
-            except json.JSONDecodeError:
-                # Not JSON → treat as valid content
-                pass
-
-            # If it's not JSON, assume it's the content
-            results.append({
-                "Link": url,
-                "Content": response.text.strip()
-            })
+                pipeline = get_redis_client().pipeline()
+                for key, value in fresh.items():
+                    pipeline.set(key, value, ex=LINK_CACHE_TTL_SECONDS)
+                await pipeline.execute()
+            except redis.RedisError as e:
+                print(f"Link cache unavailable: {e}")
 
-        except requests.exceptions.RequestException as e:
-            results.append({
+    return [dict(results[url]) for url in urls]
+
+
+def _timeout(deadline: Optional[Deadline]) -> float:
+    return deadline.remaining(LINK_FETCH_DEADLINE_SECONDS) if deadline else LINK_FETCH_DEADLINE_SECONDS
+
+
+def _unique(urls: List[str]) -> List[str]:
+    return list(dict.fromkeys(urls))
+
+
+def _from_redis(urls: List[str], raw: List[Optional[bytes]]) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for url, value in zip(urls, raw):
+        if value is not None:
+            results[url] = json.loads(value)
+            _local_cache.set(cache_key(url), results[url])
+    return results
+
+
+def _cacheable(fetched: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """Caches fetched pages locally and returns the Redis entries to write. Errors are not cached."""
+    entries = {}
+    for url, result in fetched.items():
+        if result.get("Content") is not None:
+            _local_cache.set(cache_key(url), result)
+            entries[cache_key(url)] = json.dumps(result, ensure_ascii=False)
+    return entries
+
+
+def _client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        headers=_jina_headers(),
+        timeout=LINK_FETCH_DEADLINE_SECONDS,
+        limits=httpx.Limits(max_connections=LINK_FETCH_MAX_CONNECTIONS),
+    )
+
+
+async def _fetch_all(urls: List[str], timeout: float = LINK_FETCH_DEADLINE_SECONDS) -> Dict[str, Dict[str, Any]]:
+    """Fetches `urls` concurrently within `timeout` seconds."""
+    hosts: Dict[str, asyncio.Semaphore] = {}
+    async with _client() as client:
+        tasks = {}
+        for url in urls:
+            host = urlsplit(url).hostname or ""
+            semaphore = hosts.setdefault(host, asyncio.Semaphore(max(LINK_FETCH_PER_HOST, 1)))
+            tasks[url] = asyncio.ensure_future(_afetch_link(client, url, semaphore))
+        if timeout > 0:
+            await asyncio.wait(tasks.values(), timeout=timeout)
+
+        results = {}
+        for url, task in tasks.items():
+            if task.done():
+                results[url] = task.result()
+            else:
+                task.cancel()
+                results[url] = {
+                    "Link": url,
+                    "Content": None,
+                    "error": f"Not fetched within {timeout:.1f}s"
+                }
+        # Let cancelled requests record their failure with the breaker before the client closes
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        return results
+
+
+async def _afetch_link(client: httpx.AsyncClient, url: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    try:
+        # Built outside the breaker: a malformed link (e.g. with control characters) is not a Jina failure
+        request = client.build_request("GET", f"https://r.jina.ai/{url}")
+        async with semaphore:
+            with resilience.jina.guard():
+                response = await client.send(request)
+                # Jina's own outages; pages it cannot read come back as JSON errors below
+                if response.status_code >= 500 or response.status_code == 429:
+                    response.raise_for_status()
+        return _parse_jina_response(url, response.text)
+    except (httpx.HTTPError, httpx.InvalidURL, CircuitOpenError) as e:
+        return {
+            "Link": url,
+            "Content": None,
+            "error": str(e)
+        }
+
+
+def extract_urls(text: str) -> List[str]:
+    return re.findall(r'https?://[^\s)>\]\'"]+', text)
+
+
+def _jina_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {JINA_API_TOKEN}"
+    }
+
+
+def _parse_jina_response(url: str, body: str) -> Dict[str, Any]:
+    """Turns a Jina Reader response body into a result entry.
+
+    If the body is JSON → it's considered an error.
+    If the body is plain text → it's considered valid page content.
+    """
+    # Try to parse as JSON (likely an error response)
+    try:
+        error_data = json.loads(body)
+        if isinstance(error_data, dict) and "message" in error_data:
+            return {
                 "Link": url,
                 "Content": None,
-                "error": str(e)
-            })
+                "error": error_data.get("readableMessage", "Unknown error")
+            }
+    except json.JSONDecodeError:
+        # Not JSON → treat as valid content
+        pass
 
-    return results
+    # If it's not JSON, assume it's the content
+    return {
+        "Link": url,
+        "Content": body.strip()
+    }
 
 if __name__ == "__main__":
     text = "محتوای این لینک رو بخون: https://laravel-livewire.com/ و این یکی: https://invalid-url.com"
@@ -149,3 +149,21 @@ class UpdateAccountTypeTests(APITestCase):
         bad_url = reverse('update_account_type', args=['00000000-0000-0000-0000-000000000000'])
         resp = self.client.put(bad_url, {'AccountType':'User'}, format='json')
         self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MetricsEndpointTests(APITestCase):
+    def test_requires_the_scrape_token(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
+            resp = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+            resp = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertIn(b'rag_circuit_state', resp.content)
+            self.assertIn(b'rag_openai_reused_connections_total', resp.content)
+            self.assertIn(b'rag_embedding_cache_lookups_total{result="redis_hits"}', resp.content)
+
+    def test_disabled_without_a_token(self):
+        with self.settings(METRICS_TOKEN=''):
+            resp = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+            self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
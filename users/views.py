@@ -1,3 +1,5 @@
+import hmac
+
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
@@ -6,10 +8,11 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.core.mail import send_mail
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.db import connections
 
 from .models import User, Interest, UserInterest, PasswordReset
+from rag_utils import embedding_cache, llm_clients, resilience
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 
 from .permissions import IsAdminUserType
@@ -250,3 +253,12 @@ def HealthCheckView(request):
         )
 
     return JsonResponse({"status": "ok"})
+
+
+def MetricsView(request):
+    # Breaker state, OpenAI connection reuse and embedding cache hits of the worker process that
+    # serves the scrape; only for the scraper
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+        return HttpResponse(status=404)
+    return HttpResponse(resilience.metrics() + llm_clients.metrics() + embedding_cache.metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")